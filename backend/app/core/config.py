@@ -24,6 +24,14 @@ class Settings(BaseSettings):
     # Browser Configuration
     headless: bool = True
     browser_timeout: int = 30000
+    browser_pool_size: int = 4  # Warm contexts kept open on the shared browser
+    browser_pool_recycle_after: int = 100  # Sessions per pooled context before it is replaced (0 = never)
+    browser_cdp_url: str = ""  # Connect to an already running Chromium instead of launching one
+    browser_user_data_dir: str = ""  # Profile dir for stealth sessions (Swiggy/Zomato); empty = throwaway profile
+    browser_action_cache: str = "~/.cache/quash/actions.json"  # Selectors that worked per site; empty = memory only
+    blocked_resource_types: str = "image,font,media"  # Not downloaded on pooled pages; empty to load all
+    # Origins new pooled contexts connect to in the background (DNS, TLS, HSTS); empty to skip
+    browser_prewarm_origins: str = "https://www.google.com,https://www.amazon.in,https://www.flipkart.com,https://www.youtube.com"
     
     # Logging Configuration
     log_level: str = "INFO"
@@ -40,6 +48,9 @@ class Settings(BaseSettings):
             self.openai_api_key = os.getenv("OPENAI_API_KEY", os.getenv("openai_api_key", ""))
         if not self.anthropic_api_key:
             self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY", os.getenv("anthropic_api_key", ""))
+        if not self.browser_cdp_url:
+            # CDP_URL / CDP_ENDPOINT are the names other Chromium sidecar setups use
+            self.browser_cdp_url = os.getenv("CDP_URL", os.getenv("CDP_ENDPOINT", ""))
 
 settings = Settings()
 
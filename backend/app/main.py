@@ -2,6 +2,7 @@ from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.websocket import websocket_endpoint
 from app.api.plan import router as plan_router
+from app.services.browser_pool import browser_pool
 
 app = FastAPI(title="Quash Browser Agent API")
 
@@ -18,6 +19,10 @@ app.add_middleware(
 async def root():
     return {"message": "Quash Browser Agent API is running"}
 
+@app.on_event("shutdown")
+async def shutdown():
+    await browser_pool.close()
+
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
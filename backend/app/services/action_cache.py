@@ -0,0 +1,104 @@
+"""On-disk memory of which selector actually worked for a requested one, per site.
+
+click() and type_text() try a chain of fallback selectors when the planner's selector
+misses. The one that worked is remembered per (origin, requested selector) and tried
+first next time - also across runs - so replays skip the misses before it.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from app.core.config import settings
+from app.core.logger import logger
+
+# Writes are batched: one flush per this many seconds at most
+_FLUSH_DELAY = 1.0
+
+
+class ActionCache:
+    """(origin, selector) -> resolved selector, persisted as JSON."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON file the cache lives in (defaults to settings.browser_action_cache).
+                Empty keeps the cache in memory only.
+        """
+        path = settings.browser_action_cache if path is None else path
+        self.path = os.path.expanduser(path) if path else ""
+        self._entries: Dict[str, str] | None = None
+        self._flush_task: asyncio.Task | None = None
+        # Set by every change, cleared when a flush takes its snapshot
+        self._dirty = False
+
+    @staticmethod
+    def _key(url: str, selector: str) -> str:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        return hashlib.sha256(json.dumps({"url": origin, "selector": selector}).encode()).hexdigest()
+
+    def _load(self) -> Dict[str, str]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path and os.path.exists(self.path):
+                try:
+                    with open(self.path) as f:
+                        self._entries = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable action cache {self.path}: {e}")
+        return self._entries
+
+    def get(self, url: str, selector: str) -> Optional[str]:
+        """Selector that worked last time `selector` was used on this origin, if any."""
+        return self._load().get(self._key(url, selector))
+
+    def put(self, url: str, selector: str, resolved: str):
+        """Remember that `resolved` worked for `selector` on this origin."""
+        entries = self._load()
+        key = self._key(url, selector)
+        if entries.get(key) != resolved:
+            entries[key] = resolved
+            self._schedule_flush()
+
+    def evict(self, url: str, selector: str):
+        """Forget a stale entry (the remembered selector no longer works)."""
+        if self._load().pop(self._key(url, selector), None) is not None:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if not self.path:
+            return
+        self._dirty = True
+        if self._flush_task and not self._flush_task.done():
+            return  # The running flush picks the change up
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+        except RuntimeError:
+            self._dirty = False
+            self._write()  # No event loop (scripts, tests) - write synchronously
+
+    async def _flush(self):
+        # Changes made while a write is in the worker thread leave the cache dirty,
+        # so they get written on the next pass instead of being dropped
+        while self._dirty:
+            await asyncio.sleep(_FLUSH_DELAY)
+            self._dirty = False
+            # Off the event loop; the snapshot keeps later updates from racing the dump
+            await asyncio.to_thread(self._write, dict(self._entries))
+
+    def _write(self, entries: Optional[Dict[str, str]] = None):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries if entries is None else entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save action cache {self.path}: {e}")
+
+
+# Global instance
+action_cache = ActionCache()
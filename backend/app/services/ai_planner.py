@@ -57,11 +57,13 @@ Transform user instructions into a JSON action plan that:
    {"action": "navigate", "url": "https://www.example.com"}
    - ALWAYS use REAL website URLs (never placeholders)
    - Wait for page load (system handles networkidle/domcontentloaded)
+   - Optional "settle_ms" (default: 1250, 100-10000) for slow pages: how long to wait for the next step's element
 
 2. type
    {"action": "type", "selector": "input[name='q']", "text": "optimized search query"}
    - Types text into input field
    - For Google Maps: Automatically presses Enter after typing
+   - Optional "per_key_delay" (ms, max 300): only for autocomplete widgets that react to real key presses; the end of the text is typed key by key
    - Use stable selectors: id > name > placeholder > class
    - **IMPORTANT**: Generate an optimized, site-specific search query in the "text" field
    - Query should be concise, precise, and tailored to the target site's search algorithm
@@ -100,6 +102,7 @@ Transform user instructions into a JSON action plan that:
    {"action": "fill_form", "fields": {"email": {"selector": "input[type='email']", "value": "temp@example.com"}}}
    - Fills form fields with provided values
    - Use after analyze_form (analyzed fields are used automatically)
+   - Optional "typing_mode": "keystroke" types key by key with human-like pauses, for forms that react to key events (default: "fast")
 
 8. submit
    {"action": "submit", "selector": "button[type='submit']"}
@@ -110,6 +113,8 @@ Transform user instructions into a JSON action plan that:
    - Extracts structured data from page
    - limit: Number of items to extract (extract MORE than requested for filtering)
    - schema: Object mapping field names to CSS selectors
+   - Optional "common_root": selector of one result row (e.g. ".product-row"); fields are then looked up inside each row
+   - Optional "use_cache": true to reuse an earlier identical extract on the same page (not for pages that update in place)
 
 === CRITICAL PLANNING PRINCIPLES ===
 
@@ -1,137 +1,701 @@
-from playwright.async_api import async_playwright, Page, Browser, BrowserContext, TimeoutError as PlaywrightTimeout
-from app.services.site_selectors import get_selectors_for_site, detect_site_from_url
-from app.services.site_handlers import GoogleMapsHandler, SiteExtractionHandler, YouTubeHandler, GoogleSearchHandler, SwiggyHandler, ZomatoHandler
+from playwright.async_api import async_playwright, Page, Browser, BrowserContext, Locator, TimeoutError as PlaywrightTimeout
+from app.services.site_selectors import get_selectors_for_site, detect_site_from_url, get_click_candidates, get_type_candidates
+from app.services.browser_pool import (
+    browser_pool, blocked_url_patterns, set_page_blocklist, BROWSER_ARGS, CONTEXT_OPTIONS, STEALTH_INIT_SCRIPT
+)
+from app.services.action_cache import action_cache
+from app.services.extraction_rules import BROWSER_ONLY_SITES, extract_static_rows, split_row_selectors
+from app.services.site_handlers import GoogleMapsHandler, SiteExtractionHandler, YouTubeHandler, GoogleSearchHandler, SwiggyHandler, ZomatoHandler, EXTRACTION_INIT_JS
 from app.core.config import settings
 from app.core.retry import retry_async, RetryConfig
 from app.core.logger import logger, log_action
 from app.core.llm_provider import get_llm_provider
 import asyncio
+import httpx
 import json
+import os
 import random
+import re
 import string
+import time
+import traceback
 import urllib.parse
-from typing import List, Dict, Optional
-import re  # Import at the top of the processing block
-import random as random_module  # For random delays
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import reduce
+from types import MappingProxyType
+from typing import List, Dict, Iterable, Mapping, Optional, Sequence
+
+# Shared default for missing selector groups (immutable, so safe to hand out)
+_EMPTY_LIST: tuple = ()
+
+# The page's first few inputs, the raw material for _suggest_selectors
+_DESCRIBE_INPUTS_JS = """
+    () => Array.from(document.querySelectorAll('input, textarea, [contenteditable="true"]')).slice(0, 5).map(el => ({
+        tag: el.tagName.toLowerCase(),
+        name: el.name || '',
+        id: el.id || '',
+        placeholder: el.placeholder || ''
+    }))
+"""
+
+# Probes suggested selectors in one call: the distinct elements they match, each as
+# {sel, tag, visible} under the first selector that reached it
+_PROBE_JS = """
+    (selectors) => {
+        const seen = new Set();
+        const found = [];
+        for (const sel of selectors) {
+            let el;
+            try {
+                el = document.querySelector(sel);
+            } catch (e) {
+                continue;
+            }
+            if (!el || seen.has(el)) continue;
+            seen.add(el);
+            found.push({
+                sel,
+                tag: el.tagName.toLowerCase(),
+                visible: el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden'
+            });
+        }
+        return found;
+    }
+"""
+
+# Resolves with {index, element} for the first selector (in list order) that has a
+# visible match, re-checking on DOM mutations (at most once per frame) rather than
+# polling. Resolves {inputs} on timeout - the page's inputs for suggestions, so the
+# failure path needs no second round-trip - and {invalid: true} if a selector isn't plain CSS.
+# With point: true the match is scrolled to in the same call and {index, point} comes
+# back instead, point being its viewport center for a real mouse click - null when
+# the element is disabled or another element covers that spot
+_RACE_SELECTORS_JS = """
+    ({selectors, timeout, point}) => new Promise((resolve) => {
+        const describeInputs = """ + _DESCRIBE_INPUTS_JS.strip() + """;
+        const isVisible = (el) => {
+            const rect = el.getBoundingClientRect();
+            return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+        };
+        const act = (hit) => {
+            if (!point) return hit;
+            const el = hit.element;
+            if (el.disabled) return {index: hit.index, point: null};
+            // Instant, so the center below is where the element ends up
+            el.scrollIntoView({block: 'center', behavior: 'instant'});
+            const rect = el.getBoundingClientRect();
+            const x = rect.left + rect.width / 2;
+            const y = rect.top + rect.height / 2;
+            const top = document.elementFromPoint(x, y);
+            const covered = !top || (top !== el && !el.contains(top));
+            return {index: hit.index, point: covered ? null : {x, y}};
+        };
+        const check = () => {
+            for (let index = 0; index < selectors.length; index++) {
+                for (const element of document.querySelectorAll(selectors[index])) {
+                    if (isVisible(element)) return act({index, element});
+                }
+            }
+            return null;
+        };
+        let hit;
+        try {
+            hit = check();
+        } catch (e) {
+            // Playwright-only syntax (text=, :has-text, ...) - caller falls back
+            resolve({invalid: true});
+            return;
+        }
+        if (hit) {
+            resolve(hit);
+            return;
+        }
+        let scheduled = false;
+        const observer = new MutationObserver(() => {
+            if (scheduled) return;
+            scheduled = true;
+            requestAnimationFrame(() => {
+                scheduled = false;
+                const found = check();
+                if (found) {
+                    observer.disconnect();
+                    clearTimeout(timer);
+                    resolve(found);
+                }
+            });
+        });
+        const timer = setTimeout(() => {
+            observer.disconnect();
+            resolve({inputs: describeInputs()});
+        }, timeout);
+        observer.observe(document, {subtree: true, childList: true, attributes: true});
+    })
+"""
+
+# Describes every form field (label, type, constraints) for analyze_form()
+_ANALYZE_FORM_JS = """
+    () => {
+        const forms = Array.from(document.querySelectorAll('form'));
+        if (forms.length === 0) {
+            // If no form tag, look for form-like structures
+            const inputs = Array.from(document.querySelectorAll('input, textarea, select'));
+            if (inputs.length > 0) {
+                return {
+                    hasFormTag: false,
+                    fields: inputs.map((el, idx) => ({
+                index: idx,
+                tag: el.tagName.toLowerCase(),
+                type: el.type || 'text',
+                name: el.name || '',
+                id: el.id || '',
+                placeholder: el.placeholder || '',
+                value_attr: el.getAttribute('value') || '',
+                label: (() => {
+                    // Try to find associated label
+                    if (el.id) {
+                        const label = document.querySelector(`label[for="${el.id}"]`);
+                        if (label) return label.textContent?.trim() || '';
+                    }
+                    // Try to find label as parent or sibling
+                    const parent = el.parentElement;
+                    if (parent) {
+                        const label = parent.querySelector('label');
+                        if (label) return label.textContent?.trim() || '';
+                    }
+                    // Try previous sibling
+                    let prev = el.previousElementSibling;
+                    if (prev && prev.tagName.toLowerCase() === 'label') {
+                        return prev.textContent?.trim() || '';
+                    }
+                    // Try next sibling (for checkboxes/radios often come after)
+                    let next = el.nextElementSibling;
+                    if (next && next.tagName.toLowerCase() === 'label') {
+                        return next.textContent?.trim() || '';
+                    }
+                    return '';
+                })(),
+                required: el.hasAttribute('required') || el.getAttribute('aria-required') === 'true',
+                pattern: el.getAttribute('pattern') || '',
+                autocomplete: el.getAttribute('autocomplete') || '',
+                className: el.className || '',
+                value: el.value || '',
+                checked: el.checked || false
+            }))
+                };
+            }
+        }
+
+        // Process forms
+        const form = forms[0]; // Use first form
+        const inputs = Array.from(form.querySelectorAll('input, textarea, select'));
+
+        return {
+            hasFormTag: true,
+            formAction: form.action || '',
+            formMethod: form.method || 'get',
+            fields: inputs.map((el, idx) => ({
+                index: idx,
+                tag: el.tagName.toLowerCase(),
+                type: el.type || 'text',
+                name: el.name || '',
+                id: el.id || '',
+                placeholder: el.placeholder || '',
+                value_attr: el.getAttribute('value') || '',
+                label: (() => {
+                    if (el.id) {
+                        const label = document.querySelector(`label[for="${el.id}"]`);
+                        if (label) return label.textContent?.trim() || '';
+                    }
+                    const parent = el.parentElement;
+                    if (parent) {
+                        const label = parent.querySelector('label');
+                        if (label) return label.textContent?.trim() || '';
+                    }
+                    let prev = el.previousElementSibling;
+                    if (prev && prev.tagName.toLowerCase() === 'label') {
+                        return prev.textContent?.trim() || '';
+                    }
+                    let next = el.nextElementSibling;
+                    if (next && next.tagName.toLowerCase() === 'label') {
+                        return next.textContent?.trim() || '';
+                    }
+                    return '';
+                })(),
+                required: el.hasAttribute('required') || el.getAttribute('aria-required') === 'true',
+                pattern: el.getAttribute('pattern') || '',
+                autocomplete: el.getAttribute('autocomplete') || '',
+                className: el.className || '',
+                value: el.value || '',
+                checked: el.checked || false
+            }))
+        };
+    }
+"""
+
+# Current values of the page's first form, captured before submit
+_FORM_VALUES_JS = """
+    () => {
+        const form = document.querySelector('form');
+        if (!form) return {};
+
+        const data = {};
+        const inputs = form.querySelectorAll('input, textarea, select');
+        inputs.forEach(input => {
+            if (input.type === 'checkbox' || input.type === 'radio') {
+                if (input.checked) {
+                    const name = input.name || input.id;
+                    if (name) {
+                        if (!data[name]) data[name] = [];
+                        data[name].push(input.value || input.checked);
+                    }
+                }
+            } else if (input.type !== 'submit' && input.type !== 'button' && input.type !== 'hidden') {
+                const name = input.name || input.id;
+                if (name && input.value) {
+                    data[name] = input.value;
+                }
+            }
+        });
+        return data;
+    }
+"""
+
+# Success/error messages and indicators shown after a form submission
+_FORM_RESULT_JS = """
+    () => {
+        const info = {
+            hasSuccessMessage: false,
+            hasErrorMessage: false,
+            successSelectors: [],
+            errorSelectors: [],
+            messages: [],
+            urlChanged: false
+        };
+
+        // Common success indicators
+        const successPatterns = [
+            /success/i,
+            /thank you/i,
+            /registered/i,
+            /signed up/i,
+            /created/i,
+            /welcome/i,
+            /confirmed/i,
+            /verified/i
+        ];
+
+        // Common error indicators
+        const errorPatterns = [
+            /error/i,
+            /invalid/i,
+            /required/i,
+            /failed/i,
+            /try again/i,
+            /incorrect/i
+        ];
+
+        // Check for success/error messages in common locations
+        const selectors = [
+            '.success', '.success-message', '.alert-success', '[class*="success"]',
+            '.error', '.error-message', '.alert-error', '[class*="error"]',
+            '.message', '.notification', '.alert', '.toast',
+            '[role="alert"]', '[role="status"]',
+            'div[class*="message"]', 'p[class*="message"]'
+        ];
+
+        for (const sel of selectors) {
+            try {
+                const elements = document.querySelectorAll(sel);
+                elements.forEach(el => {
+                    const text = el.textContent?.toLowerCase() || '';
+                    const isVisible = el.offsetParent !== null && 
+                                     window.getComputedStyle(el).display !== 'none';
+
+                    if (isVisible && text.length > 0) {
+                        const isSuccess = successPatterns.some(pattern => pattern.test(text));
+                        const isError = errorPatterns.some(pattern => pattern.test(text));
+
+                        if (isSuccess) {
+                            info.hasSuccessMessage = true;
+                            info.successSelectors.push(sel);
+                            info.messages.push({
+                                type: 'success',
+                                selector: sel,
+                                text: el.textContent?.trim() || ''
+                            });
+                        } else if (isError) {
+                            info.hasErrorMessage = true;
+                            info.errorSelectors.push(sel);
+                            info.messages.push({
+                                type: 'error',
+                                selector: sel,
+                                text: el.textContent?.trim() || ''
+                            });
+                        }
+                    }
+                });
+            } catch (e) {
+                continue;
+            }
+        }
+
+        // Also check page title and body text for indicators
+        const bodyText = document.body.textContent?.toLowerCase() || '';
+        const titleText = document.title.toLowerCase();
+
+        if (successPatterns.some(p => p.test(bodyText) || p.test(titleText))) {
+            info.hasSuccessMessage = true;
+        }
+        if (errorPatterns.some(p => p.test(bodyText) || p.test(titleText))) {
+            info.hasErrorMessage = true;
+        }
+
+        return info;
+    }
+"""
+
+# Number of elements matching a selector (passed as an argument so the source never changes)
+_COUNT_JS = "(selector) => document.querySelectorAll(selector).length"
+
+# Smoothly scroll the first match into the middle of the viewport
+_SMOOTH_SCROLL_JS = """
+    (selector) => {
+        const el = document.querySelector(selector);
+        if (el) {
+            el.scrollIntoView({ behavior: 'smooth', block: 'center' });
+        }
+    }
+"""
+
+# Calls the extractor installed by EXTRACTION_INIT_JS; null when it is missing.
+# The rows come back as one JSON string: Playwright decodes evaluate() results value
+# by value in Python, while json.loads parses the whole string in C
+_CALL_EXTRACT_JS = "(args) => typeof window.__quashExtract === 'function' ? JSON.stringify(window.__quashExtract(args)) : null"
+
+# Fixed fields of an empty extract() result. Read-only so it can never be changed by
+# accident; callers copy it into a plain dict with a fresh "data" list of their own
+_EMPTY_EXTRACT = MappingProxyType({"status": "success", "count": 0})
+
+# Max extract() results kept for extract(use_cache=True)
+_EXTRACT_CACHE_SIZE = 32
+
+# Min seconds between _suggest_selectors DOM scans; failures inside the window reuse the last scan
+_SUGGEST_MIN_INTERVAL = 2.0
+
+# Max page URLs _suggest_selectors keeps scans for (SPAs change the URL without navigate())
+_SUGGEST_CACHE_SIZE = 32
+
+# navigate()'s default settle budget: pages without a ready selector pause this long,
+# and a site's own ready selector is waited for up to _SETTLE_SELECTOR_FACTOR times as long
+NAVIGATE_SETTLE_MS = 1250
+_SETTLE_SELECTOR_FACTOR = 4
+
+# Disk cache size for persistent stealth profiles (BROWSER_USER_DATA_DIR)
+_DISK_CACHE_BYTES = 256 * 1024 * 1024
+
+# Longer texts typed with per_key_delay are inserted in one go, with only the
+# last few characters sent as real keystrokes
+_KEYSTROKE_TAIL = 3
+
+# Extra launch flags for stealth sessions (on top of BROWSER_ARGS)
+_STEALTH_ARGS = [
+    '--disable-web-security',
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--disable-site-isolation-trials',
+    '--disable-features=BlockInsecurePrivateNetworkRequests',
+]
+
+# Zomato often drops automated connections; these on top of the stealth flags help
+_ZOMATO_ARGS = [
+    '--disable-quic',  # Disable QUIC protocol (may help with some connection issues)
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+]
+
+_ZOMATO_CONTEXT_OPTIONS = dict(
+    CONTEXT_OPTIONS,
+    bypass_csp=True,
+    ignore_https_errors=True,
+    extra_http_headers={
+        **CONTEXT_OPTIONS['extra_http_headers'],
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Cache-Control': 'max-age=0',
+    },
+)
+
+# Sites navigate() treats specially: (Google Maps)|(Zomato)|(Swiggy)
+_SITE_RE = re.compile(r"(maps\.google|google\.com/maps)|(zomato)|(swiggy)", re.IGNORECASE)
+
+# CAPTCHA / "unusual traffic" interstitials (mostly Google's /sorry/ page)
+_CAPTCHA_URL_MARKERS = ("/sorry/",)
+_CAPTCHA_SELECTORS = (
+    "#g-recaptcha-response",
+    "iframe[src*='recaptcha']",
+    ".g-recaptcha",
+    "[data-sitekey]",  # reCAPTCHA site key
+)
+# Also run in the page (see _PAGE_STATE_JS), so it must stay valid JS regex syntax
+_CAPTCHA_RE = re.compile(
+    r"unusual traffic|automated queries|captcha|verify you're not a robot|sorry, we have detected",
+    re.IGNORECASE
+)
+
+# Title plus the CAPTCHA element/text checks in one round-trip
+_PAGE_STATE_JS = """
+    ({selectors, pattern}) => ({
+        title: document.title,
+        captcha: selectors.some(sel => document.querySelector(sel) !== null)
+            || new RegExp(pattern, 'i').test(document.body ? document.body.innerText : '')
+    })
+"""
+_PAGE_STATE_ARGS = {"selectors": list(_CAPTCHA_SELECTORS), "pattern": _CAPTCHA_RE.pattern}
+# Clean checks after which an origin only gets the URL and title checks (Google origins
+# never do), and how many page checks that lasts before the full check runs again
+_CAPTCHA_TRUST_AFTER = 3
+_CAPTCHA_TRUST_LOADS = 10
+
+# Idle worker pages kept open between batch_extract() calls
+_PAGE_POOL_SIZE = 4
+
+# Schema field -> site selector list used as fallback during extraction
+_SCHEMA_SITE_SELECTOR_KEYS = {
+    "name": "product_name",
+    "price": "product_price",
+    "rating": "product_rating",
+    "link": "product_link",
+    "url": "product_link",
+}
+
 
 class BrowserAgent:
-    def __init__(self):
+    def __init__(self, blocked_resource_types: Optional[Iterable[str]] = None):
+        """
+        Args:
+            blocked_resource_types: Request types aborted while browsing (e.g. "image").
+                Defaults to settings.blocked_resource_types; pass () to load everything,
+                for flows that need every resource (screenshots, image-driven layouts).
+        """
         self.browser: Browser | None = None
         self.context: BrowserContext | None = None
         self.page: Page | None = None
         self.playwright = None
+        self._pooled: bool = False  # Context borrowed from browser_pool rather than owned
         self.current_site: str = "generic"  # Track current site for selector strategies
+        # Selector map for current_site, refreshed by navigate() whenever the site changes
+        self._site_selectors: Mapping = get_selectors_for_site(self.current_site)
+        # (site, field, schema selector) -> schema selector followed by site-specific fallbacks
+        self._merged_selectors: Dict[tuple, List[str]] = {}
+        # (url, schema items, limit, common_root) -> extract() result, for extract(use_cache=True)
+        self._extract_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+        # page URL -> selector suggestions from _suggest_selectors
+        self._suggest_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        # Time and result of the last suggestion scan, for the _SUGGEST_MIN_INTERVAL rate limit
+        self._last_suggest_ts: float = 0.0
+        self._last_suggestions: List[str] = []
+        # Idle extra pages for batch_extract(), reused instead of opened per URL
+        self._idle_pages: List[Page] = []
+        self._start_lock: asyncio.Lock | None = None
+        # origin (netloc) -> CAPTCHA checks that came back clean, and the title-only
+        # checks left before the next full one, see _page_state
+        self._captcha_clean_counts: Dict[str, int] = {}
+        self._captcha_trust: Dict[str, int] = {}
         self._retry_config = RetryConfig(max_retries=3, initial_delay=1.0, exponential_base=2.0)
+        # Diagnostics (page structure dumps, tracebacks) are only collected when debugging
+        self.debug: bool = os.getenv("QUASH_DEBUG") == "1"
+        if blocked_resource_types is None:
+            blocked_resource_types = [t.strip() for t in settings.blocked_resource_types.split(",") if t.strip()]
+        self.blocked_resource_types = frozenset(blocked_resource_types)
 
-    async def start(self, use_stealth: bool = False):
+    async def start(self, use_stealth: bool = False, user_data_dir: Optional[str] = None):
         """Initialize browser instance with error handling and optional stealth mode.
         
+        Regular sessions borrow a warm context from the shared browser pool; stealth
+        mode needs different launch flags, so it starts a dedicated browser.
+        
         Args:
             use_stealth: If True, enable stealth mode with enhanced anti-detection measures
+            user_data_dir: Profile directory for stealth mode, so the HTTP cache and cookies
+                survive between runs. Defaults to settings.browser_user_data_dir.
         """
-        if self.browser is None:
+        # The page is assigned last, so a start still in progress takes the lock below
+        if self.page is not None:
+            return
+        # Concurrent first calls (e.g. navigate() and batch_extract()) must not both
+        # check out a context or launch a browser. Created lazily to bind to the running loop
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.context is not None:
+                return
+            if not use_stealth:
+                self.context = await browser_pool.checkout()
+                self.browser = browser_pool.browser
+                self._pooled = True
+                # Pooled contexts come with a page already open - reuse it
+                self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
+                self.page.on("framenavigated", self._on_frame_navigated)
+                # The pool opened the page with the default blocklist; this only costs
+                # round-trips when this agent blocks something else
+                await self._block_page(self.page)
+                return
+            
+            user_data_dir = user_data_dir or settings.browser_user_data_dir
+            # Realistic browser settings, plus file access for stealth mode
+            context_options = dict(CONTEXT_OPTIONS, bypass_csp=True, ignore_https_errors=True)
             try:
                 self.playwright = await async_playwright().start()
                 
                 # Enhanced browser args for stealth mode
-                browser_args = [
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-dev-shm-usage',
-                    '--no-sandbox',
-                ]
+                browser_args = BROWSER_ARGS + _STEALTH_ARGS
                 
-                if use_stealth:
-                    # Additional stealth args
-                    browser_args.extend([
-                        '--disable-web-security',
-                        '--disable-features=IsolateOrigins,site-per-process',
-                        '--disable-site-isolation-trials',
-                        '--disable-features=BlockInsecurePrivateNetworkRequests',
-                    ])
-                
-                self.browser = await self.playwright.chromium.launch(
-                    headless=settings.headless,
-                    args=browser_args
-                )
+                if user_data_dir:
+                    # Warm disk cache and saved cookies (e.g. the chosen delivery location)
+                    self.context = await self.playwright.chromium.launch_persistent_context(
+                        user_data_dir,
+                        headless=settings.headless,
+                        # Room for framework bundles and their V8 code cache between runs
+                        args=[*browser_args, f"--disk-cache-size={_DISK_CACHE_BYTES}"],
+                        **context_options
+                    )
+                else:
+                    self.browser = await self.playwright.chromium.launch(
+                        headless=settings.headless,
+                        args=browser_args
+                    )
+                    self.context = await self.browser.new_context(**context_options)
             except Exception as e:
                 logger.error(f"Failed to start browser: {e}")
                 raise
             
-            # Create context with realistic browser settings
-            context_options = {
-                'viewport': {'width': 1920, 'height': 1080},
-                'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'locale': 'en-IN',
-                'timezone_id': 'Asia/Kolkata',
-                'extra_http_headers': {
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                }
-            }
-            
-            # Add permissions for file access in stealth mode
-            if use_stealth:
-                context_options['bypass_csp'] = True
-                context_options['ignore_https_errors'] = True
-            
-            self.context = await self.browser.new_context(**context_options)
-            
             # Enhanced stealth script to bypass detection
-            stealth_script = """
-                // Remove webdriver property
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                });
-                
-                // Override the `plugins` property to use a custom getter
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => [1, 2, 3, 4, 5]
-                });
-                
-                // Override the `languages` property
-                Object.defineProperty(navigator, 'languages', {
-                    get: () => ['en-US', 'en']
-                });
-                
-                // Mock chrome object
-                window.chrome = {
-                    runtime: {}
-                };
-                
-                // Override permissions
-                const originalQuery = window.navigator.permissions.query;
-                window.navigator.permissions.query = (parameters) => (
-                    parameters.name === 'notifications' ?
-                        Promise.resolve({ state: Notification.permission }) :
-                        originalQuery(parameters)
-                );
-            """
-            
-            await self.context.add_init_script(stealth_script)
-            self.page = await self.context.new_page()
+            await self.context.add_init_script(STEALTH_INIT_SCRIPT)
+            # Preinstall the extractor so extract() can call it by name
+            await self.context.add_init_script(EXTRACTION_INIT_JS)
+            # Persistent contexts open with a page already
+            self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
+            self.page.on("framenavigated", self._on_frame_navigated)
+            if self.blocked_resource_types:
+                # Per page, so the profile's disk cache keeps serving scripts and styles
+                await self._block_page(self.page)
 
     async def close(self):
-        """Close browser instance."""
-        if self.page:
-            await self.page.close()
-        if self.context:
-            await self.context.close()
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        """Close browser instance (pooled contexts are handed back to the pool instead)."""
+        idle_pages, self._idle_pages = self._idle_pages, []
+        if self._pooled:
+            # The context outlives us, so worker pages have to be closed explicitly
+            cleanup = [page.close() for page in idle_pages]
+            if self.page:
+                # checkin() replaces the page, which takes its blocklist or route along
+                self.page.remove_listener("framenavigated", self._on_frame_navigated)
+            # Independent round-trips - issue them together; failures don't block checkin
+            await asyncio.gather(*cleanup, return_exceptions=True)
+            if self.context:
+                await browser_pool.checkin(self.context)
+        else:
+            # Closing the browser closes its contexts and pages; a persistent
+            # context has no separate browser and is closed directly
+            if self.browser:
+                await self.browser.close()
+            elif self.context:
+                await self.context.close()
+            if self.playwright:
+                await self.playwright.stop()
         self.browser = None
         self.context = None
         self.page = None
+        self.playwright = None
+        self._pooled = False
 
-    async def navigate(self, url: str) -> dict:
-        """Navigate to a URL and detect the site type."""
-        # Detect if this is Swiggy - enable stealth mode
-        is_swiggy = "swiggy" in url.lower()
+    @asynccontextmanager
+    async def _worker_page(self):
+        """Borrow an extra page in this agent's context, reusing idle ones.
+        
+        Opening a page costs a renderer round-trip and re-installs routes, so
+        batch_extract() keeps up to _PAGE_POOL_SIZE of them around between URLs.
+        """
+        if self._idle_pages:
+            page = self._idle_pages.pop()
+        else:
+            page = await self.context.new_page()
+            if self.blocked_resource_types:
+                await self._block_page(page)
+        try:
+            yield page
+        except BaseException:
+            # Page may be mid-navigation or crashed - don't hand it out again
+            try:
+                await page.close()
+            except Exception:
+                pass
+            raise
+        if len(self._idle_pages) < _PAGE_POOL_SIZE and not page.is_closed():
+            self._idle_pages.append(page)
+        else:
+            await page.close()
+
+    def _on_frame_navigated(self, frame):
+        """A new document at a URL (reload, link, form post) makes its cached scan stale."""
+        if frame.parent_frame is None:
+            self._suggest_cache.pop(frame.url, None)
+
+    async def _block_page(self, page: Page):
+        """Stop `page` from downloading the blocked resource types.
+        
+        Uses Chromium's URL blocklist when every blocked type maps to file extensions,
+        which keeps the HTTP cache working; otherwise (or without CDP) a route does it.
+        The blocklist lives in a CDP session kept per page (see set_page_blocklist), so
+        a page that already has this list - pooled pages come with the default one -
+        costs no round-trips.
+        """
+        patterns = blocked_url_patterns(self.blocked_resource_types) if self.blocked_resource_types else ()
+        try:
+            # Replaces a list the page already has, e.g. the pool's default
+            await set_page_blocklist(page, patterns or ())
+            if patterns is not None:
+                return
+        except Exception as e:
+            logger.debug(f"CDP request blocklist unavailable, using a route: {e}")
+        if self.blocked_resource_types:
+            await page.route("**/*", self._block_resources)
+
+    async def _block_resources(self, route):
+        """Route handler that aborts requests for the blocked resource types."""
+        if route.request.resource_type in self.blocked_resource_types:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def navigate(self, url: str, ready_selector: Optional[str] = None,
+                       wait_until: str = "domcontentloaded", wait_for_network_idle: bool = False,
+                       settle_ms: int = NAVIGATE_SETTLE_MS) -> dict:
+        """Navigate to a URL and detect the site type.
+        
+        What "loaded" means is up to the caller:
+          - ready_selector: wait for the element the next step needs (fastest useful signal)
+          - neither: the site's own ready_selector, or a fixed settle_ms pause for unknown sites
+          - wait_for_network_idle: also wait up to 10s for network quiet; busy sites
+            (analytics, long-polling) never get there, so this usually costs the full 10s
+        
+        Args:
+            url: Page to open; https:// is added when no protocol is given
+            ready_selector: Selector to wait for once the document is parsed
+            wait_until: goto() milestone - "commit", "domcontentloaded" or "load"
+            wait_for_network_idle: Wait for network quiet instead of a selector
+            settle_ms: Readiness budget (ms, > 0) - ready_selector is waited for up to settle_ms,
+                the site's own ready selector up to settle_ms * _SETTLE_SELECTOR_FACTOR,
+                and pages with neither pause settle_ms
+        """
+        # Classify the URL once: Google Maps needs special loading, Swiggy stealth mode,
+        # and Zomato/Swiggy get their own hints when the connection fails
+        site_match = _SITE_RE.search(url)
+        is_google_maps = bool(site_match and site_match.group(1))
+        is_swiggy = bool(site_match and site_match.group(3))
+        is_food_delivery = bool(site_match and (site_match.group(2) or site_match.group(3)))
         
         if not self.page:
             await self.start(use_stealth=is_swiggy)
@@ -146,8 +710,10 @@ class BrowserAgent:
             if not url.startswith(('http://', 'https://', 'file://', 'about:', 'data:')):
                 url = 'https://' + url
             
-            # Detect if this is Google Maps - it needs special handling
-            is_google_maps = "maps.google" in url.lower() or "google.com/maps" in url.lower()
+            # A fresh load invalidates anything extracted from the previous DOM
+            self._extract_cache.clear()
+            self._suggest_cache.clear()
+            self._last_suggest_ts = 0.0
             
             # Try navigation with retry for network errors
             max_retries = 2
@@ -168,13 +734,34 @@ class BrowserAgent:
                             await asyncio.sleep(3)
                     else:
                         # For other sites, use standard strategy
-                        await self.page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                        # Wait a bit more for dynamic content, but with shorter timeout for heavy sites
-                        try:
-                            await self.page.wait_for_load_state("networkidle", timeout=10000)
-                        except Exception as networkidle_error:
-                            # For heavy sites, networkidle might never happen, but page is still usable
-                            await asyncio.sleep(2)  # Give it a moment anyway
+                        await self.page.goto(url, wait_until=wait_until, timeout=30000)
+                        if wait_for_network_idle:
+                            try:
+                                await self.page.wait_for_load_state("networkidle", timeout=10000)
+                            except Exception as networkidle_error:
+                                # For heavy sites, networkidle might never happen, but page is still usable
+                                await asyncio.sleep(2)  # Give it a moment anyway
+                        else:
+                            # Wait for what the next step needs rather than for network silence,
+                            # which busy sites (analytics, long-polling) never reach
+                            # Known sites fall back to their search box or result list
+                            site_ready_selector = get_selectors_for_site(detect_site_from_url(url)).get("ready_selector")
+                            if ready_selector:
+                                # The caller's selector is a guess (the planner's, before fallbacks),
+                                # so it only gets the plain settle budget
+                                try:
+                                    await self.page.wait_for_selector(ready_selector, timeout=settle_ms)
+                                    site_ready_selector = None
+                                except Exception:
+                                    pass
+                            try:
+                                if site_ready_selector:
+                                    await self.page.wait_for_selector(
+                                        site_ready_selector, timeout=settle_ms * _SETTLE_SELECTOR_FACTOR)
+                                elif not ready_selector:
+                                    await self.page.wait_for_timeout(settle_ms)
+                            except Exception:
+                                pass  # Page is still usable; later steps wait for their own elements
                     
                     break  # Success, exit retry loop
                 except Exception as e:
@@ -202,10 +789,8 @@ class BrowserAgent:
                         raise
             
             current_url = self.page.url
-            title = await self.page.title()
-            
-            # Check for CAPTCHA or blocking pages
-            captcha_detected = await self._detect_captcha()
+            # Title and CAPTCHA / blocking-page check share one round-trip
+            title, captcha_detected = await self._page_state()
             if captcha_detected:
                 return {
                     "status": "blocked",
@@ -221,7 +806,10 @@ class BrowserAgent:
                 }
             
             # Detect site type for better selector strategies
-            self.current_site = detect_site_from_url(current_url)
+            site = detect_site_from_url(current_url)
+            if site != self.current_site:
+                self.current_site = site
+                self._site_selectors = get_selectors_for_site(site)
             
             return {
                 "status": "success",
@@ -234,13 +822,12 @@ class BrowserAgent:
             # Provide helpful error messages
             if "ERR_HTTP2_PROTOCOL_ERROR" in error_str:
                 # Check if it's Zomato or Swiggy - suggest Google Maps as alternative
-                url_lower = url.lower()
                 suggestions = [
                     "Try again in a few moments",
                     "The site might be temporarily unavailable"
                 ]
                 
-                if "zomato" in url_lower or "swiggy" in url_lower:
+                if is_food_delivery:
                     suggestions.append("Zomato/Swiggy may be blocking automated access")
                     suggestions.append("Try using Google Maps instead for local discovery")
                     suggestions.append("You can search 'pizza places in [location]' on Google Maps")
@@ -250,7 +837,7 @@ class BrowserAgent:
                     "error": f"Network error connecting to {url}. This might be a temporary network issue or the site might be blocking automated access.",
                     "suggestions": suggestions,
                     "retryable": True,
-                    "alternative": "google_maps" if ("zomato" in url_lower or "swiggy" in url_lower) else None
+                    "alternative": "google_maps" if is_food_delivery else None
                 }
             elif "net::" in error_str:
                 return {
@@ -265,7 +852,7 @@ class BrowserAgent:
                 }
             elif "Timeout" in error_str:
                 # For timeout errors, check if we're on Google Maps
-                if "maps.google" in url.lower():
+                if is_google_maps:
                     return {
                         "status": "error",
                         "error": f"Timeout loading Google Maps. The page may still be usable, but some features might not be ready.",
@@ -299,48 +886,53 @@ class BrowserAgent:
         """Detect if the current page is a CAPTCHA or blocking page."""
         if not self.page:
             return False
-        
         try:
-            current_url = self.page.url
-            
-            # Check URL for CAPTCHA indicators
-            if "/sorry/" in current_url or "/sorry/index" in current_url:
-                return True
-            
-            # Check for common CAPTCHA elements
-            captcha_selectors = [
-                "#g-recaptcha-response",
-                "iframe[src*='recaptcha']",
-                ".g-recaptcha",
-                "[data-sitekey]",  # reCAPTCHA site key
-                "text=unusual traffic",
-                "text=automated queries"
-            ]
-            
-            for selector in captcha_selectors:
-                try:
-                    element = await self.page.query_selector(selector)
-                    if element:
-                        return True
-                except:
-                    continue
-            
-            # Check page content for CAPTCHA indicators
-            page_text = await self.page.evaluate("() => document.body.innerText.toLowerCase()")
-            captcha_keywords = [
-                "unusual traffic",
-                "automated queries",
-                "captcha",
-                "verify you're not a robot",
-                "sorry, we have detected"
-            ]
-            
-            if any(keyword in page_text for keyword in captcha_keywords):
-                return True
-            
-            return False
-        except:
+            _, captcha = await self._page_state()
+        except Exception:
             return False
+        return captcha
+
+    async def _page_state(self) -> tuple:
+        """(title, is_captcha) for the current page, in at most one round-trip.
+        
+        The CAPTCHA check covers the URL and title (no extra round-trip), the known
+        widget elements and the interstitials' wording in the page text. Origins that
+        came back clean _CAPTCHA_TRUST_AFTER times in a row skip the element and text
+        checks for the next _CAPTCHA_TRUST_LOADS checks, or until an extraction on
+        them comes back empty (see _distrust).
+        """
+        url = self.page.url
+        if any(marker in url for marker in _CAPTCHA_URL_MARKERS):
+            return await self.page.title(), True
+        origin = urllib.parse.urlsplit(url).netloc
+        if self._captcha_trust.get(origin, 0) > 0:
+            self._captcha_trust[origin] -= 1
+            title = await self.page.title()
+            if not _CAPTCHA_RE.search(title):
+                return title, False
+            self._distrust(url)
+            return title, True
+        try:
+            state = await self.page.evaluate(_PAGE_STATE_JS, _PAGE_STATE_ARGS)
+        except Exception:
+            # Page navigated or closed mid-check - title alone is still useful
+            title = await self.page.title()
+            return title, bool(_CAPTCHA_RE.search(title))
+        captcha = state["captcha"] or bool(_CAPTCHA_RE.search(state["title"]))
+        if captcha:
+            self._distrust(url)
+        else:
+            clean = self._captcha_clean_counts.get(origin, 0) + 1
+            self._captcha_clean_counts[origin] = clean
+            if clean >= _CAPTCHA_TRUST_AFTER and "google." not in origin:
+                self._captcha_trust[origin] = _CAPTCHA_TRUST_LOADS
+        return state["title"], captcha
+
+    def _distrust(self, url: str):
+        """Give an origin the full CAPTCHA check again (blocked, or extraction found nothing)."""
+        origin = urllib.parse.urlsplit(url).netloc
+        self._captcha_clean_counts.pop(origin, None)
+        self._captcha_trust.pop(origin, None)
 
     async def search_google_maps(self, query: str, limit: int = 5, lat: float = 12.9250, lng: float = 77.6400) -> Dict:
         """
@@ -397,82 +989,16 @@ class BrowserAgent:
             if not self.playwright:
                 self.playwright = await async_playwright().start()
             
-            # Enhanced browser args for Zomato - aggressive stealth measures
-            browser_args = [
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-web-security',
-                '--disable-features=IsolateOrigins,site-per-process',
-                '--disable-site-isolation-trials',
-                '--disable-features=BlockInsecurePrivateNetworkRequests',
-                '--disable-quic',   # Disable QUIC protocol (may help with some connection issues)
-                '--disable-background-networking',
-                '--disable-background-timer-throttling',
-                '--disable-renderer-backgrounding',
-            ]
-            
+            # Stealth flags plus aggressive connection settings for Zomato
             self.browser = await self.playwright.chromium.launch(
                 headless=settings.headless,
-                args=browser_args
+                args=BROWSER_ARGS + _STEALTH_ARGS + _ZOMATO_ARGS
             )
             
-            # Create context with realistic browser settings
-            context_options = {
-                'viewport': {'width': 1920, 'height': 1080},
-                'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'locale': 'en-IN',
-                'timezone_id': 'Asia/Kolkata',
-                'bypass_csp': True,
-                'ignore_https_errors': True,
-                'extra_http_headers': {
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                    'Sec-Fetch-Dest': 'document',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Sec-Fetch-Site': 'none',
-                    'Cache-Control': 'max-age=0',
-                }
-            }
-            
-            self.context = await self.browser.new_context(**context_options)
-            
-            # Enhanced stealth script
-            stealth_script = """
-                // Remove webdriver property
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                });
-                
-                // Override the `plugins` property
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => [1, 2, 3, 4, 5]
-                });
-                
-                // Override the `languages` property
-                Object.defineProperty(navigator, 'languages', {
-                    get: () => ['en-US', 'en']
-                });
-                
-                // Mock chrome object
-                window.chrome = {
-                    runtime: {}
-                };
-                
-                // Override permissions
-                const originalQuery = window.navigator.permissions.query;
-                window.navigator.permissions.query = (parameters) => (
-                    parameters.name === 'notifications' ?
-                        Promise.resolve({ state: Notification.permission }) :
-                        originalQuery(parameters)
-                );
-            """
+            # Realistic browser settings with the headers of a top-level navigation
+            self.context = await self.browser.new_context(**_ZOMATO_CONTEXT_OPTIONS)
             
-            await self.context.add_init_script(stealth_script)
+            await self.context.add_init_script(STEALTH_INIT_SCRIPT)
             self.page = await self.context.new_page()
             self._stealth_enabled = True
             
@@ -486,7 +1012,13 @@ class BrowserAgent:
         return await ZomatoHandler.search(self.page, self.context, query, location, city, limit, websocket=websocket, session_id=session_id, total_steps=total_steps, plan=plan)
 
     async def click(self, selector: str) -> dict:
-        """Click an element by selector with automatic fallback."""
+        """Click an element by selector with automatic fallback.
+        
+        The element that became visible first is scrolled to and located in a single
+        round-trip, then gets one real mouse click at its center. When it is disabled
+        or covered there, Playwright's locator click takes over, with its
+        actionability checks (waits for enabled, unobscured and stable).
+        """
         if not self.page:
             return {"status": "error", "error": "Browser not initialized"}
         
@@ -525,248 +1057,217 @@ class BrowserAgent:
                 # Fall through to normal click handling
                 pass
         
-        # List of selectors to try
-        selectors_to_try = [selector]
-        
-        # If it's a submit button, try common alternatives
-        if "button[type='submit']" in selector or "submit" in selector.lower():
-            # Add site-specific search button selectors
-            site_selectors = get_selectors_for_site(self.current_site)
-            selectors_to_try.extend(site_selectors.get("search_button", [])[:3])
-            selectors_to_try.extend([
-                "input[name='btnK']",  # Google search button
-                "input[type='submit']",
-                "input[value='Google Search']",
-                "input[value='Search']",
-                "button[aria-label*='Search']",
-                "button[aria-label*='search']"
-            ])
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        selectors_to_try = [x for x in selectors_to_try if not (x in seen or seen.add(x))]
-        
-        if "button" in selector and "submit" not in selector.lower():
-            # Try to find button by text if it's a generic button selector
-            selectors_to_try.extend([
-                "input[type='submit']",
-                "[role='button']"
-            ])
-        
-        # Try each selector
-        last_error = None
-        for sel in selectors_to_try:
+        # Candidate chain depends only on (site, selector) and is built once per pair
+        selectors_to_try = get_click_candidates(self.current_site, selector)
+        # Whatever worked here last time (this run or an earlier one) goes first
+        page_url = self.page.url
+        selectors_to_try = self._prefer_cached(page_url, selector, selectors_to_try)
+        
+        # Outcome of the fused path: {index, point}, {inputs} on timeout, or {invalid}
+        fused = {"invalid": True}
+        # Fast path: find and scroll to the first visible candidate in one round-trip,
+        # then page.mouse.click() at the point it reported - real input events, with no
+        # actionability polling since the probe already checked it is enabled and uncovered
+        try:
+            fused = await self.page.evaluate(
+                _RACE_SELECTORS_JS,
+                {"selectors": list(selectors_to_try), "timeout": 5000, "point": True}
+            )
+        except Exception as e:
+            # Page navigated mid-wait - the regular path below retries
+            logger.debug(f"Fused click failed: {e}")
+        if fused.get("point"):
+            sel = selectors_to_try[fused["index"]]
             try:
-                await self.page.wait_for_selector(sel, state="visible", timeout=5000)
-                # Scroll into view if needed - use proper escaping
-                try:
-                    await self.page.evaluate("""
-                        (selector) => {
-                            const el = document.querySelector(selector);
-                            if (el) el.scrollIntoView({ behavior: 'smooth', block: 'center' });
-                        }
-                    """, sel)
-                except:
-                    pass  # If scroll fails, continue anyway
-                await self.page.wait_for_timeout(500)
-                await self.page.click(sel)
-                return {
-                    "status": "success", 
+                await self.page.mouse.click(fused["point"]["x"], fused["point"]["y"])
+                return self._remember_action(page_url, selector, {
+                    "status": "success",
                     "selector": sel,
                     "original_selector": selector if sel != selector else None
-                }
+                })
+            except Exception as e:
+                logger.debug(f"Mouse click failed: {e}")
+        
+        if "inputs" in fused:
+            # Nothing became visible - no point waiting the same 5s again
+            self._remember_suggestions(fused["inputs"])
+            visible = None
+            last_error = f"Timeout 5000ms exceeded waiting for any of {len(selectors_to_try)} selectors"
+        else:
+            # Disabled or covered match, or non-CSS selectors: race the candidates,
+            # then click the first visible one
+            visible, _, last_error = await self._first_visible(selectors_to_try)
+        
+        if visible:
+            try:
+                # The locator click waits until the element is enabled and nothing covers it
+                await self.page.locator(visible).first.click(timeout=5000)
+                return self._remember_action(page_url, selector, {
+                    "status": "success", 
+                    "selector": visible,
+                    "original_selector": selector if visible != selector else None
+                })
             except Exception as e:
                 last_error = str(e)
-                continue
+            
+            # Winner wasn't clickable - the rest share one 5s budget instead of 5s each
+            others = [s for s in selectors_to_try if s != visible]
+            if others:
+                try:
+                    sel, locator = await self._any_visible(others)
+                    await locator.click(timeout=5000)
+                    return self._remember_action(page_url, selector, {
+                        "status": "success",
+                        "selector": sel,
+                        "original_selector": selector if sel != selector else None
+                    })
+                except Exception as e:
+                    last_error = str(e)
         
         # If all failed, get suggestions
         suggestions = await self._suggest_selectors(selector)
-        return {
+        return self._remember_action(page_url, selector, {
             "status": "error",
             "error": f"Selector not found: {last_error}",
             "selector": selector,
             "suggestions": suggestions,
             "tried_selectors": selectors_to_try[:5]
-        }
+        })
 
-    async def type_text(self, selector: str, text: str) -> dict:
-        """Type text into an input field with automatic fallback to alternatives."""
+    async def type_text(self, selector: str, text: str, per_key_delay: int = 0) -> dict:
+        """Type text into an input field with automatic fallback to alternatives.
+        
+        Args:
+            selector: CSS selector of the input
+            text: Text to enter
+            per_key_delay: If set, finish with real keystrokes at this delay (ms) instead of
+                filling, for autocomplete widgets that listen for key events
+        """
         if not self.page:
             return {"status": "error", "error": "Browser not initialized"}
         
-        # List of selectors to try in order
-        selectors_to_try = [selector]
-        
-        # Get site-specific selectors if available
-        site_selectors = get_selectors_for_site(self.current_site)
-        if selector not in site_selectors.get("search_input", []):
-            # Add site-specific search input selectors
-            selectors_to_try.extend(site_selectors.get("search_input", [])[:3])
+        # Candidate chain depends only on (site, selector) and is built once per pair
+        selectors_to_try = get_type_candidates(self.current_site, selector)
+        # Whatever worked here last time (this run or an earlier one) goes first
+        page_url = self.page.url
+        selectors_to_try = self._prefer_cached(page_url, selector, selectors_to_try)
         
-        # For Google Maps, prioritize the searchboxinput selector
-        if self.current_site == "google_maps":
-            if "input#searchboxinput" not in selectors_to_try:
-                selectors_to_try.insert(0, "input#searchboxinput")
-            # Also add other Maps-specific selectors
-            if "input[aria-label*='Search']" not in selectors_to_try:
-                selectors_to_try.insert(1, "input[aria-label*='Search']")
-        
-        # For YouTube, add YouTube-specific selectors
-        if self.current_site == "youtube":
-            youtube_selectors = [
-                "input[name='search_query']",
-                "#search",
-                "input#search",
-                "input[placeholder*='Search']",
-                "input[aria-label*='Search']"
-            ]
-            for yt_sel in youtube_selectors:
-                if yt_sel not in selectors_to_try:
-                    selectors_to_try.insert(0, yt_sel)
-        
-        # If the original selector is input[name='q'], add textarea alternative (common for Google, etc.)
-        if "input[name='q']" in selector:
-            selectors_to_try.extend([
-                "textarea[name='q']",
-                "#APjFqb",  # Google's search box ID
-                "textarea",
-                "input[type='search']",
-                "[role='searchbox']"
-            ])
-        elif "input" in selector and "textarea" not in selector:
-            # If it's an input selector, also try textarea
-            textarea_version = selector.replace("input", "textarea")
-            selectors_to_try.append(textarea_version)
-            selectors_to_try.extend([
-                "textarea[name='q']",
-                "input[type='search']",
-                "[role='searchbox']"
-            ])
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        selectors_to_try = [x for x in selectors_to_try if not (x in seen or seen.add(x))]
-        
-        # Try each selector until one works
-        last_error = None
-        for sel in selectors_to_try:
+        # Race the candidates, then type into the first visible one. If that one
+        # rejects the input, the rest get a single shared wait as a fallback
+        visible, element, last_error = await self._first_visible(selectors_to_try)
+        if visible:
             try:
-                await self.page.wait_for_selector(sel, state="visible", timeout=5000)
-                element = await self.page.query_selector(sel)
-                if element:
-                    # Clear existing value first
-                    await self.page.fill(sel, "")
-                    # Type the text
-                    await self.page.type(sel, text, delay=50)
-                    
-                    # For Google Maps, automatically press Enter after typing
-                    if self.current_site == "google_maps":
-                        await asyncio.sleep(0.5)  # Small delay to ensure typing is complete
-                        await self.page.keyboard.press("Enter")
-                        
-                        # Wait for URL to change (search executed)
-                        current_url = self.page.url
-                        try:
-                            await self.page.wait_for_url(lambda url: url != current_url, timeout=8000)
-                        except:
-                            pass
-                        
-                        # Wait for results to load - Google Maps needs much more time
-                        
-                        # Poll for results over time instead of just waiting
-                        max_wait = 15  # seconds
-                        poll_interval = 2  # seconds
-                        result_count = 0
-                        
-                        for i in range(0, max_wait, poll_interval):
-                            await asyncio.sleep(poll_interval)
-                            result_count = await self.page.evaluate("""
-                                () => {
-                                    // Try multiple strategies to find results
-                                    let count = 0;
-                                    count = Math.max(count, document.querySelectorAll('div[role="article"]').length);
-                                    count = Math.max(count, document.querySelectorAll('[data-result-index]').length);
-                                    const h3s = document.querySelectorAll('h3');
-                                    count = Math.max(count, h3s.length);
-                                    
-                                    // Also try finding any divs with ratings
-                                    const withRatings = document.querySelectorAll('[aria-label*="star"]');
-                                    count = Math.max(count, withRatings.length);
-                                    
-                                    return count;
-                                }
-                            """)
-                            
-                            
-                            if result_count >= 3:  # If we found at least 3 results, stop polling
-                                break
-                        
-                        # Get page structure info for debugging
-                        page_info = await self.page.evaluate("""
-                            () => {
-                                const allDivs = document.querySelectorAll('div');
-                                const allH3s = document.querySelectorAll('h3');
-                                return {
-                                    totalDivs: allDivs.length,
-                                    totalH3s: allH3s.length,
-                                    sampleH3Text: Array.from(allH3s).slice(0, 5).map(h3 => h3.textContent?.trim()),
-                                    hasResults: document.querySelector('#pane') !== null,
-                                    hasSidebar: document.querySelector('[role="main"]') !== null
-                                };
-                            }
-                        """)
-                        
-                        return {
-                            "status": "success", 
-                            "selector": sel, 
-                            "text": text,
-                            "original_selector": selector if sel != selector else None,
-                            "note": "Search submitted automatically on Google Maps"
-                        }
-                    
-                    # For YouTube, automatically press Enter after typing (no need for click)
-                    elif self.current_site == "youtube":
-                        await asyncio.sleep(0.5)  # Small delay to ensure typing is complete
-                        await self.page.keyboard.press("Enter")
-                        
-                        # Wait for URL to change (search executed) or results to appear
-                        current_url = self.page.url
-                        try:
-                            await self.page.wait_for_url(lambda url: url != current_url or "results" in url.lower() or "search_query" in url.lower(), timeout=10000)
-                        except:
-                            pass
-                        
-                        # Wait a bit for results to load
-                        await asyncio.sleep(2)
-                        
-                        return {
-                            "status": "success", 
-                            "selector": sel, 
-                            "text": text,
-                            "original_selector": selector if sel != selector else None,
-                            "note": "Search submitted automatically on YouTube (Enter pressed)"
-                        }
-                    
-                    return {
-                        "status": "success", 
-                        "selector": sel, 
-                        "text": text,
-                        "original_selector": selector if sel != selector else None
-                    }
+                # The race already handed us the visible element
+                return await self._type_into(page_url, selector, visible, element, text, per_key_delay)
             except Exception as e:
                 last_error = str(e)
-                continue
+            
+            others = [s for s in selectors_to_try if s != visible]
+            if others:
+                try:
+                    sel, target = await self._any_visible(others)
+                    return await self._type_into(page_url, selector, sel, target, text, per_key_delay)
+                except Exception as e:
+                    last_error = str(e)
         
-        # If all selectors failed, get suggestions
+        # If all selectors failed, get suggestions. The only visible field is the likely
+        # target, but it is reported rather than typed into - it may be unrelated
         suggestions = await self._suggest_selectors(selector)
-        
-        return {
+        return self._remember_action(page_url, selector, {
             "status": "error",
             "error": f"Selector not found: {last_error}",
             "selector": selector,
             "suggestions": suggestions,
+            "suggested_selector": await self._sole_visible(suggestions),
             "tried_selectors": selectors_to_try[:5]  # Show what we tried
-        }
+        })
+
+    async def _type_into(self, page_url: str, selector: str, sel: str, target, text: str,
+                         per_key_delay: int = 0) -> dict:
+        """Enter `text` into `target` (matched by `sel`, standing in for `selector`) and submit where the site expects it."""
+        if per_key_delay:
+            # Real keystrokes for inputs that only react to key events. fill()
+            # replaces the old value, focuses the field and sets the bulk of the
+            # text in one call, leaving the caret at the end for the last keys
+            head, tail = text[:-_KEYSTROKE_TAIL], text[-_KEYSTROKE_TAIL:]
+            await target.fill(head)
+            await self.page.keyboard.type(tail, delay=per_key_delay)
+        else:
+            # fill() clears and sets the value in one call
+            await target.fill(text)
+            if not await self._value_registered(target, text):
+                # Some widgets reset values set from script and only accept key events;
+                # retype as real keystrokes (fill() left the field focused)
+                await target.fill("")
+                await self.page.keyboard.type(text)
+        
+        # For Google Maps, automatically press Enter after typing
+        if self.current_site == "google_maps":
+            await self.page.keyboard.press("Enter")
+            
+            # Wait for URL to change (search executed)
+            current_url = self.page.url
+            try:
+                await self.page.wait_for_url(lambda url: url != current_url, timeout=8000)
+            except:
+                pass
+            
+            # Wait for results to load - Google Maps needs much more time.
+            # Checked in the page every frame, so this returns once 3+ results
+            # are rendered (up to 15s) rather than on a 2s Python poll
+            try:
+                await self.page.wait_for_function("""
+                    () => {
+                        // Try multiple strategies to find results
+                        const count = Math.max(
+                            document.querySelectorAll('div[role="article"]').length,
+                            document.querySelectorAll('[data-result-index]').length,
+                            document.querySelectorAll('h3').length,
+                            // Also try finding any divs with ratings
+                            document.querySelectorAll('[aria-label*="star"]').length
+                        );
+                        return count >= 3;
+                    }
+                """, timeout=15000)
+            except Exception:
+                pass  # Report the search as submitted; later steps wait for their own elements
+            
+            return self._remember_action(page_url, selector, {
+                "status": "success", 
+                "selector": sel, 
+                "text": text,
+                "original_selector": selector if sel != selector else None,
+                "note": "Search submitted automatically on Google Maps"
+            })
+        
+        # For YouTube, automatically press Enter after typing (no need for click)
+        elif self.current_site == "youtube":
+            await self.page.keyboard.press("Enter")
+            
+            # Wait for URL to change (search executed) or results to appear
+            current_url = self.page.url
+            try:
+                await self.page.wait_for_url(lambda url: url != current_url or "results" in url.lower() or "search_query" in url.lower(), timeout=10000)
+            except:
+                pass
+            
+            # Wait a bit for results to load
+            await asyncio.sleep(2)
+            
+            return self._remember_action(page_url, selector, {
+                "status": "success", 
+                "selector": sel, 
+                "text": text,
+                "original_selector": selector if sel != selector else None,
+                "note": "Search submitted automatically on YouTube (Enter pressed)"
+            })
+        
+        return self._remember_action(page_url, selector, {
+            "status": "success", 
+            "selector": sel, 
+            "text": text,
+            "original_selector": selector if sel != selector else None
+        })
 
     async def wait_for(self, selector: str, timeout: int = 5000) -> dict:
         """Wait for an element to appear."""
@@ -792,10 +1293,8 @@ class BrowserAgent:
             
             # Check if results are already present by looking for h3 elements (result names)
             try:
-                h3_count = await self.page.evaluate("() => document.querySelectorAll('h3').length")
+                h3_count = await self.page.evaluate(_COUNT_JS, "h3")
                 if h3_count >= 3:  # If we have at least 3 h3s, likely results are there
-                    # Also check if we can find rating elements
-                    rating_count = await self.page.evaluate("() => document.querySelectorAll('[aria-label*=\"star\"]').length")
                     return {"status": "success", "selector": "h3 (indicator)", "original_selector": selector, "note": f"Results detected via h3 count ({h3_count} found)"}
             except Exception as e:
                 pass
@@ -810,22 +1309,14 @@ class BrowserAgent:
                 "[aria-label*='star']"  # Rating elements also indicate results
             ]
             
-            container_found = False
-            found_selector = None
-            
-            for container_sel in container_selectors:
-                try:
-                    # Use a reasonable timeout per selector
-                    await self.page.wait_for_selector(container_sel, state="visible", timeout=max(3000, timeout // len(container_selectors)))
-                    count = await self.page.evaluate(f"() => document.querySelectorAll('{container_sel}').length")
-                    if count > 0:
-                        container_found = True
-                        found_selector = container_sel
-                        # Wait a bit more for individual elements to render
-                        await asyncio.sleep(1)
-                        break
-                except Exception as e:
-                    continue
+            # Race the indicators - whichever shows up first means results are rendering
+            found_selector, element, _ = await self._first_visible(container_selectors, timeout=max(3000, timeout))
+            container_found = found_selector is not None
+            if element:
+                await element.dispose()
+            if container_found:
+                # Wait a bit more for individual elements to render
+                await asyncio.sleep(1)
             
             if container_found:
                 # If we were waiting for a specific element, try to find it
@@ -839,62 +1330,187 @@ class BrowserAgent:
                 else:
                     return {"status": "success", "selector": found_selector or selector}
         
-        try:
-            await self.page.wait_for_selector(selector, state="visible", timeout=timeout)
+        # In-page MutationObserver wait: resolves on the mutation that shows the element
+        # instead of on the next polling tick (plain wait_for_selector for non-CSS selectors)
+        found, element, last_error = await self._first_visible((selector,), timeout=timeout)
+        if found:
+            if element:
+                await element.dispose()
             return {"status": "success", "selector": selector}
-        except Exception as e:
-            # Check if we got redirected to CAPTCHA during wait
-            captcha_detected = await self._detect_captcha()
-            if captcha_detected:
-                return {
-                    "status": "blocked",
-                    "error": "Page redirected to CAPTCHA during wait",
-                    "selector": selector,
-                    "block_type": "captcha",
-                    "message": "Google blocked the request. Try using Zomato or Swiggy instead for local discovery."
-                }
-            
-            suggestions = await self._suggest_selectors(selector)
+        
+        # Check if we got redirected to CAPTCHA during wait
+        captcha_detected = await self._detect_captcha()
+        if captcha_detected:
             return {
-                "status": "error",
-                "error": f"Element not found within timeout: {str(e)}",
+                "status": "blocked",
+                "error": "Page redirected to CAPTCHA during wait",
                 "selector": selector,
-                "suggestions": suggestions
+                "block_type": "captcha",
+                "message": "Google blocked the request. Try using Zomato or Swiggy instead for local discovery."
             }
+        
+        suggestions = await self._suggest_selectors(selector)
+        return {
+            "status": "error",
+            "error": f"Element not found within timeout: {last_error}",
+            "selector": selector,
+            "suggestions": suggestions
+        }
     
+    async def _any_visible(self, selectors: Iterable[str], timeout: int = 5000) -> tuple:
+        """Wait once for any of `selectors` to be visible.
+        
+        One OR-ed locator shares a single timeout, so N fallbacks cost one wait
+        rather than N. The match is then attributed to the earliest visible
+        selector in list order.
+        
+        Returns:
+            (selector, locator) of the matched element; raises on timeout
+        """
+        selectors = list(selectors)
+        combined = reduce(Locator.or_, (self.page.locator(sel) for sel in selectors))
+        await combined.first.wait_for(state="visible", timeout=timeout)
+        for sel in selectors:
+            locator = self.page.locator(sel).first
+            if await locator.is_visible():
+                return sel, locator
+        # Matched element went away between the wait and the attribution
+        raise PlaywrightTimeout(f"None of {len(selectors)} selectors stayed visible")
+
+    async def _first_visible(self, selectors: Sequence[str], timeout: int = 5000) -> tuple:
+        """Wait for all selectors concurrently and return (selector, element, last_error).
+        
+        Instead of paying the full timeout for every missing candidate in turn, the
+        waits overlap. When several become visible together the earliest in the list
+        wins, so priority order is kept. The winner's ElementHandle is returned so the
+        caller can act on it without resolving the selector again.
+        Returns (None, None, error) if none appear.
+        """
+        try:
+            # Plain CSS lists are watched in-page with one MutationObserver
+            race = await self.page.evaluate_handle(
+                _RACE_SELECTORS_JS, {"selectors": list(selectors), "timeout": timeout, "point": False}
+            )
+            try:
+                props = await race.get_properties()
+                if "element" in props:
+                    index = await props["index"].json_value()
+                    await props["index"].dispose()
+                    return selectors[index], props["element"].as_element(), None
+                if "inputs" in props:
+                    self._remember_suggestions(await props["inputs"].json_value())
+                    await props["inputs"].dispose()
+                    return None, None, f"Timeout {timeout}ms exceeded waiting for any of {len(selectors)} selectors"
+            finally:
+                await race.dispose()
+        except Exception as e:
+            # Page navigated mid-wait - retry below against the new document
+            logger.debug(f"In-page selector race failed: {e}")
+        
+        tasks = {
+            asyncio.create_task(self.page.wait_for_selector(sel, state="visible", timeout=timeout)): sel
+            for sel in selectors
+        }
+        pending = set(tasks)
+        last_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = {}
+                for task in done:
+                    if task.exception() is None:
+                        winners[tasks[task]] = task.result()
+                    else:
+                        last_error = str(task.exception())
+                if winners:
+                    best = min(winners, key=selectors.index)
+                    for sel, element in winners.items():
+                        if sel != best and element:
+                            await element.dispose()
+                    return best, winners[best], None
+            return None, None, last_error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
     async def _suggest_selectors(self, original_selector: str) -> list:
         """Suggest alternative selectors if the original fails."""
         if not self.page:
             return []
         
+        # Suggestions only depend on the page's inputs, so scan each URL once
+        url = self.page.url
+        cached = self._suggest_cache.get(url)
+        if cached is not None:
+            self._suggest_cache.move_to_end(url)
+            return list(cached)
+        # SPAs change the URL without navigate(); don't rescan on every failure in a burst
+        if time.monotonic() - self._last_suggest_ts < _SUGGEST_MIN_INTERVAL:
+            return list(self._last_suggestions)
+        
         try:
-            # Get all input elements on the page
-            inputs = await self.page.evaluate("""
-                () => {
-                    const inputs = Array.from(document.querySelectorAll('input, textarea, [contenteditable="true"]'));
-                    return inputs.slice(0, 5).map(el => ({
-                        tag: el.tagName.toLowerCase(),
-                        type: el.type || 'text',
-                        name: el.name || '',
-                        id: el.id || '',
-                        placeholder: el.placeholder || '',
-                        className: el.className || ''
-                    }));
-                }
-            """)
-            
-            suggestions = []
-            for inp in inputs:
-                if inp['id']:
-                    suggestions.append(f"#{inp['id']}")
-                if inp['name']:
-                    suggestions.append(f"{inp['tag']}[name='{inp['name']}']")
-                if inp['placeholder']:
-                    suggestions.append(f"{inp['tag']}[placeholder*='{inp['placeholder'][:20]}']")
-            
-            return list(set(suggestions))[:5]  # Return unique suggestions, max 5
-        except:
+            inputs = await self.page.evaluate(_DESCRIBE_INPUTS_JS)
+        except Exception:
             return []
+        return list(self._remember_suggestions(inputs))
+
+    async def _value_registered(self, target, text: str) -> bool:
+        """Whether `target` now holds `text`; True when it has no value to read (e.g. contenteditable)."""
+        try:
+            return await target.input_value() == text
+        except Exception:
+            return True
+
+    async def _sole_visible(self, selectors: List[str]) -> Optional[str]:
+        """The selector of the only visible element among `selectors`, else None (one round-trip)."""
+        if not selectors:
+            return None
+        try:
+            found = await self.page.evaluate(_PROBE_JS, selectors)
+        except Exception:
+            return None
+        visible = [probe["sel"] for probe in found if probe["visible"]]
+        return visible[0] if len(visible) == 1 else None
+
+    def _prefer_cached(self, url: str, selector: str, candidates: tuple) -> tuple:
+        """Move the candidate that last worked for `selector` on this origin to the front."""
+        cached = action_cache.get(url, selector)
+        if not cached or cached == candidates[0] or cached not in candidates:
+            return candidates
+        return (cached, *(s for s in candidates if s != cached))
+
+    def _remember_action(self, url: str, selector: str, result: dict) -> dict:
+        """Record the candidate that worked, or drop a stale entry when none did; returns result."""
+        if result.get("status") == "success":
+            action_cache.put(url, selector, result["selector"])
+        else:
+            action_cache.evict(url, selector)
+        return result
+
+    def _remember_suggestions(self, inputs: List[dict]) -> List[str]:
+        """Turn described inputs into selector suggestions and cache them for the current URL.
+        
+        Failing race calls pass the inputs they collected on timeout, so the
+        _suggest_selectors call that follows is a cache hit.
+        """
+        suggestions = []
+        for inp in inputs:
+            if inp['id']:
+                suggestions.append(f"#{inp['id']}")
+            if inp['name']:
+                suggestions.append(f"{inp['tag']}[name='{inp['name']}']")
+            if inp['placeholder']:
+                suggestions.append(f"{inp['tag']}[placeholder*='{inp['placeholder'][:20]}']")
+        
+        suggestions = list(dict.fromkeys(suggestions))[:5]  # Unique suggestions in page order, max 5
+        self._suggest_cache[self.page.url] = suggestions
+        if len(self._suggest_cache) > _SUGGEST_CACHE_SIZE:
+            self._suggest_cache.popitem(last=False)
+        self._last_suggest_ts = time.monotonic()
+        self._last_suggestions = suggestions
+        return suggestions
 
     async def analyze_form(self, user_instruction: str = "") -> dict:
         """Analyze form on the page and determine what fields to fill using LLM.
@@ -943,104 +1559,7 @@ class BrowserAgent:
                 await asyncio.sleep(2)
             
             # Extract form structure from the page
-            form_data = await self.page.evaluate("""
-                () => {
-                    const forms = Array.from(document.querySelectorAll('form'));
-                    if (forms.length === 0) {
-                        // If no form tag, look for form-like structures
-                        const inputs = Array.from(document.querySelectorAll('input, textarea, select'));
-                        if (inputs.length > 0) {
-                            return {
-                                hasFormTag: false,
-                                fields: inputs.map((el, idx) => ({
-                            index: idx,
-                            tag: el.tagName.toLowerCase(),
-                            type: el.type || 'text',
-                            name: el.name || '',
-                            id: el.id || '',
-                            placeholder: el.placeholder || '',
-                            value_attr: el.getAttribute('value') || '',
-                            label: (() => {
-                                // Try to find associated label
-                                if (el.id) {
-                                    const label = document.querySelector(`label[for="${el.id}"]`);
-                                    if (label) return label.textContent?.trim() || '';
-                                }
-                                // Try to find label as parent or sibling
-                                const parent = el.parentElement;
-                                if (parent) {
-                                    const label = parent.querySelector('label');
-                                    if (label) return label.textContent?.trim() || '';
-                                }
-                                // Try previous sibling
-                                let prev = el.previousElementSibling;
-                                if (prev && prev.tagName.toLowerCase() === 'label') {
-                                    return prev.textContent?.trim() || '';
-                                }
-                                // Try next sibling (for checkboxes/radios often come after)
-                                let next = el.nextElementSibling;
-                                if (next && next.tagName.toLowerCase() === 'label') {
-                                    return next.textContent?.trim() || '';
-                                }
-                                return '';
-                            })(),
-                            required: el.hasAttribute('required') || el.getAttribute('aria-required') === 'true',
-                            pattern: el.getAttribute('pattern') || '',
-                            autocomplete: el.getAttribute('autocomplete') || '',
-                            className: el.className || '',
-                            value: el.value || '',
-                            checked: el.checked || false
-                        }))
-                            };
-                        }
-                    }
-                    
-                    // Process forms
-                    const form = forms[0]; // Use first form
-                    const inputs = Array.from(form.querySelectorAll('input, textarea, select'));
-                    
-                    return {
-                        hasFormTag: true,
-                        formAction: form.action || '',
-                        formMethod: form.method || 'get',
-                        fields: inputs.map((el, idx) => ({
-                            index: idx,
-                            tag: el.tagName.toLowerCase(),
-                            type: el.type || 'text',
-                            name: el.name || '',
-                            id: el.id || '',
-                            placeholder: el.placeholder || '',
-                            value_attr: el.getAttribute('value') || '',
-                            label: (() => {
-                                if (el.id) {
-                                    const label = document.querySelector(`label[for="${el.id}"]`);
-                                    if (label) return label.textContent?.trim() || '';
-                                }
-                                const parent = el.parentElement;
-                                if (parent) {
-                                    const label = parent.querySelector('label');
-                                    if (label) return label.textContent?.trim() || '';
-                                }
-                                let prev = el.previousElementSibling;
-                                if (prev && prev.tagName.toLowerCase() === 'label') {
-                                    return prev.textContent?.trim() || '';
-                                }
-                                let next = el.nextElementSibling;
-                                if (next && next.tagName.toLowerCase() === 'label') {
-                                    return next.textContent?.trim() || '';
-                                }
-                                return '';
-                            })(),
-                            required: el.hasAttribute('required') || el.getAttribute('aria-required') === 'true',
-                            pattern: el.getAttribute('pattern') || '',
-                            autocomplete: el.getAttribute('autocomplete') || '',
-                            className: el.className || '',
-                            value: el.value || '',
-                            checked: el.checked || false
-                        }))
-                    };
-                }
-            """)
+            form_data = await self.page.evaluate(_ANALYZE_FORM_JS)
             
             if not form_data or not form_data.get("fields") or len(form_data["fields"]) == 0:
                 return {
@@ -1181,23 +1700,28 @@ EXAMPLES:
             }
             
         except Exception as e:
-            import traceback
-            error_trace = traceback.format_exc()
+            logger.exception("Form analysis failed")
             return {
                 "status": "error",
                 "error": str(e),
-                "traceback": error_trace
+                "traceback": traceback.format_exc() if self.debug else None
             }
     
-    async def fill_form(self, fields: dict) -> dict:
-        """Fill form fields dynamically with human-like behavior.
+    async def fill_form(self, fields: dict, typing_mode: str = "fast") -> dict:
+        """Fill form fields dynamically.
         
         fields format: {"field_name": {"selector": "css_selector", "value": "text", "type": "email|password|text"}}
+        
+        Args:
+            fields: Fields to fill, as above
+            typing_mode: "fast" sets each value in one call; "keystroke" clicks, pauses and
+                types key by key with human-like delays, for forms that watch key events
         """
         if not self.page:
             return {"status": "error", "error": "Browser not initialized"}
         
         results = {}
+        keystroke = typing_mode == "keystroke"
         
         for field_name, field_info in fields.items():
             selector = field_info.get("selector")
@@ -1207,24 +1731,19 @@ EXAMPLES:
             if not selector or value is None:
                 continue
             
-            # Add random delay between fields to simulate human behavior
-            await asyncio.sleep(random.uniform(0.3, 0.8))
+            if keystroke:
+                # Add random delay between fields to simulate human behavior
+                await asyncio.sleep(random.uniform(0.3, 0.8))
             
             try:
                 # Try to find and fill the field
                 await self.page.wait_for_selector(selector, state="visible", timeout=5000)
                 
-                # Scroll field into view
-                await self.page.evaluate(f"""
-                    (selector) => {{
-                        const el = document.querySelector(selector);
-                        if (el) {{
-                            el.scrollIntoView({{ behavior: 'smooth', block: 'center' }});
-                        }}
-                    }}
-                """, selector)
-                
-                await asyncio.sleep(0.2)
+                if keystroke:
+                    # Scroll field into view the way a user would (fill/check/select scroll by themselves)
+                    await self.page.evaluate(_SMOOTH_SCROLL_JS, selector)
+                    
+                    await asyncio.sleep(0.2)
                 
                 # Handle different field types
                 if field_type == "select":
@@ -1252,16 +1771,7 @@ EXAMPLES:
                         
                 else:
                     # For input fields (text, email, password, tel, etc.)
-                    # Click the field to focus (human-like)
-                    await self.page.click(selector)
-                    await asyncio.sleep(0.1)
-                    
-                    # Clear the field first
-                    await self.page.fill(selector, "")
-                    
-                    # Type with random delays to simulate human typing
-                    for char in str(value):
-                        await self.page.type(selector, char, delay=random.randint(30, 100))
+                    await self._enter_value(selector, str(value), keystroke)
                     
                     # Verify the value was set
                     filled_value = await self.page.input_value(selector)
@@ -1307,13 +1817,7 @@ EXAMPLES:
                 for alt_selector in alternative_selectors:
                     try:
                         await self.page.wait_for_selector(alt_selector, state="visible", timeout=2000)
-                        await self.page.click(alt_selector)
-                        await asyncio.sleep(0.1)
-                        await self.page.fill(alt_selector, "")
-                        
-                        # Type with delays
-                        for char in str(value):
-                            await self.page.type(alt_selector, char, delay=random.randint(30, 100))
+                        await self._enter_value(alt_selector, str(value), keystroke)
                         
                         results[field_name] = {
                             "status": "success", 
@@ -1340,6 +1844,19 @@ EXAMPLES:
             "total_count": total_count
         }
     
+    async def _enter_value(self, selector: str, value: str, keystroke: bool):
+        """Put `value` into a text field, in one call or (keystroke) like a person typing."""
+        if not keystroke:
+            # fill() focuses, clears and sets the value in one call
+            await self.page.fill(selector, value)
+            return
+        # Click the field to focus (human-like), clear it, then type with a human-ish delay.
+        # keyboard.type sends the whole string in one call instead of one call per character
+        await self.page.click(selector)
+        await asyncio.sleep(0.1)
+        await self.page.fill(selector, "")
+        await self.page.keyboard.type(value, delay=random.randint(30, 100))
+
     async def submit_form(self, selector: str = None) -> dict:
         """Submit a form by selector or find submit button.
         
@@ -1361,32 +1878,7 @@ EXAMPLES:
             # Try to capture form data before submission
             form_data = {}
             try:
-                form_data = await self.page.evaluate("""
-                    () => {
-                        const form = document.querySelector('form');
-                        if (!form) return {};
-                        
-                        const data = {};
-                        const inputs = form.querySelectorAll('input, textarea, select');
-                        inputs.forEach(input => {
-                            if (input.type === 'checkbox' || input.type === 'radio') {
-                                if (input.checked) {
-                                    const name = input.name || input.id;
-                                    if (name) {
-                                        if (!data[name]) data[name] = [];
-                                        data[name].push(input.value || input.checked);
-                                    }
-                                }
-                            } else if (input.type !== 'submit' && input.type !== 'button' && input.type !== 'hidden') {
-                                const name = input.name || input.id;
-                                if (name && input.value) {
-                                    data[name] = input.value;
-                                }
-                            }
-                        });
-                        return data;
-                    }
-                """)
+                form_data = await self.page.evaluate(_FORM_VALUES_JS)
             except:
                 pass
             
@@ -1495,257 +1987,235 @@ EXAMPLES:
             return {}
         
         try:
-            result = await self.page.evaluate("""
-                () => {
-                    const info = {
-                        hasSuccessMessage: false,
-                        hasErrorMessage: false,
-                        successSelectors: [],
-                        errorSelectors: [],
-                        messages: [],
-                        urlChanged: false
-                    };
-                    
-                    // Common success indicators
-                    const successPatterns = [
-                        /success/i,
-                        /thank you/i,
-                        /registered/i,
-                        /signed up/i,
-                        /created/i,
-                        /welcome/i,
-                        /confirmed/i,
-                        /verified/i
-                    ];
-                    
-                    // Common error indicators
-                    const errorPatterns = [
-                        /error/i,
-                        /invalid/i,
-                        /required/i,
-                        /failed/i,
-                        /try again/i,
-                        /incorrect/i
-                    ];
-                    
-                    // Check for success/error messages in common locations
-                    const selectors = [
-                        '.success', '.success-message', '.alert-success', '[class*="success"]',
-                        '.error', '.error-message', '.alert-error', '[class*="error"]',
-                        '.message', '.notification', '.alert', '.toast',
-                        '[role="alert"]', '[role="status"]',
-                        'div[class*="message"]', 'p[class*="message"]'
-                    ];
-                    
-                    for (const sel of selectors) {
-                        try {
-                            const elements = document.querySelectorAll(sel);
-                            elements.forEach(el => {
-                                const text = el.textContent?.toLowerCase() || '';
-                                const isVisible = el.offsetParent !== null && 
-                                                 window.getComputedStyle(el).display !== 'none';
-                                
-                                if (isVisible && text.length > 0) {
-                                    const isSuccess = successPatterns.some(pattern => pattern.test(text));
-                                    const isError = errorPatterns.some(pattern => pattern.test(text));
-                                    
-                                    if (isSuccess) {
-                                        info.hasSuccessMessage = true;
-                                        info.successSelectors.push(sel);
-                                        info.messages.push({
-                                            type: 'success',
-                                            selector: sel,
-                                            text: el.textContent?.trim() || ''
-                                        });
-                                    } else if (isError) {
-                                        info.hasErrorMessage = true;
-                                        info.errorSelectors.push(sel);
-                                        info.messages.push({
-                                            type: 'error',
-                                            selector: sel,
-                                            text: el.textContent?.trim() || ''
-                                        });
-                                    }
-                                }
-                            });
-                        } catch (e) {
-                            continue;
-                        }
-                    }
-                    
-                    // Also check page title and body text for indicators
-                    const bodyText = document.body.textContent?.toLowerCase() || '';
-                    const titleText = document.title.toLowerCase();
-                    
-                    if (successPatterns.some(p => p.test(bodyText) || p.test(titleText))) {
-                        info.hasSuccessMessage = true;
-                    }
-                    if (errorPatterns.some(p => p.test(bodyText) || p.test(titleText))) {
-                        info.hasErrorMessage = true;
-                    }
-                    
-                    return info;
-                }
-            """)
+            result = await self.page.evaluate(_FORM_RESULT_JS)
             
             return result
         except Exception as e:
             return {}
 
-    async def extract(self, schema: dict, limit: int = None) -> dict:
+    def _get_merged_selectors(self, schema: dict, site: str = None) -> Dict[str, List[str]]:
+        """Build the selector list for each schema field, cached per (site, field, selector)."""
+        site = site or self.current_site
+        merged = {}
+        site_selectors = None
+        for field, selector in schema.items():
+            cache_key = (site, field, selector)
+            selectors = self._merged_selectors.get(cache_key)
+            if selectors is None:
+                if site_selectors is None:
+                    site_selectors = self._site_selectors if site == self.current_site else get_selectors_for_site(site)
+                site_key = _SCHEMA_SITE_SELECTOR_KEYS.get(field)
+                selectors = [selector, *(site_selectors.get(site_key, _EMPTY_LIST) if site_key else _EMPTY_LIST)]
+                self._merged_selectors[cache_key] = selectors
+            merged[field] = selectors
+        return merged
+
+    async def batch_extract(self, urls: List[str], schema: dict, limit: int = None,
+                            concurrency: int = 10, timeout: int = 30000, static_first: bool = False,
+                            site: Optional[str] = None) -> dict:
+        """Navigate to and extract from several URLs concurrently.
+        
+        Each URL is loaded in a worker page of this agent's context (at most `concurrency`
+        at once; idle pages are reused across URLs and calls). A failing URL is reported in its own entry and doesn't stop the batch.
+        
+        With static_first, each URL is first fetched over plain HTTP and parsed without
+        a browser (needs selectolax); the browser is only used when that comes back empty.
+        Worth it for server-rendered pages, wasted work for script-rendered ones.
+        
+        The site whose selectors and extraction rules apply is detected per URL unless
+        `site` is given - "generic" suits pages that aren't result listings, such as
+        product detail pages.
+        
+        Returns: {"status": "success", "results": [{"url": ..., "status": ..., "data": [...]}, ...], "count": N}
+        where count is the number of URLs extracted successfully.
+        """
+        if not self.context:
+            await self.start()
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        client = None
+        if static_first:
+            client = httpx.AsyncClient(
+                headers={**CONTEXT_OPTIONS["extra_http_headers"], "User-Agent": CONTEXT_OPTIONS["user_agent"]},
+                follow_redirects=True,
+                timeout=timeout / 1000
+            )
+        
+        async def extract_one(url: str) -> dict:
+            async with semaphore:
+                if not url.startswith(('http://', 'https://', 'file://', 'about:', 'data:')):
+                    url = 'https://' + url
+                url_site = site or detect_site_from_url(url)
+                if client and url.startswith(('http://', 'https://')) and url_site not in BROWSER_ONLY_SITES:
+                    static = await self._extract_static(client, url, schema, limit, url_site)
+                    if static:
+                        return static
+                async with self._worker_page() as page:
+                    await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+                    # Listing pages render their cards after DOMContentLoaded
+                    containers = get_selectors_for_site(url_site).get("product_container")
+                    if containers:
+                        try:
+                            await page.wait_for_selector(", ".join(containers), timeout=5000)
+                        except Exception:
+                            pass  # Extract whatever is there
+                    return await self._extract_page(schema, limit, page=page, site=url_site)
+        
+        try:
+            results = await asyncio.gather(*(extract_one(url) for url in urls), return_exceptions=True)
+        finally:
+            if client:
+                await client.aclose()
+        
+        entries = []
+        for url, result in zip(urls, results):
+            # BaseException: a cancelled worker comes back as CancelledError, which isn't an Exception
+            if isinstance(result, BaseException):
+                entries.append({"url": url, "status": "error", "error": str(result) or type(result).__name__})
+            else:
+                entries.append({"url": url, **result})
+        return {
+            "status": "success",
+            "results": entries,
+            "count": sum(1 for entry in entries if entry.get("status") == "success")
+        }
+
+    async def _extract_static(self, client, url: str, schema: dict, limit: Optional[int], site: str) -> Optional[dict]:
+        """Extract from the server-sent HTML without a browser; None when the browser is needed.
+        
+        That is when selectolax isn't installed, the fetch fails or isn't HTML, or
+        extract_static_rows() can't answer for the page (see extraction_rules).
+        """
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError:
+            return None
+        try:
+            response = await client.get(url)
+        except httpx.HTTPError as e:
+            logger.debug(f"Static fetch of {url} failed: {e}")
+            return None
+        if response.status_code != 200 or "text/html" not in response.headers.get("content-type", ""):
+            return None
+        
+        tree = LexborHTMLParser(response.text)
+        selectors = self._get_merged_selectors(schema, site)
+        row_lookup = None
+        row_split = split_row_selectors(tuple(schema.values()))
+        if row_split:
+            root, fields = row_split
+            row_lookup = {"root": root, "fields": dict(zip(schema, fields))}
+        rows = extract_static_rows(tree, str(response.url), schema, selectors, limit, row_lookup)
+        if rows is None:
+            return None
+        return {"status": "success", "data": rows, "count": len(rows), "source": "http"}
+
+    async def extract(self, schema: dict, limit: int = None, use_cache: bool = False,
+                      common_root: Optional[str] = None) -> dict:
         """Extract data from page using CSS selectors with site-specific fallbacks.
         
         Schema format: {"field_name": "css_selector"}
         Returns structured data with arrays for each field.
+        
+        With use_cache, a repeat call for the same URL, schema, limit and root reuses the
+        previous result. Off by default since infinite-scroll pages change in place.
+        
+        common_root is the selector of one result row (e.g. ".product-row"). When the
+        page has no known product containers, rows are found once and each field is
+        looked up inside them instead of scanning the document per field. Defaults to
+        the leading selector all schema selectors share, if any.
         """
         if not self.page:
             return {"status": "error", "error": "Browser not initialized"}
         
+        if not use_cache:
+            return await self._extract_page(schema, limit, common_root=common_root)
+        
+        cache_key = (self.page.url, tuple(sorted(schema.items())), limit, common_root)
+        cached = self._extract_cache.get(cache_key)
+        if cached is not None:
+            self._extract_cache.move_to_end(cache_key)
+        else:
+            cached = await self._extract_page(schema, limit, common_root=common_root)
+            if cached.get("status") != "success" or not cached.get("data"):
+                return cached
+            self._extract_cache[cache_key] = cached
+            if len(self._extract_cache) > _EXTRACT_CACHE_SIZE:
+                self._extract_cache.popitem(last=False)
+        # Callers normalize items in place (prices, ratings), so hand out copies
+        return {**cached, "data": [dict(item) for item in cached["data"]]}
+
+    async def _extract_page(self, schema: dict, limit: int = None, page: Page = None, site: str = None,
+                            common_root: Optional[str] = None) -> dict:
+        """Run the extraction against a page (uncached) - the agent's own page by default."""
+        page = page or self.page
+        site = site or self.current_site
         # For YouTube, use specialized extraction
-        if self.current_site == "youtube":
-            return await YouTubeHandler.extract_video_urls(self.page, limit or 10)
+        if site == "youtube":
+            return await YouTubeHandler.extract_video_urls(page, limit or 10)
         
         # For Google Search, use specialized extraction
-        if self.current_site == "google":
-            return await GoogleSearchHandler.extract_search_results(self.page, limit or 10)
-        
-        # Get site-specific selectors as fallback
-        site_selectors = get_selectors_for_site(self.current_site)
+        if site == "google":
+            return await GoogleSearchHandler.extract_search_results(page, limit or 10)
         
-        # First, try to diagnose the page structure - especially for Google Maps
-        diagnostic = await self.page.evaluate(SiteExtractionHandler.get_diagnostic_js())
+        # Per-field selector lists with site-specific fallbacks already merged in
+        selectors = self._get_merged_selectors(schema, site)
         
+        # Diagnose the page structure only when debugging - it is a full extra DOM scan
+        diagnostic = None
+        extract_args = {"schema": schema, "limit": limit or 0, "selectors": selectors, "site": site, "rows": None}
+        row_split = split_row_selectors(tuple(schema.values()), common_root)
+        if row_split:
+            root, fields = row_split
+            extract_args["rows"] = {"root": root, "fields": dict(zip(schema, fields))}
         
         try:
-            # Use a smarter extraction strategy - extract from product containers
-            result = await self.page.evaluate(
-                SiteExtractionHandler.get_extraction_js(),
-                {"schema": schema, "limit": limit or 0, "siteSelectors": site_selectors, "site": self.current_site}
-            )
+            if self.debug:
+                # Diagnosis rides along with the extraction in a single round-trip
+                combined = await page.evaluate(
+                    SiteExtractionHandler.get_extraction_with_diagnostic_js(),
+                    extract_args
+                )
+                result, diagnostic = combined["data"], combined["diagnostic"]
+            else:
+                # Use a smarter extraction strategy - extract from product containers.
+                # The extractor is preinstalled by the context init script; only pages
+                # opened before it was registered need the full source shipped.
+                result = await page.evaluate(_CALL_EXTRACT_JS, extract_args)
+                if result is None:
+                    result = await page.evaluate(SiteExtractionHandler.get_extraction_js(), extract_args)
+                else:
+                    result = json.loads(result)
             
-            # Transform to list of objects if multiple fields
-            if result and len(result) > 0:
-                field_names = list(result.keys())
-                max_length = max(len(result[field]) for field in field_names) if result else 0
-                
-                # Create list of objects
-                structured = []
-                for i in range(max_length):
-                    item = {}
-                    for field in field_names:
-                        value = result[field][i] if i < len(result[field]) else None
-                        
-                        # Clean and parse values
-                        if field == 'price' and value:
-                            # Extract numeric price (remove currency symbols, commas)
-                            # Handle Indian format: ₹1,25,999 or 1,25,999 or ₹125999
-                            price_clean = str(value).strip()
-                            # Remove currency symbols and commas first
-                            price_clean = re.sub(r'[₹$€£,\s]', '', price_clean)
-                            # Extract only digits and decimal point
-                            price_str = re.sub(r'[^\d.]', '', price_clean)
-                            
-                            if price_str:
-                                try:
-                                    item[field] = float(price_str)
-                                except (ValueError, TypeError):
-                                    # Fallback: try to extract first number
-                                    numbers = re.findall(r'\d+\.?\d*', price_clean)
-                                    if numbers:
-                                        try:
-                                            item[field] = float(numbers[0])
-                                        except:
-                                            item[field] = None
-                                    else:
-                                        item[field] = None
-                            else:
-                                item[field] = None
-                        elif field == 'rating' and value:
-                            # Extract numeric rating (handle "4.5", "4.5 out of 5", "4.5 Ratings", etc.)
-                            # Try to extract just the number
-                            rating_str = str(value).strip()
-                            # Try to parse as float first
-                            try:
-                                rating_float = float(rating_str)
-                                # Validate it's a reasonable rating (0-5)
-                                if 0 <= rating_float <= 5:
-                                    item[field] = rating_float
-                                else:
-                                    # If it's a large number, it might be the count, try to find the actual rating
-                                    # Look for decimal pattern in the original value
-                                    rating_match = re.search(r'(\d\.\d)', str(value))
-                                    if rating_match:
-                                        rating_float = float(rating_match.group(1))
-                                        if 0 <= rating_float <= 5:
-                                            item[field] = rating_float
-                                        else:
-                                            item[field] = None
-                                    else:
-                                        item[field] = None
-                            except:
-                                # If parsing fails, try regex to find decimal
-                                rating_match = re.search(r'(\d\.\d)', rating_str)
-                                if rating_match:
-                                    try:
-                                        rating_float = float(rating_match.group(1))
-                                        if 0 <= rating_float <= 5:
-                                            item[field] = rating_float
-                                        else:
-                                            item[field] = None
-                                    except:
-                                        item[field] = None
-                                else:
-                                    item[field] = None
-                        elif field == 'link' or field == 'url':
-                            # Ensure link is properly formatted
-                            if value:
-                                item[field] = str(value).strip()
-                            else:
-                                item[field] = None
-                        elif field == 'name':
-                            # Clean name
-                            if value:
-                                name = str(value).strip()
-                                # Remove "Add to Compare" and similar prefixes
-                                name = re.sub(r'^(Add to Compare|Compare|Add to Cart|Buy Now)\s*', '', name, flags=re.IGNORECASE)
-                                item[field] = name.strip()
-                            else:
-                                item[field] = None
-                        else:
-                            item[field] = value
-                    structured.append(item)
-                
-                return {
-                    "status": "success",
-                    "data": structured,
-                    "count": len(structured)
-                }
+            # If no data found, the extraction JS flags it - include diagnostic info
+            if not result or result.get("_empty"):
+                # An interstitial served where results were expected looks just like this
+                self._distrust(page.url)
+                empty_result = dict(
+                    _EMPTY_EXTRACT,
+                    data=[],
+                    message=f"No data extracted. Found {(result or {}).get('_containerCount', 0)} product containers."
+                )
+                if diagnostic:
+                    empty_result["diagnostic"] = diagnostic
+                return empty_result
             
-            # If no data found, include diagnostic info
-            if not result or len(result) == 0 or (isinstance(result, dict) and all(not v or len(v) == 0 for v in result.values() if isinstance(v, list))):
+            # Rows arrive already shaped and cleaned by the extraction JS
+            items = result.get("items")
+            if items:
                 return {
                     "status": "success",
-                    "data": [],
-                    "count": 0,
-                    "diagnostic": diagnostic,
-                    "message": f"No data extracted. Found {diagnostic.get('selectorChecks', [{}])[0].get('count', 0)} product containers."
+                    "data": items,
+                    "count": len(items)
                 }
             
-            return {
-                "status": "success",
-                "data": [],
-                "count": 0
-            }
+            return dict(_EMPTY_EXTRACT, data=[])
         except Exception as e:
-            import traceback
-            error_trace = traceback.format_exc()
+            logger.exception("Extraction failed")
+            error_trace = traceback.format_exc() if self.debug else None
             return {
                 "status": "error",
                 "error": str(e),
-                "diagnostic": diagnostic if 'diagnostic' in locals() else None,
+                "diagnostic": diagnostic,
                 "traceback": error_trace
             }
-
-# Global instance
-browser_agent = BrowserAgent()
-
@@ -0,0 +1,345 @@
+"""Shared Chromium instance with a pool of pre-warmed browser contexts.
+
+Launching Chromium takes seconds while creating a context takes milliseconds, so
+the browser is started once per process and every agent borrows an isolated
+context from the pool instead of launching (and tearing down) its own browser.
+BrowserAgent.start() takes one with checkout() and close() hands it back with
+checkin(), so concurrent sessions run in parallel up to the pool size.
+When BROWSER_CDP_URL is set the pool attaches to an externally managed Chromium
+over CDP, so several worker processes can share one browser.
+"""
+
+import asyncio
+import urllib.parse
+from functools import lru_cache
+from typing import Dict, Optional, Set
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.site_handlers import EXTRACTION_INIT_JS
+
+# Chromium flags used for every launch
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+]
+
+# Realistic browser settings applied to every context
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'locale': 'en-IN',
+    'timezone_id': 'Asia/Kolkata',
+    'extra_http_headers': {
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+    }
+}
+
+# Init script that hides the usual automation fingerprints
+STEALTH_INIT_SCRIPT = """
+    // Remove webdriver property
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+
+    // Override the `plugins` property to use a custom getter
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5]
+    });
+
+    // Override the `languages` property
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['en-US', 'en']
+    });
+
+    // Mock chrome object
+    window.chrome = {
+        runtime: {}
+    };
+
+    // Override permissions
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+            Promise.resolve({ state: Notification.permission }) :
+            originalQuery(parameters)
+    );
+"""
+
+# HEAD request per origin from the context's page. It goes through Chromium's own
+# network stack, so DNS, TLS session and HSTS state are ready for the first goto()
+PREWARM_JS = """
+    (origins) => Promise.allSettled(origins.map(origin =>
+        fetch(origin, {method: 'HEAD', mode: 'no-cors', credentials: 'omit', cache: 'no-store'})
+    ))
+"""
+
+# Site data dropped for every origin a context visited when it is checked back in
+# (cookies are cleared separately, since third-party ones have no visited origin)
+CLEARED_STORAGE_TYPES = "local_storage,indexeddb,websql,cache_storage,service_workers,file_systems"
+
+# URL patterns for Chromium's request blocklist, per blocked resource type. Unlike
+# route(), which turns the HTTP cache off for the page, the blocklist leaves it on
+_BLOCKED_URL_EXTENSIONS = {
+    "image": ("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico"),
+    "font": ("woff", "woff2", "ttf", "otf", "eot"),
+    "media": ("mp4", "webm", "m3u8", "mp3", "ogg", "wav"),
+}
+
+# page -> (CDP session, patterns) holding its request blocklist, see set_page_blocklist
+_page_blocklists: Dict[Page, tuple] = {}
+
+
+@lru_cache(maxsize=8)
+def blocked_url_patterns(resource_types: frozenset) -> Optional[tuple]:
+    """Blocklist patterns covering `resource_types`, or None if one has no known extensions."""
+    if not resource_types.issubset(_BLOCKED_URL_EXTENSIONS):
+        return None
+    return tuple(
+        pattern
+        for resource_type in sorted(resource_types)
+        for ext in _BLOCKED_URL_EXTENSIONS[resource_type]
+        for pattern in (f"*.{ext}", f"*.{ext}?*")
+    )
+
+
+async def set_page_blocklist(page: Page, patterns: tuple):
+    """Make `patterns` the request blocklist of `page` (an empty tuple clears it).
+    
+    The CDP session holding the list is opened once per page and kept until the page
+    closes, so asking again for the list a page already has costs no round-trip, and
+    a different list costs one.
+    """
+    cached = _page_blocklists.get(page)
+    if cached is None:
+        if not patterns:
+            return
+        session = await page.context.new_cdp_session(page)
+        await session.send("Network.enable")
+    else:
+        session, current = cached
+        if current == patterns:
+            return
+    await session.send("Network.setBlockedURLs", {"urls": list(patterns)})
+    if cached is None:
+        page.once("close", lambda closed: _page_blocklists.pop(closed, None))
+    _page_blocklists[page] = (session, patterns)
+
+
+class BrowserPool:
+    """Launches Chromium once and hands out pre-warmed, isolated BrowserContexts."""
+
+    def __init__(self, size: Optional[int] = None, recycle_after: Optional[int] = None):
+        """
+        Args:
+            size: Number of warm contexts (defaults to settings.browser_pool_size)
+            recycle_after: Sessions a context serves before it is closed and replaced, so
+                cache and renderer memory can't grow without bound. 0 disables recycling.
+                Defaults to settings.browser_pool_recycle_after.
+        """
+        self.size = size or settings.browser_pool_size
+        self.recycle_after = settings.browser_pool_recycle_after if recycle_after is None else recycle_after
+        # Sessions served so far by each pooled context
+        self._uses: Dict[BrowserContext, int] = {}
+        # Origins each pooled context has loaded, whose site data checkin() clears
+        self._visited: Dict[BrowserContext, Set[str]] = {}
+        # Contexts that could not be replaced; checkout() creates them on demand
+        self._missing = 0
+        self.playwright = None
+        self.browser: Browser | None = None
+        self._contexts: asyncio.Queue | None = None
+        self._start_lock: asyncio.Lock | None = None
+        self.connected_over_cdp = False
+        self.prewarm_origins = [o.strip() for o in settings.browser_prewarm_origins.split(",") if o.strip()]
+        # Default blocklist (settings.blocked_resource_types), set on each page as it is opened
+        # so agents using the default don't have to
+        blocked_types = frozenset(t.strip() for t in settings.blocked_resource_types.split(",") if t.strip())
+        self.blocked_patterns = blocked_url_patterns(blocked_types) if blocked_types else None
+        # Background prewarm tasks, kept referenced so they aren't garbage collected
+        self._prewarm_tasks: set = set()
+
+    async def start(self):
+        """Launch the shared browser and pre-warm the context pool (idempotent)."""
+        if self.browser is not None:
+            return
+        # Created lazily so the primitives bind to the running event loop
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.browser is not None:
+                return
+            try:
+                self.playwright = await async_playwright().start()
+                if settings.browser_cdp_url:
+                    # Shared Chromium run as a sidecar - see README "Sharing one browser"
+                    self.browser = await self.playwright.chromium.connect_over_cdp(settings.browser_cdp_url)
+                    self.connected_over_cdp = True
+                else:
+                    self.browser = await self.playwright.chromium.launch(
+                        headless=settings.headless,
+                        args=BROWSER_ARGS
+                    )
+            except Exception as e:
+                logger.error(f"Failed to start browser pool: {e}")
+                raise
+
+            self._contexts = asyncio.Queue()
+            contexts = await asyncio.gather(*(self._new_context() for _ in range(self.size)))
+            for context in contexts:
+                self._contexts.put_nowait(context)
+
+    async def _new_context(self) -> BrowserContext:
+        """Create a context with the standard settings, stealth and extraction scripts installed."""
+        context = await self.browser.new_context(**CONTEXT_OPTIONS)
+        await context.add_init_script(STEALTH_INIT_SCRIPT)
+        await context.add_init_script(EXTRACTION_INIT_JS)
+        visited = self._visited[context] = set()
+        context.on("page", lambda page: self._track_origins(page, visited))
+        # Opened ahead of checkout, so a session starts with its page ready
+        page = await context.new_page()
+        await self._block_defaults(page)
+        if self.prewarm_origins:
+            # Runs while the context waits in the queue; a checkout doesn't wait for it
+            task = asyncio.create_task(self._prewarm(page))
+            self._prewarm_tasks.add(task)
+            task.add_done_callback(self._prewarm_tasks.discard)
+        return context
+
+    async def _block_defaults(self, page: Page):
+        """Give a freshly opened pooled page the default request blocklist."""
+        if not self.blocked_patterns:
+            return
+        try:
+            await set_page_blocklist(page, self.blocked_patterns)
+        except Exception as e:
+            # No CDP (e.g. not Chromium) - agents fall back to routes themselves
+            logger.debug(f"Could not set the default request blocklist: {e}")
+
+    @staticmethod
+    def _track_origins(page, visited: Set[str]):
+        """Record the origin of every document `page` (or one of its frames) loads."""
+        def on_navigated(frame):
+            parts = urllib.parse.urlsplit(frame.url)
+            if parts.scheme in ("http", "https"):
+                visited.add(f"{parts.scheme}://{parts.netloc}")
+        page.on("framenavigated", on_navigated)
+
+    async def _prewarm(self, page):
+        """Open connections to the common target origins before the first real navigation."""
+        try:
+            await page.evaluate(PREWARM_JS, self.prewarm_origins)
+        except Exception:
+            pass  # Best effort - a navigation that starts meanwhile cancels the evaluate
+
+    async def checkout(self) -> BrowserContext:
+        """Take a context out of the pool, waiting if all of them are in use."""
+        await self.start()
+        if self._contexts.empty() and self._missing:
+            # A replacement failed earlier - nothing will be checked in for that slot
+            self._missing -= 1
+            try:
+                return await self._new_context()
+            except Exception:
+                self._missing += 1
+                raise
+        return await self._contexts.get()
+
+    async def checkin(self, context: BrowserContext):
+        """Return a context to the pool, dropping session state from its previous user.
+        
+        Its pages are replaced by a fresh one (sessionStorage belongs to the tab), and
+        cookies plus the stored site data of every origin it visited are cleared. If
+        that fails the context is replaced instead.
+        """
+        if self.browser is None:
+            # Pool was shut down while the context was checked out
+            await self._discard(context)
+            return
+        uses = self._uses.pop(context, 0) + 1
+        if self.recycle_after and uses >= self.recycle_after:
+            # Worn-out context - swap in a fresh one rather than cleaning it
+            await self._discard(context)
+            await self._put_replacement()
+            return
+        try:
+            old_pages = context.pages
+            page = await context.new_page()
+            await asyncio.gather(*(old_page.close() for old_page in old_pages), self._block_defaults(page))
+            await self._clear_site_data(context, page)
+            await context.clear_cookies()
+        except Exception as e:
+            # Context is unusable (crashed or closed) - replace it so the pool keeps its size
+            logger.error(f"Replacing broken browser context: {e}")
+            await self._discard(context)
+            await self._put_replacement()
+            return
+        self._uses[context] = uses
+        self._contexts.put_nowait(context)
+
+    async def _clear_site_data(self, context: BrowserContext, page):
+        """Clear local storage, IndexedDB, caches and service workers of the visited origins."""
+        visited = self._visited.get(context)
+        if not visited:
+            return
+        session = await context.new_cdp_session(page)
+        try:
+            await asyncio.gather(*(
+                session.send("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": CLEARED_STORAGE_TYPES})
+                for origin in visited
+            ))
+        finally:
+            await session.detach()
+        visited.clear()
+
+    async def _discard(self, context: BrowserContext):
+        """Close a context that leaves the pool for good."""
+        self._visited.pop(context, None)
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    async def _put_replacement(self):
+        """Queue a fresh context; if that fails, checkout() creates it when needed."""
+        try:
+            self._contexts.put_nowait(await self._new_context())
+        except Exception as e:
+            logger.error(f"Could not replace browser context: {e}")
+            self._missing += 1
+
+    async def close(self):
+        """Close every pooled context and shut down the shared browser.
+
+        When attached over CDP only our own contexts are closed; the browser belongs
+        to the sidecar and other workers may still be using it.
+        """
+        for task in self._prewarm_tasks:
+            task.cancel()
+        if self._contexts is not None:
+            while not self._contexts.empty():
+                context = self._contexts.get_nowait()
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+        if self.browser and not self.connected_over_cdp:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+        self.browser = None
+        self.playwright = None
+        self._contexts = None
+        self._uses.clear()
+        self._visited.clear()
+        self._missing = 0
+        self.connected_over_cdp = False
+
+
+# Global instance
+browser_pool = BrowserPool()
@@ -85,8 +85,9 @@ class EdgeCaseHandler:
         
         for selector in popup_selectors:
             try:
-                element = await page.query_selector(selector)
-                if element and await element.is_visible():
+                # :visible filters hidden matches in the same query
+                element = await page.query_selector(f"{selector}:visible")
+                if element:
                     await element.click()
                     logger.debug(f"Closed popup with selector: {selector}")
                     await asyncio.sleep(0.5)  # Wait for animation
@@ -109,25 +110,22 @@ class EdgeCaseHandler:
         """
         for attempt in range(retries):
             try:
-                element = await page.wait_for_selector(selector, state="visible", timeout=5000)
-                
-                if not element:
-                    return {"status": "error", "error": f"Element not found: {selector}"}
+                # A locator re-resolves the selector on every action, so a re-rendered
+                # element doesn't go stale between the wait and the click
+                locator = page.locator(selector).first
+                await locator.wait_for(state="visible", timeout=5000)
                 
-                # Scroll into view if needed
-                await element.scroll_into_view_if_needed()
-                await asyncio.sleep(0.2)  # Let scroll settle
-                
-                # Try regular click first
+                # Try regular click first - it scrolls into view and waits for the
+                # element to be stable and unobscured itself
                 try:
-                    await element.click(timeout=3000)
+                    await locator.click(timeout=3000)
                     logger.debug(f"Clicked element: {selector}")
                     return {"status": "success", "selector": selector}
                 
                 except Exception as click_error:
                     # If regular click fails, try force click
                     logger.warning(f"Regular click failed, trying force click: {click_error}")
-                    await element.click(force=True)
+                    await locator.click(force=True, timeout=3000)
                     return {"status": "success", "selector": selector, "force": True}
             
             except PlaywrightTimeout:
@@ -162,23 +160,14 @@ class EdgeCaseHandler:
         - Autocomplete interference
         """
         try:
-            element = await page.wait_for_selector(selector, state="visible", timeout=5000)
-            
-            if not element:
-                return {"status": "error", "error": f"Element not found: {selector}"}
+            element = page.locator(selector).first
+            await element.wait_for(state="visible", timeout=5000)
             
-            # Scroll into view
-            await element.scroll_into_view_if_needed()
-            await asyncio.sleep(0.2)
-            
-            # Focus the element
-            await element.focus()
-            await asyncio.sleep(0.1)
-            
-            # Clear existing text if needed
+            # Clear existing text if needed (fill scrolls into view and focuses)
             if clear_first:
                 await element.fill('')
-                await asyncio.sleep(0.1)
+            else:
+                await element.focus()
             
             # Type text
             await element.type(text, delay=50)  # Add delay between keystrokes for realism
@@ -202,21 +191,35 @@ class EdgeCaseHandler:
         """
         Wait for any of multiple selectors to appear.
         
-        Useful when exact selector is unknown or page structure varies.
+        Useful when exact selector is unknown or page structure varies. All selectors
+        are waited on at once, so the total wait is at most `timeout`; when several
+        match together the earliest in the list wins.
         """
-        for selector in selectors:
-            try:
-                element = await page.wait_for_selector(selector, state=state, timeout=timeout)
-                if element:
+        tasks = {
+            asyncio.create_task(page.wait_for_selector(selector, state=state, timeout=timeout)): selector
+            for selector in selectors
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                found = {}
+                for task in done:
+                    error = task.exception()
+                    if error is None and task.result():
+                        found[tasks[task]] = task.result()
+                    elif error is not None and not isinstance(error, PlaywrightTimeout):
+                        logger.warning(f"Error with selector {tasks[task]}: {error}")
+                if found:
+                    selector = min(found, key=selectors.index)
                     logger.debug(f"Found element with selector: {selector}")
-                    return element
-            except PlaywrightTimeout:
-                continue
-            except Exception as e:
-                logger.warning(f"Error with selector {selector}: {e}")
-                continue
-        
-        return None
+                    return found[selector]
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
     
     @staticmethod
     async def check_for_blocking(page: Page) -> dict:
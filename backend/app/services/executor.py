@@ -1,6 +1,6 @@
 from fastapi import WebSocket
 from app.services.ai_planner import create_action_plan
-from app.services.browser_agent import browser_agent
+from app.services.browser_agent import BrowserAgent, NAVIGATE_SETTLE_MS
 from app.services.filter_results import (
     filter_by_price, 
     get_top_results, 
@@ -10,12 +10,51 @@ from app.services.filter_results import (
     filter_by_product_relevance
 )
 from app.services.conversation import conversation_manager
+from app.core.logger import logger
 import json
 import re
 import asyncio
 
+# Price parsing patterns used when normalizing extracted prices
+_CURRENCY_RE = re.compile(r'[₹$€£,\s]')
+_NON_NUMERIC_RE = re.compile(r'[^\d.]')
+_DIGITS_RE = re.compile(r'\d+')
+_NUMBER_RE = re.compile(r'\d+\.?\d*')
+
+# Longest per-key delay (ms) a plan may ask type_text for
+_MAX_KEY_DELAY_MS = 300
+
+# Range (ms) a plan's navigate "settle_ms" is clamped to; 0 would mean no timeout at all
+_MIN_SETTLE_MS = 100
+_MAX_SETTLE_MS = 10000
+
+
+def _int_option(action: dict, key: str, default: int, low: int, high: int) -> int:
+    """action[key] as an int clamped to [low, high]; `default` when missing or not a number."""
+    try:
+        value = int(action[key])
+    except (KeyError, TypeError, ValueError):
+        return default
+    return min(max(value, low), high)
+
 async def execute_plan(websocket: WebSocket, instruction: str, session_id: str = "default", is_clarification_response: bool = False):
     """Main execution loop: plan -> execute -> stream updates."""
+    # One agent per plan so concurrent sessions each get their own pooled browser context.
+    # It is closed here whichever way the run ends - early returns (clarifications, the
+    # direct Swiggy search) included - so no run leaks a context or a stealth browser
+    browser_agent = BrowserAgent()
+    try:
+        await _run_plan(websocket, instruction, session_id, is_clarification_response, browser_agent)
+    finally:
+        try:
+            await browser_agent.close()
+        except Exception as e:
+            logger.warning(f"Could not close browser: {e}")
+
+
+async def _run_plan(websocket: WebSocket, instruction: str, session_id: str, is_clarification_response: bool,
+                    browser_agent: BrowserAgent):
+    """Body of execute_plan, which owns browser_agent and closes it afterwards."""
     
     plan = None  # Initialize to avoid reference errors
     
@@ -187,7 +226,7 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                                 if "rating" in item and item["rating"]:
                                     try:
                                         item["rating"] = float(item["rating"])
-                                    except:
+                                    except (ValueError, TypeError):
                                         pass
                             
                             result["count"] = len(result.get("data", []))
@@ -403,7 +442,7 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                     if "rating" in item and item["rating"]:
                         try:
                             item["rating"] = float(item["rating"])
-                        except:
+                        except (ValueError, TypeError):
                             pass
                 
                 result["count"] = len(result.get("data", []))
@@ -456,9 +495,9 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
             # This prevents old location/cookies from interfering with subsequent searches
             try:
                 await browser_agent.close()
-                print("✓ Browser closed after Swiggy search")
+                logger.debug("Browser closed after Swiggy search")
             except Exception as e:
-                print(f"Note: Could not close browser: {e}")
+                logger.warning(f"Could not close browser: {e}")
             
             # Skip normal execution loop
             plan = []
@@ -561,7 +600,7 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                     if "rating" in item and item["rating"]:
                         try:
                             item["rating"] = float(item["rating"])
-                        except:
+                        except (ValueError, TypeError):
                             pass
                 
                 result["count"] = len(result.get("data", []))
@@ -617,9 +656,9 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
             # Close browser after Zomato search to ensure fresh state for next search
             try:
                 await browser_agent.close()
-                print("✓ Browser closed after Zomato search")
+                logger.debug("Browser closed after Zomato search")
             except Exception as e:
-                print(f"Note: Could not close browser: {e}")
+                logger.warning(f"Could not close browser: {e}")
             
             # Skip normal execution loop
             plan = []
@@ -743,7 +782,7 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                         if "rating" in item and item["rating"]:
                             try:
                                 item["rating"] = float(item["rating"])
-                            except:
+                            except (ValueError, TypeError):
                                 pass
                         if "reviews" in item and item["reviews"]:
                             try:
@@ -796,7 +835,13 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
             try:
                 if action_type == "navigate":
                     url = action.get("url")
-                    result = await browser_agent.navigate(url)
+                    # Treat the page as ready once the next step's element is there. It is the
+                    # planner's selector before type/click fallbacks, so navigate only gives it
+                    # the settle budget before falling back to the site's own ready selector
+                    next_action = plan[idx + 1] if idx + 1 < len(plan) else {}
+                    ready_selector = next_action.get("selector") if next_action.get("action") in ("click", "type", "wait_for") else None
+                    settle_ms = _int_option(action, "settle_ms", NAVIGATE_SETTLE_MS, _MIN_SETTLE_MS, _MAX_SETTLE_MS)
+                    result = await browser_agent.navigate(url, ready_selector=ready_selector, settle_ms=settle_ms)
                     
                     # Handle navigation errors with suggestions
                     if result.get("status") == "error":
@@ -904,7 +949,9 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                 elif action_type == "type":
                     selector = action.get("selector")
                     text = action.get("text")
-                    result = await browser_agent.type_text(selector, text)
+                    result = await browser_agent.type_text(
+                        selector, text, per_key_delay=_int_option(action, "per_key_delay", 0, 0, _MAX_KEY_DELAY_MS)
+                    )
                     
                 elif action_type == "analyze_form":
                     # Analyze form on page and determine fields to fill using LLM
@@ -946,7 +993,7 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                             "error": "No form fields provided. Please run analyze_form first or provide fields in the action."
                         }
                     else:
-                        result = await browser_agent.fill_form(form_fields)
+                        result = await browser_agent.fill_form(form_fields, typing_mode=action.get("typing_mode", "fast"))
                     
                 elif action_type == "submit":
                     selector = action.get("selector", "form, button[type='submit'], input[type='submit']")
@@ -1195,7 +1242,7 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                                 if "rating" in item and item["rating"]:
                                     try:
                                         item["rating"] = float(item["rating"])
-                                    except:
+                                    except (ValueError, TypeError):
                                         pass
                                 
                                 # Ensure reviews is a number if present
@@ -1264,7 +1311,10 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                             }
                         else:
                             # Use extraction_limit for extraction (extract more for filtering)
-                            result = await browser_agent.extract(schema, extraction_limit)
+                            result = await browser_agent.extract(
+                                schema, extraction_limit, use_cache=bool(action.get("use_cache")),
+                                common_root=action.get("common_root")
+                            )
                     
                     # Post-process extracted data based on intent
                     if result.get("status") == "success" and result.get("data"):
@@ -1332,8 +1382,8 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                                         price = item['price']
                                         if isinstance(price, str):
                                             # Parse string prices - handle Amazon format like "₹93,900.00"
-                                            price_clean = re.sub(r'[₹$€£,\s]', '', str(price).strip())
-                                            price_str = re.sub(r'[^\d.]', '', price_clean)
+                                            price_clean = _CURRENCY_RE.sub('', str(price).strip())
+                                            price_str = _NON_NUMERIC_RE.sub('', price_clean)
                                             if price_str:
                                                 try:
                                                     parsed_price = float(price_str)
@@ -1342,7 +1392,7 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                                                     # If price is > 10,000,000, it's likely a parsing error
                                                     if parsed_price > 10000000:
                                                         # Try to extract first reasonable number
-                                                        numbers = re.findall(r'\d+', price_clean)
+                                                        numbers = _DIGITS_RE.findall(price_clean)
                                                         if numbers:
                                                             # Take the first number that's reasonable
                                                             for num_str in numbers:
@@ -1356,9 +1406,9 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                                                         else:
                                                             parsed_price = None
                                                     item['price'] = parsed_price
-                                                except:
+                                                except ValueError:
                                                     # Try fallback extraction
-                                                    numbers = re.findall(r'\d+\.?\d*', price_clean)
+                                                    numbers = _NUMBER_RE.findall(price_clean)
                                                     if numbers:
                                                         try:
                                                             # Try to find a reasonable price
@@ -1369,7 +1419,7 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                                                                     break
                                                             else:
                                                                 item['price'] = float(numbers[0])
-                                                        except:
+                                                        except ValueError:
                                                             item['price'] = None
                                                     else:
                                                         item['price'] = None
@@ -1552,7 +1602,7 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                             for key in filter_options:
                                 if key in page_variants:
                                     # Combine both sets (remove duplicates)
-                                    filter_options[key] = list(set(filter_options[key] + page_variants[key]))
+                                    filter_options[key] = list(dict.fromkeys(filter_options[key] + page_variants[key]))
                             
                             # Also add any new keys from page variants (except colors)
                             for key in page_variants:
@@ -1635,6 +1685,9 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                     if suggestions:
                         error_data["suggestions"] = suggestions
                         error_msg += f"\nTry these selectors instead: {', '.join(suggestions[:3])}"
+                    if result.get("suggested_selector"):
+                        # The one visible field on the page - likely, not certain, to be the target
+                        error_data["suggested_selector"] = result["suggested_selector"]
                     
                     await websocket.send_json(error_data)
                     
@@ -1790,12 +1843,6 @@ async def execute_plan(websocket: WebSocket, instruction: str, session_id: str =
                     manager.session_states[session_id]["enable_comparison"] = False
                     manager.session_states[session_id]["comparison_results"] = {}
             
-            # Cleanup
-            try:
-                await browser_agent.close()
-            except:
-                pass
-            
             # Send final summary if we extracted data
             final_extract = None
             for action in plan:
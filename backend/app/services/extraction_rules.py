@@ -0,0 +1,223 @@
+"""Extraction helpers that need no browser.
+
+BrowserAgent.extract() ships selectors into the page; the pieces here decide
+which selectors to ship, and are plain Python so they can be tested on their own.
+They also hold the static path of batch_extract(static_first=True), which applies
+the extraction JS's generic (non-container) strategy to server-sent HTML.
+"""
+
+import re
+import urllib.parse
+from functools import lru_cache
+from itertools import zip_longest
+from typing import Callable, Dict, Mapping, Optional, Sequence
+
+# Cleanup shared with the extraction JS, which builds its regexes from these
+# (SiteExtractionHandler.get_extraction_js) - so only syntax both engines read alike
+NAME_PREFIX_PATTERN = r"^(Add to Compare|Compare|Add to Cart|Buy Now)\s*"
+PRICE_PATTERN = r"\d[\d,]*(?:\.\d+)?"
+RATING_DECIMAL_PATTERN = r"(\d\.\d)"
+
+# Sites the static path leaves to the browser: their results are rendered by scripts,
+# or picked out by the extraction JS's container rules (sponsored and accessory cards
+# dropped, Amazon's .a-offscreen prices), which the static path doesn't reproduce
+BROWSER_ONLY_SITES = frozenset({"google", "youtube", "google_maps", "swiggy", "zomato", "flipkart", "amazon"})
+
+_LINK_KEYS = frozenset({"link", "url"})
+_NAME_PREFIX_RE = re.compile(NAME_PREFIX_PATTERN, re.IGNORECASE)
+_PRICE_RE = re.compile(PRICE_PATTERN)
+_RATING_DECIMAL_RE = re.compile(RATING_DECIMAL_PATTERN)
+
+# One compound selector or combinator. Attribute brackets (quoted values may hold
+# "]"), parentheses and quoted strings may contain spaces
+_SELECTOR_TOKEN_RE = re.compile(
+    r"""(?:\[(?:"[^"]*"|'[^']*'|[^\]"'])*\]|\((?:"[^"]*"|'[^']*'|[^)"'])*\)|"[^"]*"|'[^']*'|[^\s\[("'])+"""
+)
+_SIBLING_COMBINATORS = ("+", "~")
+
+
+def split_row_selectors(selectors: Sequence, common_root: Optional[str] = None) -> Optional[tuple]:
+    """Split schema selectors into (row selector, per-field selectors inside a row).
+    
+    Without common_root the row selector is the longest run of leading compound
+    selectors every field shares, e.g. ".product-row .name" and ".product-row .price"
+    give ".product-row". None when there is no usable row selector - including
+    schemas with values that aren't selector strings, which get the per-field scan.
+    """
+    if not selectors or not all(isinstance(sel, str) and sel.strip() for sel in selectors):
+        return None
+    if common_root is not None and not isinstance(common_root, str):
+        return None
+    return _split_row_selectors(tuple(selectors), common_root)
+
+
+@lru_cache(maxsize=256)
+def _split_row_selectors(selectors: tuple, common_root: Optional[str]) -> Optional[tuple]:
+    if common_root:
+        root = common_root.strip()
+        # Fields written relative to the root lose the prefix; others are searched as-is
+        fields = tuple(
+            sel[len(root):].strip() if sel.startswith(root) and sel[len(root):][:1].isspace() else sel
+            for sel in selectors
+        )
+    else:
+        if any("," in sel for sel in selectors):
+            return None
+        token_lists = [_SELECTOR_TOKEN_RE.findall(sel) for sel in selectors]
+        shared = 0
+        for tokens in zip(*token_lists):
+            if len(set(tokens)) != 1:
+                break
+            shared += 1
+        # A trailing combinator belongs to the field selectors
+        while shared and token_lists[0][shared - 1] in (">", *_SIBLING_COMBINATORS):
+            shared -= 1
+        # Every field needs something left to match inside the row
+        if not shared or any(len(tokens) <= shared for tokens in token_lists):
+            return None
+        root = " ".join(token_lists[0][:shared])
+        fields = tuple(" ".join(tokens[shared:]) for tokens in token_lists)
+    if not root or any(not field or field.startswith(_SIBLING_COMBINATORS) for field in fields):
+        return None
+    # "> .name" is only valid relative to the row as ":scope > .name"
+    return root, tuple(f":scope {field}" if field.startswith(">") else field for field in fields)
+
+
+def to_price(text: Optional[str]) -> Optional[float]:
+    """First number in a price text ("Rs. 1,299.00" -> 1299.0), like toPrice in the extraction JS."""
+    if not text:
+        return None
+    match = _PRICE_RE.search(str(text))
+    return float(match.group().replace(",", "")) if match else None
+
+
+def to_rating(text: Optional[str]) -> Optional[float]:
+    """A 0-5 rating from "4.5" or "4.5 out of 5", like toRating in the extraction JS."""
+    if not text:
+        return None
+    text = str(text).strip()
+    try:
+        value = float(text)
+    except ValueError:
+        value = None
+    if value is not None and 0 <= value <= 5:
+        return value
+    match = _RATING_DECIMAL_RE.search(text)
+    if match and 0 <= float(match.group(1)) <= 5:
+        return float(match.group(1))
+    return None
+
+
+def _clean_text(value) -> Optional[str]:
+    return str(value).strip() if value else None
+
+
+def _clean_name(value) -> Optional[str]:
+    return _NAME_PREFIX_RE.sub("", str(value).strip()) if value else None
+
+
+# Text -> number conversions and per-field cleanup, as CONVERTERS and CLEANERS in the extraction JS
+_CONVERTERS: Dict[str, Callable] = {"price": to_price, "rating": to_rating}
+_CLEANERS: Dict[str, Callable] = {"link": _clean_text, "url": _clean_text, "name": _clean_name}
+
+
+def _finish_row(keys, value_for: Callable) -> dict:
+    """One output row with exactly the schema's fields, cleaned."""
+    row = {}
+    for key in keys:
+        value = value_for(key)
+        clean = _CLEANERS.get(key)
+        row[key] = clean(value) if clean else value
+    return row
+
+
+def _ancestors(node):
+    node = node.parent
+    while node is not None:
+        yield node
+        node = node.parent
+
+
+def _node_value(node, is_link: bool, base_url: str) -> str:
+    """A field's raw value: the absolute link for link fields, else the text (or title)."""
+    if is_link:
+        link = node if node.tag == "a" else next((a for a in _ancestors(node) if a.tag == "a"), None)
+        href = (link.attributes.get("href") or "") if link is not None else ""
+        return urllib.parse.urljoin(base_url, href) if href else ""
+    return node.text(deep=True).strip() or node.attributes.get("title") or ""
+
+
+def _first_column(tree, selectors: Sequence[str], is_link: bool, base_url: str, limit: Optional[int]) -> list:
+    """Values of the first selector with matches, like trySelectors in the extraction JS."""
+    for selector in selectors:
+        try:
+            nodes = tree.css(selector)
+        except Exception:
+            continue  # Syntax the HTML parser doesn't know
+        values = []
+        for node in nodes:
+            value = _node_value(node, is_link, base_url)
+            if value:
+                values.append(value)
+                if limit and len(values) >= limit:
+                    break
+        if values:
+            return values
+    return []
+
+
+def extract_static_rows(tree, base_url: str, schema: Mapping[str, str], selectors: Mapping[str, Sequence[str]],
+                        limit: Optional[int] = None, rows: Optional[dict] = None) -> Optional[list]:
+    """Rows the extraction JS would return for a parsed document outside its container branch.
+    
+    Same two strategies in the same order: with `rows` ({"root", "fields"} from
+    split_row_selectors), each root match is one row and its fields are looked up
+    inside it; otherwise one column per field (first of its selectors with matches)
+    zipped by position.
+    
+    Args:
+        tree: Document parsed by selectolax (LexborHTMLParser)
+        base_url: URL the document was served from, for resolving links
+        schema: {"field": "selector"} as passed to extract()
+        selectors: Per-field selector lists with the site fallbacks merged in
+        limit: Max rows (None or 0 for all)
+        rows: Row split of the schema, if any
+    
+    Returns:
+        The rows, or None when the browser has to do it: a field has no match
+        (likely rendered by scripts) or a row selector needs the browser (:scope).
+    """
+    keys = list(schema)
+    if rows:
+        if any(":scope" in field for field in rows["fields"].values()):
+            return None
+        items = []
+        try:
+            for row in tree.css(rows["root"]):
+                values = {}
+                for key in keys:
+                    node = row.css_first(rows["fields"][key])
+                    value = (_node_value(node, key in _LINK_KEYS, base_url) or None) if node is not None else None
+                    convert = _CONVERTERS.get(key)
+                    values[key] = convert(value) if convert else value
+                if any(value is not None for value in values.values()):
+                    items.append(_finish_row(keys, values.get))
+                    if limit and len(items) >= limit:
+                        break
+        except Exception:
+            items = []  # Invalid row or field selector - use the per-field scan below
+        if items:
+            return items
+    
+    columns = {}
+    for key in keys:
+        values = _first_column(tree, selectors[key], key in _LINK_KEYS, base_url, limit)
+        if not values:
+            return None
+        convert = _CONVERTERS.get(key)
+        columns[key] = [convert(value) for value in values] if convert else values
+    # Shorter columns are padded with None, like the JS zips ragged columns
+    return [
+        _finish_row(keys, dict(zip(keys, row)).get)
+        for row in zip_longest(*(columns[key] for key in keys))
+    ]
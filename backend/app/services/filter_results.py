@@ -1,7 +1,37 @@
 """Filter and sort extracted results for various use cases."""
-import asyncio
 import re
 
+# Price/rating parsing patterns, compiled once for the per-item loops below
+_CURRENCY_RE = re.compile(r'[₹$€£,\s]')
+_NON_NUMERIC_RE = re.compile(r'[^\d.]')
+_NUMBER_RE = re.compile(r'\d+\.?\d*')
+_DIGITS_RE = re.compile(r'\d+')
+
+# Variant patterns matched against every product name
+_MEMORY_RE = re.compile(r'(\d+)\s*(GB|TB|gb|tb)', re.IGNORECASE)  # Memory/storage (in GB or TB)
+_RAM_RE = re.compile(r'(\d+)\s*GB\s*RAM', re.IGNORECASE)
+_SIZE_RE = re.compile(r'\b(XS|S|M|L|XL|XXL|\d+\.?\d*\s*(inch|inches|"|cm))\b', re.IGNORECASE)  # Clothes, shoes, etc.
+
+# Storage/memory option elements on product detail pages, as one selector list
+_VARIANT_SELECTORS = ", ".join([
+    '[class*="storage"]',
+    '[class*="Storage"]',
+    '[class*="memory"]',
+    '[class*="Memory"]',
+    '[class*="RAM"]',
+    '[class*="ram"]',
+    'button[class*="storage"]',
+    'button[class*="memory"]',
+])
+# Max option elements read per product page
+_VARIANT_ELEMENT_LIMIT = 100
+
+
+def _numeric_sort_key(value: str) -> tuple:
+    """Sort key ordering variant values by their first number, then alphabetically."""
+    match = _DIGITS_RE.search(value)
+    return (int(match.group()) if match else 0, value)
+
 
 def filter_by_price(results: list, max_price: float = None, min_price: float = None) -> list:
     """Filter results by price range."""
@@ -22,16 +52,16 @@ def filter_by_price(results: list, max_price: float = None, min_price: float = N
             # Handle Indian format: ₹1,25,999 or 1,25,999 or ₹125999
             price_clean = str(price).strip()
             # Remove currency symbols and commas
-            price_clean = re.sub(r'[₹$€£,\s]', '', price_clean)
+            price_clean = _CURRENCY_RE.sub('', price_clean)
             # Extract only digits and decimal point
-            price_str = re.sub(r'[^\d.]', '', price_clean)
+            price_str = _NON_NUMERIC_RE.sub('', price_clean)
             
             if price_str:
                 try:
                     price_float = float(price_str)
                 except (ValueError, TypeError):
                     # Try to extract first number found
-                    numbers = re.findall(r'\d+\.?\d*', price_clean)
+                    numbers = _NUMBER_RE.findall(price_clean)
                     if numbers:
                         try:
                             price_float = float(numbers[0])
@@ -68,11 +98,11 @@ def filter_by_rating(results: list, min_rating: float = None) -> list:
         
         # Handle both string and numeric ratings
         if isinstance(rating, str):
-            rating_match = re.search(r'(\d+\.?\d*)', str(rating))
+            rating_match = _NUMBER_RE.search(rating)
             if rating_match:
                 try:
-                    rating = float(rating_match.group(1))
-                except:
+                    rating = float(rating_match.group())
+                except ValueError:
                     continue
             else:
                 continue
@@ -116,15 +146,6 @@ def extract_filter_options(results: list) -> dict:
         "other": set()
     }
     
-    # Memory/storage patterns (in GB or TB)
-    memory_pattern = r'(\d+)\s*(GB|TB|gb|tb)'
-    
-    # RAM patterns
-    ram_pattern = r'(\d+)\s*GB\s*RAM'
-    
-    # Size patterns (for clothes, shoes, etc.)
-    size_pattern = r'\b(XS|S|M|L|XL|XXL|\d+\.?\d*\s*(inch|inches|"|cm))\b'
-    
     for item in results:
         name = item.get('name', '')
         
@@ -137,7 +158,7 @@ def extract_filter_options(results: list) -> dict:
         # This prevents false positives like "blue" in "bluetooth" or "red" in "reduced"
         
         # Extract memory/storage
-        memory_matches = re.findall(memory_pattern, name, re.IGNORECASE)
+        memory_matches = _MEMORY_RE.findall(name)
         for match in memory_matches:
             value, unit = match
             # Determine if it's RAM or storage based on context
@@ -151,12 +172,12 @@ def extract_filter_options(results: list) -> dict:
                     filter_options["memory"].add(f"{value}{unit.upper()}")
         
         # Extract RAM specifically
-        ram_matches = re.findall(ram_pattern, name, re.IGNORECASE)
+        ram_matches = _RAM_RE.findall(name)
         for match in ram_matches:
             filter_options["ram"].add(f"{match}GB")
         
         # Extract sizes
-        size_matches = re.findall(size_pattern, name, re.IGNORECASE)
+        size_matches = _SIZE_RE.findall(name)
         for match in size_matches:
             if isinstance(match, tuple):
                 filter_options["size"].add(match[0])
@@ -168,11 +189,8 @@ def extract_filter_options(results: list) -> dict:
     for key, values in filter_options.items():
         if values:
             # Sort values intelligently
-            sorted_values = sorted(list(values), key=lambda x: (
-                # For memory/storage, sort by numeric value
-                int(re.search(r'\d+', x).group()) if re.search(r'\d+', x) else 0,
-                x
-            ))
+            # For memory/storage, sort by numeric value
+            sorted_values = sorted(values, key=_numeric_sort_key)
             result[key] = sorted_values
     
     return result
@@ -272,7 +290,8 @@ async def extract_variants_from_product_pages(browser_agent, product_urls: list,
     """Dynamically extract available color/variant options by visiting product detail pages.
     
     This function visits actual product pages to find available variants (colors, sizes, etc.)
-    that may not be visible in search results.
+    that may not be visible in search results. The pages are loaded together in worker
+    pages of the agent (BrowserAgent.batch_extract), so its own page stays on the results.
     
     Args:
         browser_agent: BrowserAgent instance to use for navigation
@@ -292,91 +311,42 @@ async def extract_variants_from_product_pages(browser_agent, product_urls: list,
         "size": set()
     }
     
-    # Limit number of pages to visit
-    urls_to_check = product_urls[:max_pages]
+    # Product pages aren't result listings - extract them with the generic rules.
+    # Server-rendered ones are parsed from their HTML without a browser
+    try:
+        batch = await browser_agent.batch_extract(
+            product_urls[:max_pages],
+            {"variant": _VARIANT_SELECTORS},
+            limit=_VARIANT_ELEMENT_LIMIT,
+            concurrency=max_pages,
+            static_first=True,
+            site="generic"
+        )
+    except Exception:
+        return {}
     
-    for url in urls_to_check:
-        try:
-            # Navigate to product page
-            nav_result = await browser_agent.navigate(url)
-            if nav_result.get("status") != "success":
+    for entry in batch["results"]:
+        # Failed pages are skipped
+        for row in entry.get("data") or []:
+            text = row.get("variant") or ""
+            # Look for patterns like "256GB", "512GB", "1TB", "8GB RAM", etc.
+            match = _MEMORY_RE.search(text)
+            if not match:
                 continue
-            
-            # Wait for page to load
-            await asyncio.sleep(2)
-            
-            # Extract variant options from the page
-            page_variants = await browser_agent.page.evaluate("""
-                () => {
-                    const variants = {
-                        storage: [],
-                        memory: [],
-                        ram: [],
-                        size: []
-                    };
-                    
-                    // Storage/Memory selectors
-                    const storageSelectors = [
-                        '[class*="storage"]',
-                        '[class*="Storage"]',
-                        '[class*="memory"]',
-                        '[class*="Memory"]',
-                        '[class*="RAM"]',
-                        '[class*="ram"]',
-                        'button[class*="storage"]',
-                        'button[class*="memory"]'
-                    ];
-                    
-                    // Try to find storage/memory options
-                    for (const selector of storageSelectors) {
-                        try {
-                            const elements = document.querySelectorAll(selector);
-                            elements.forEach(el => {
-                                const text = el.textContent?.trim() || '';
-                                // Look for patterns like "256GB", "512GB", "1TB", "8GB RAM", etc.
-                                const storageMatch = text.match(/(\d+)\s*(GB|TB|gb|tb)/i);
-                                if (storageMatch) {
-                                    const value = storageMatch[1];
-                                    const unit = storageMatch[2].toUpperCase();
-                                    if (text.toLowerCase().includes('ram')) {
-                                        variants.ram.push(value + unit);
-                                    } else if (parseInt(value) >= 64 || unit === 'TB') {
-                                        variants.storage.push(value + unit);
-                                    } else {
-                                        variants.memory.push(value + unit);
-                                    }
-                                }
-                            });
-                        } catch (e) {
-                            continue;
-                        }
-                    }
-                    
-                    return variants;
-                }
-            """)
-            
-            # Add found variants to our set
-            if page_variants:
-                for key in variant_options:
-                    if key in page_variants and isinstance(page_variants[key], list):
-                        for item in page_variants[key]:
-                            if item:
-                                variant_options[key].add(str(item).strip())
-            
-        except Exception as e:
-            # Continue to next URL if this one fails
-            continue
+            value, unit = match.group(1), match.group(2).upper()
+            if "ram" in text.lower():
+                variant_options["ram"].add(value + unit)
+            elif int(value) >= 64 or unit == "TB":
+                variant_options["storage"].add(value + unit)
+            else:
+                variant_options["memory"].add(value + unit)
     
     # Convert sets to sorted lists
     result = {}
     for key, values in variant_options.items():
         if values:
             # Sort intelligently
-            sorted_values = sorted(list(values), key=lambda x: (
-                int(re.search(r'\d+', x).group()) if re.search(r'\d+', x) else 0,
-                x
-            ))
+            sorted_values = sorted(values, key=_numeric_sort_key)
             result[key] = sorted_values
     
     return result
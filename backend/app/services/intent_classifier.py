@@ -489,7 +489,7 @@ def _classify_intent_rule_based(instruction: str) -> dict:
         if price_match:
             try:
                 filters['price_max'] = float(price_match.group(1).replace(',', ''))
-            except:
+            except ValueError:
                 pass
     
     if 'above' in instruction_lower or 'over' in instruction_lower:
@@ -497,7 +497,7 @@ def _classify_intent_rule_based(instruction: str) -> dict:
         if price_match:
             try:
                 filters['price_min'] = float(price_match.group(1).replace(',', ''))
-            except:
+            except ValueError:
                 pass
     
     # Rating filters
@@ -505,7 +505,7 @@ def _classify_intent_rule_based(instruction: str) -> dict:
     if rating_match:
         try:
             filters['rating_min'] = float(rating_match.group(1))
-        except:
+        except ValueError:
             pass
     
     # Extract limit (top N, first N, etc.)
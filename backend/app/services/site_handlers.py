@@ -3,9 +3,223 @@ Site-specific handlers for different websites (Google Maps, Amazon, Flipkart, et
 This module contains site-specific extraction and interaction logic.
 """
 import asyncio
+import json
+import random
 import urllib.parse
 from typing import Dict
 from playwright.async_api import Page, BrowserContext
+from app.core.logger import logger
+from app.services.extraction_rules import NAME_PREFIX_PATTERN, PRICE_PATTERN, RATING_DECIMAL_PATTERN
+
+
+# Google Maps result snapshot, taken in one evaluate after a search: container counts,
+# a structure diagnostic, and the extraction using the best container it found.
+# The page text is only read when the extraction found nothing, to explain why
+_MAPS_COUNTS_JS = """
+    () => {
+        return {
+            roleArticle: document.querySelectorAll('div[role="article"]').length,
+            dataResultIndex: document.querySelectorAll('[data-result-index]').length,
+            h3s: document.querySelectorAll('h3').length,
+            paneExists: !!document.querySelector('#pane'),
+            paneChildren: document.querySelector('#pane') ? document.querySelector('#pane').children.length : 0
+        };
+    }
+"""
+
+_MAPS_DIAGNOSTIC_JS = """
+    () => {
+        const selectors = [
+            'div[role="article"]',
+            '[data-result-index]',
+            'h3',
+            '.Nv2PK',
+            '.qBF1Pd',
+            '.MW4etd',
+            '[aria-label*="star"]',
+            '#pane',
+            '[role="main"]'
+        ];
+        const counts = {};
+        selectors.forEach(s => {
+            try { counts[s] = document.querySelectorAll(s).length; } catch(e){ counts[s]=0; }
+        });
+        
+        // find first container candidate
+        const candidateSelectors = ['div[role="article"]', '[data-result-index]', '.Nv2PK', 'div:has(h3)'];
+        let sample = null;
+        for (const s of candidateSelectors) {
+            try {
+                const el = document.querySelector(s);
+                if (el) { 
+                    sample = {
+                        selector: s, 
+                        outerHTML: el.outerHTML.slice(0,2000), 
+                        textPreview: el.innerText.slice(0,500)
+                    }; 
+                    break; 
+                }
+            } catch(e){}
+        }
+        
+        // collect distinct class name frequency from first 200 divs
+        const classFreq = {};
+        Array.from(document.querySelectorAll('div')).slice(0,200).forEach(d => {
+            const classes = (d.className || '').toString().split(/\\s+/).filter(Boolean);
+            classes.forEach(c => classFreq[c] = (classFreq[c]||0) + 1);
+        });
+        
+        // gather visible h3 texts
+        const h3s = Array.from(document.querySelectorAll('h3')).map(h => h.textContent?.trim()).filter(Boolean).slice(0,10);
+        
+        return {
+            counts, 
+            sample, 
+            topH3s: h3s, 
+            topClasses: Object.entries(classFreq).sort((a,b)=>b[1]-a[1]).slice(0,30),
+            bestContainerSelector: counts['.Nv2PK'] > 0 ? '.Nv2PK' : 
+                                  counts['div[role="article"]'] > 0 ? 'div[role="article"]' :
+                                  counts['[data-result-index]'] > 0 ? '[data-result-index]' : null
+        };
+    }
+"""
+
+# Takes {limit, containerSelector}
+_MAPS_EXTRACTION_JS = r"""
+    (params) => {
+      const limit = params.limit || 10;
+      const containerSelector = params.containerSelector || '.Nv2PK';
+      const out = [];
+      let containers = [];
+      
+      // Try the primary selector first
+      try {
+        containers = Array.from(document.querySelectorAll(containerSelector)).filter(n => n && n.textContent && n.textContent.trim().length>10);
+        console.log('[MAPS-EXTRACT] Found', containers.length, 'containers with selector:', containerSelector);
+      } catch(e) {
+        console.log('[MAPS-EXTRACT] Error with primary selector:', e);
+      }
+      
+      // Fallback to other selectors if primary not found
+      if (containers.length === 0) {
+        const fallbackSelectors = ['.Nv2PK', 'div[role="article"]', '[data-result-index]', 'div:has(h3)'];
+        for (const sel of fallbackSelectors) {
+          try {
+            const found = Array.from(document.querySelectorAll(sel)).filter(c => c && c.textContent && c.textContent.trim().length>10);
+            if (found.length > 0) {
+              containers.push(...found);
+              console.log('[MAPS-EXTRACT] Using fallback selector:', sel, 'found', found.length);
+              break;
+            }
+          } catch(e) { continue; }
+        }
+      }
+      
+      for (let i = 0; i < Math.min(limit, containers.length); i++) {
+        const c = containers[i];
+        // NAME
+        const nameEl = c.querySelector('.qBF1Pd') || c.querySelector('[role="heading"]') || c.querySelector('h3');
+        const name = nameEl ? nameEl.textContent.trim() : null;
+        
+        // URL (maps place link)
+        let url = null;
+        const a = c.querySelector('a[href*="/maps/place"], a[href*="/maps/dir"], a[href*="maps.google"]');
+        if (a && a.href) url = a.href;
+        else if (name) url = 'https://www.google.com/maps/search/' + encodeURIComponent(name);
+        
+        // RATING and REVIEWS
+        let rating = null, reviews = null;
+        // preference: aria-label on an element that contains rating+reviews
+        const ariaEl = c.querySelector('[aria-label*="stars"], [aria-label*="star"], [aria-label*="Reviews"], [aria-label*="review"]');
+        if (ariaEl && ariaEl.getAttribute) {
+          const aria = ariaEl.getAttribute('aria-label') || '';
+          const rMatch = aria.match(/(\d(?:\.\d)?)/);
+          const revMatch = aria.match(/\b(\d[\d,]*)\b(?=\s*Reviews|\))/i);
+          if (rMatch) rating = rMatch[1];
+          if (revMatch) reviews = revMatch[1].replace(/,/g,'');
+        }
+        // fallback: numeric .MW4etd inside card
+        if (!rating) {
+          const rEl = c.querySelector('.MW4etd');
+          if (rEl) rating = rEl.textContent.trim().match(/(\d(?:\.\d)?)/)?.[1] || null;
+        }
+        // Also try to find reviews count inside element .UY7F9 or similar
+        if (!reviews) {
+          const revEl = c.querySelector('.UY7F9, .QBUL8c ~ .UY7F9') || c.querySelector('[aria-hidden="true"]');
+          if (revEl && /\(\d/.test(revEl.textContent)) {
+            reviews = (revEl.textContent.match(/\d[\d,]*/) || [null])[0];
+            if (reviews) reviews = reviews.replace(/,/g,'');
+          }
+        }
+        
+        // PRICE / CATEGORY / ADDRESS: there are multiple .W4Efsd blocks; get sensible lines
+        let category = null, price = null, address = null;
+        try {
+          const w = Array.from(c.querySelectorAll('.W4Efsd')).map(el => el.innerText && el.innerText.trim()).filter(Boolean);
+          // Example structure seen: ["4.7(687) · ₹200–400", "Pizza · HOUSE NO 557, GROUND FLOOR", "Open ⋅ Closes 10 pm"]
+          if (w.length >= 1) {
+            // try to find price token (₹) and category/address by heuristics
+            for (const line of w) {
+              if (line.includes('₹')) {
+                price = line.match(/₹\s*[\d,–\-\s]+/)?.[0] || price;
+              }
+              // category is often short word like "Pizza"
+              const catMatch = line.match(/^[A-Za-z &amp;]+(?=\s*·|$)/);
+              if (catMatch && !category) category = catMatch[0].trim();
+            }
+            // address: try second line after category if present
+            if (w.length >= 2) {
+              // take the portion after the dot separator '·' if exists
+              const possible = w[1].split('·').map(s => s.trim()).filter(Boolean);
+              // prefer anything that looks like an address (contains digits or ALL CAPS words)
+              for (const p of possible) {
+                if (/\d/.test(p) || /[A-Z]{2,}/.test(p) || p.length>10) {
+                  address = p;
+                  break;
+                }
+              }
+              if (!address) address = possible.join(' · ') || null;
+            } else {
+              // fallback: try to parse address from full card text removing name and rating
+              const txt = c.innerText.replace(name || '', '').replace(/[\r\n]+/g,'\n').split('\n').map(s=>s.trim()).filter(Boolean);
+              if (txt.length >= 2) address = txt.slice(1,4).join(' | ');
+            }
+          }
+        } catch(e) {}
+        
+        out.push({
+          name: name || null,
+          rating: rating ? (isNaN(Number(rating)) ? rating : Number(rating)) : null,
+          reviews: reviews ? (isNaN(Number(reviews)) ? reviews : Number(reviews)) : null,
+          price: price || null,
+          category: category || null,
+          address: address || null,
+          url: url || null
+        });
+      }
+      return out;
+    }
+"""
+
+_MAPS_SNAPSHOT_JS = f"""
+    (limit) => {{
+        const counts = ({_MAPS_COUNTS_JS.strip()})();
+        const pageDiagnostic = ({_MAPS_DIAGNOSTIC_JS.strip()})();
+        const data = ({_MAPS_EXTRACTION_JS.strip()})({{
+            limit,
+            containerSelector: pageDiagnostic.bestContainerSelector || '.Nv2PK'
+        }});
+        return {{
+            counts,
+            pageDiagnostic,
+            pageTextPreview: data.length === 0 ? document.body.innerText.slice(0, 2000) : null,
+            data
+        }};
+    }}
+"""
+
+# Calls the snapshot installed by EXTRACTION_INIT_JS; null when it is missing
+_CALL_MAPS_SNAPSHOT_JS = "(limit) => typeof window.__quashMapsSnapshot === 'function' ? window.__quashMapsSnapshot(limit) : null"
 
 
 class GoogleMapsHandler:
@@ -88,233 +302,38 @@ class GoogleMapsHandler:
             except Exception as e2:
                 pass
 
-        # Poll for results for up to 20 seconds
-        total_wait = 20
-        poll_interval = 1.5
-        elapsed = 0.0
-        found = False
-        diagnostic = {}
+        # Wait up to 20 seconds for result containers. The condition is re-checked in
+        # the page every animation frame, so this returns as soon as they render
+        # instead of on the next tick of a Python poll
+        try:
+            await page.wait_for_function("""
+                () => document.querySelector('div[role="article"], [data-result-index]') !== null
+                    || document.querySelectorAll('h3').length >= 3
+                    || (document.querySelector('#pane')?.children.length || 0) > 0
+            """, timeout=20000)
+        except Exception:
+            pass  # Extract whatever is there; an empty result gets its page text checked
         
-        while elapsed < total_wait:
-            # check common result containers counts
-            counts = await page.evaluate("""
-                () => {
-                    return {
-                        roleArticle: document.querySelectorAll('div[role="article"]').length,
-                        dataResultIndex: document.querySelectorAll('[data-result-index]').length,
-                        h3s: document.querySelectorAll('h3').length,
-                        paneExists: !!document.querySelector('#pane'),
-                        paneChildren: document.querySelector('#pane') ? document.querySelector('#pane').children.length : 0,
-                        bodyTextLen: document.body.innerText.length
-                    };
-                }
-            """)
-            diagnostic = counts
-            
-            
-            if counts.get("roleArticle", 0) >= 1 or counts.get("dataResultIndex", 0) >= 1 or counts.get("h3s", 0) >= 3 or counts.get("paneChildren", 0) > 0:
-                found = True
-                break
-            await asyncio.sleep(poll_interval)
-            elapsed += poll_interval
+        # One evaluate inspects, diagnoses and extracts against the same DOM. The snapshot
+        # function is preinstalled in the context; the source is only sent if it is missing
+        snapshot = await page.evaluate(_CALL_MAPS_SNAPSHOT_JS, limit)
+        if snapshot is None:
+            snapshot = await page.evaluate(_MAPS_SNAPSHOT_JS, limit)
+        diagnostic = snapshot["counts"]
 
-        # If not found, capture page text to diagnose (maybe blocked)
-        if not found:
-            page_text = await page.evaluate("() => document.body.innerText.slice(0,2000)")
-            diagnostic["pageTextPreview"] = page_text[:2000]
+        # No results - check the page text for blocking (captcha) first
+        page_text = snapshot["pageTextPreview"]
+        if page_text is not None:
+            diagnostic["pageTextPreview"] = page_text
             
             # detect captcha keywords
             if any(k in page_text.lower() for k in ["unusual traffic", "automated queries", "captcha", "verify you're not a robot", "/sorry/"]):
                 return {"status":"blocked", "message":"Detected CAPTCHA or Google blocking", "diagnostic": diagnostic}
 
-        # Run diagnostic to inspect actual page structure and adapt selectors
-        page_diagnostic = await page.evaluate("""
-            () => {
-                const selectors = [
-                    'div[role="article"]',
-                    '[data-result-index]',
-                    'h3',
-                    '.Nv2PK',
-                    '.qBF1Pd',
-                    '.MW4etd',
-                    '[aria-label*="star"]',
-                    '#pane',
-                    '[role="main"]'
-                ];
-                const counts = {};
-                selectors.forEach(s => {
-                    try { counts[s] = document.querySelectorAll(s).length; } catch(e){ counts[s]=0; }
-                });
-
-                // find first container candidate
-                const candidateSelectors = ['div[role="article"]', '[data-result-index]', '.Nv2PK', 'div:has(h3)'];
-                let sample = null;
-                for (const s of candidateSelectors) {
-                    try {
-                        const el = document.querySelector(s);
-                        if (el) { 
-                            sample = {
-                                selector: s, 
-                                outerHTML: el.outerHTML.slice(0,2000), 
-                                textPreview: el.innerText.slice(0,500)
-                            }; 
-                            break; 
-                        }
-                    } catch(e){}
-                }
-
-                // collect distinct class name frequency from first 200 divs
-                const classFreq = {};
-                Array.from(document.querySelectorAll('div')).slice(0,200).forEach(d => {
-                    const classes = (d.className || '').toString().split(/\\s+/).filter(Boolean);
-                    classes.forEach(c => classFreq[c] = (classFreq[c]||0) + 1);
-                });
-
-                // gather visible h3 texts
-                const h3s = Array.from(document.querySelectorAll('h3')).map(h => h.textContent?.trim()).filter(Boolean).slice(0,10);
-
-                return {
-                    counts, 
-                    sample, 
-                    topH3s: h3s, 
-                    topClasses: Object.entries(classFreq).sort((a,b)=>b[1]-a[1]).slice(0,30),
-                    bestContainerSelector: counts['.Nv2PK'] > 0 ? '.Nv2PK' : 
-                                          counts['div[role="article"]'] > 0 ? 'div[role="article"]' :
-                                          counts['[data-result-index]'] > 0 ? '[data-result-index]' : null
-                };
-            }
-        """)
-        
-        
         # Update diagnostic with page inspection results
-        diagnostic.update(page_diagnostic)
+        diagnostic.update(snapshot["pageDiagnostic"])
 
-        # Extract results from containers using improved extraction logic
-        # Use the best container selector found in diagnostic
-        best_selector = page_diagnostic.get('bestContainerSelector') or '.Nv2PK'
-        
-        # Build extraction JS with dynamic selector (using raw string since we pass selector as parameter)
-        extraction_js = r"""
-        (params) => {
-          const limit = params.limit || 10;
-          const containerSelector = params.containerSelector || '.Nv2PK';
-          const out = [];
-          let containers = [];
-          
-          // Try the primary selector first
-          try {
-            containers = Array.from(document.querySelectorAll(containerSelector)).filter(n => n && n.textContent && n.textContent.trim().length>10);
-            console.log('[MAPS-EXTRACT] Found', containers.length, 'containers with selector:', containerSelector);
-          } catch(e) {
-            console.log('[MAPS-EXTRACT] Error with primary selector:', e);
-          }
-          
-          // Fallback to other selectors if primary not found
-          if (containers.length === 0) {
-            const fallbackSelectors = ['.Nv2PK', 'div[role="article"]', '[data-result-index]', 'div:has(h3)'];
-            for (const sel of fallbackSelectors) {
-              try {
-                const found = Array.from(document.querySelectorAll(sel)).filter(c => c && c.textContent && c.textContent.trim().length>10);
-                if (found.length > 0) {
-                  containers.push(...found);
-                  console.log('[MAPS-EXTRACT] Using fallback selector:', sel, 'found', found.length);
-                  break;
-                }
-              } catch(e) { continue; }
-            }
-          }
-          
-          for (let i = 0; i < Math.min(limit, containers.length); i++) {
-            const c = containers[i];
-            // NAME
-            const nameEl = c.querySelector('.qBF1Pd') || c.querySelector('[role="heading"]') || c.querySelector('h3');
-            const name = nameEl ? nameEl.textContent.trim() : null;
-
-            // URL (maps place link)
-            let url = null;
-            const a = c.querySelector('a[href*="/maps/place"], a[href*="/maps/dir"], a[href*="maps.google"]');
-            if (a && a.href) url = a.href;
-            else if (name) url = 'https://www.google.com/maps/search/' + encodeURIComponent(name);
-
-            // RATING and REVIEWS
-            let rating = null, reviews = null;
-            // preference: aria-label on an element that contains rating+reviews
-            const ariaEl = c.querySelector('[aria-label*="stars"], [aria-label*="star"], [aria-label*="Reviews"], [aria-label*="review"]');
-            if (ariaEl && ariaEl.getAttribute) {
-              const aria = ariaEl.getAttribute('aria-label') || '';
-              const rMatch = aria.match(/(\d(?:\.\d)?)/);
-              const revMatch = aria.match(/\b(\d[\d,]*)\b(?=\s*Reviews|\))/i);
-              if (rMatch) rating = rMatch[1];
-              if (revMatch) reviews = revMatch[1].replace(/,/g,'');
-            }
-            // fallback: numeric .MW4etd inside card
-            if (!rating) {
-              const rEl = c.querySelector('.MW4etd');
-              if (rEl) rating = rEl.textContent.trim().match(/(\d(?:\.\d)?)/)?.[1] || null;
-            }
-            // Also try to find reviews count inside element .UY7F9 or similar
-            if (!reviews) {
-              const revEl = c.querySelector('.UY7F9, .QBUL8c ~ .UY7F9') || c.querySelector('[aria-hidden="true"]');
-              if (revEl && /\(\d/.test(revEl.textContent)) {
-                reviews = (revEl.textContent.match(/\d[\d,]*/) || [null])[0];
-                if (reviews) reviews = reviews.replace(/,/g,'');
-              }
-            }
-
-            // PRICE / CATEGORY / ADDRESS: there are multiple .W4Efsd blocks; get sensible lines
-            let category = null, price = null, address = null;
-            try {
-              const w = Array.from(c.querySelectorAll('.W4Efsd')).map(el => el.innerText && el.innerText.trim()).filter(Boolean);
-              // Example structure seen: ["4.7(687) · ₹200–400", "Pizza · HOUSE NO 557, GROUND FLOOR", "Open ⋅ Closes 10 pm"]
-              if (w.length >= 1) {
-                // try to find price token (₹) and category/address by heuristics
-                for (const line of w) {
-                  if (line.includes('₹')) {
-                    price = line.match(/₹\s*[\d,–\-\s]+/)?.[0] || price;
-                  }
-                  // category is often short word like "Pizza"
-                  const catMatch = line.match(/^[A-Za-z &amp;]+(?=\s*·|$)/);
-                  if (catMatch && !category) category = catMatch[0].trim();
-                }
-                // address: try second line after category if present
-                if (w.length >= 2) {
-                  // take the portion after the dot separator '·' if exists
-                  const possible = w[1].split('·').map(s => s.trim()).filter(Boolean);
-                  // prefer anything that looks like an address (contains digits or ALL CAPS words)
-                  for (const p of possible) {
-                    if (/\d/.test(p) || /[A-Z]{2,}/.test(p) || p.length>10) {
-                      address = p;
-                      break;
-                    }
-                  }
-                  if (!address) address = possible.join(' · ') || null;
-                } else {
-                  // fallback: try to parse address from full card text removing name and rating
-                  const txt = c.innerText.replace(name || '', '').replace(/[\r\n]+/g,'\n').split('\n').map(s=>s.trim()).filter(Boolean);
-                  if (txt.length >= 2) address = txt.slice(1,4).join(' | ');
-                }
-              }
-            } catch(e) {}
-
-            out.push({
-              name: name || null,
-              rating: rating ? (isNaN(Number(rating)) ? rating : Number(rating)) : null,
-              reviews: reviews ? (isNaN(Number(reviews)) ? reviews : Number(reviews)) : null,
-              price: price || null,
-              category: category || null,
-              address: address || null,
-              url: url || null
-            });
-          }
-          return out;
-        }
-        """
-        
-        # Call extraction with both limit and the dynamically determined selector
-        # page.evaluate() only takes one argument after the JS code, so pass both as a dict
-        extraction = await page.evaluate(extraction_js, {"limit": limit, "containerSelector": best_selector})
-
-        return {"status": "success", "data": extraction, "diagnostic": diagnostic}
+        return {"status": "success", "data": snapshot["data"], "diagnostic": diagnostic}
 
 
 class GoogleSearchHandler:
@@ -335,8 +354,8 @@ class GoogleSearchHandler:
             pass  # Continue anyway
         
         # Extract search results using specialized JavaScript
-        results = await page.evaluate(f"""
-            () => {{
+        results = await page.evaluate("""
+            (limit) => {
                 const searchResults = [];
                 
                 // Find all search result containers - Google uses multiple selectors
@@ -349,26 +368,26 @@ class GoogleSearchHandler:
                 ];
                 
                 let containers = [];
-                for (const sel of containerSelectors) {{
-                    try {{
+                for (const sel of containerSelectors) {
+                    try {
                         const found = document.querySelectorAll(sel);
-                        if (found.length > 0) {{
+                        if (found.length > 0) {
                             containers = Array.from(found);
                             break;
-                        }}
-                    }} catch(e) {{
+                        }
+                    } catch(e) {
                         continue;
-                    }}
-                }}
+                    }
+                }
                 
                 // Filter to only actual search results (not ads, not navigation, etc.)
-                containers = containers.filter(container => {{
+                containers = containers.filter(container => {
                     // Skip if it's an ad
                     if (container.closest('[data-text-ad]') || 
                         container.closest('.ads') ||
-                        container.querySelector('[data-text-ad]')) {{
+                        container.querySelector('[data-text-ad]')) {
                         return false;
-                    }}
+                    }
                     
                     // Must have a link
                     const link = container.querySelector('a[href*="http"]');
@@ -379,9 +398,9 @@ class GoogleSearchHandler:
                     if (!title) return false;
                     
                     return true;
-                }});
+                });
                 
-                for (let i = 0; i < Math.min({limit}, containers.length); i++) {{
+                for (let i = 0; i < Math.min(limit, containers.length); i++) {
                     const container = containers[i];
                     
                     // Get title
@@ -391,31 +410,31 @@ class GoogleSearchHandler:
                     // Get URL - from the main link in the result
                     let url = null;
                     const linkEl = container.querySelector('a[href*="http"]');
-                    if (linkEl) {{
+                    if (linkEl) {
                         const href = linkEl.getAttribute('href');
-                        if (href && href.startsWith('http')) {{
+                        if (href && href.startsWith('http')) {
                             url = href;
-                        }} else if (href && href.startsWith('/url?q=')) {{
+                        } else if (href && href.startsWith('/url?q=')) {
                             // Google sometimes wraps URLs in /url?q=...
                             const match = href.match(/[?&]q=([^&]+)/);
-                            if (match) {{
+                            if (match) {
                                 url = decodeURIComponent(match[1]);
-                            }}
-                        }}
-                    }}
+                            }
+                        }
+                    }
                     
                     // Only add if we have both title and URL
-                    if (title && url && url.startsWith('http')) {{
-                        searchResults.push({{
+                    if (title && url && url.startsWith('http')) {
+                        searchResults.push({
                             title: title,
                             url: url
-                        }});
-                    }}
-                }}
+                        });
+                    }
+                }
                 
                 return searchResults;
-            }}
-        """)
+            }
+        """, limit)
         
         return {
             "status": "success",
@@ -436,10 +455,10 @@ class SwiggyHandler:
         Returns: {"status":"success","data":[{name, rating, cuisine, location, price}], "diagnostic": {...}}
         """
         try:
-            print(f"\n=== SWIGGY SEARCH STARTED ===")
-            print(f"Query: '{query}'")
-            print(f"Location: '{location}'")
-            print(f"Limit: {limit}")
+            logger.debug("=== SWIGGY SEARCH STARTED ===")
+            logger.debug("Query: '%s'", query)
+            logger.debug("Location: '%s'", location)
+            logger.debug("Limit: %s", limit)
             
             # Build Swiggy URL - go to homepage
             base_url = "https://www.swiggy.com"
@@ -472,10 +491,10 @@ class SwiggyHandler:
                         "details": navigate_action if navigate_action else {"action": "navigate", "url": base_url, "description": "Navigate to Swiggy homepage"}
                     })
                 
-                print(f"\n[1/7] Navigating to Swiggy homepage: {base_url}")
+                logger.debug("[1/7] Navigating to Swiggy homepage: %s", base_url)
                 await page.goto(base_url, wait_until="domcontentloaded", timeout=30000)
                 await asyncio.sleep(3)  # Let page settle
-                print(f"✓ Page loaded: {page.url}")
+                logger.debug("✓ Page loaded: %s", page.url)
                 
                 if websocket:
                     step_num = 1
@@ -495,7 +514,7 @@ class SwiggyHandler:
                         "result": {"status": "success", "url": page.url}
                     })
             except Exception as e:
-                print(f"✗ Failed to load Swiggy: {e}")
+                logger.debug("✗ Failed to load Swiggy: %s", e)
                 if websocket:
                     step_num = 1
                     if plan:
@@ -541,7 +560,7 @@ class SwiggyHandler:
                     "details": type_location_action if type_location_action else {"action": "type", "selector": "input[type='text']", "text": location, "description": f"Type location: {location}"}
                 })
             
-            print(f"\n[2/7] Setting location: '{location}'")
+            logger.debug("[2/7] Setting location: '%s'", location)
             location_input_selectors = [
                 "input[placeholder*='Enter your delivery location']",
                 "input[placeholder*='location']",
@@ -577,11 +596,11 @@ class SwiggyHandler:
                         location_input = inputs[0]  # First input is location
                         
                         # Clear and type location
-                        print(f"  Typing location into input...")
+                        logger.debug("Typing location into input...")
                         await location_input.fill("")
                         await location_input.type(location, delay=100)
                         await asyncio.sleep(2)
-                        print(f"  ✓ Location typed, waiting for suggestions...")
+                        logger.debug("✓ Location typed, waiting for suggestions...")
                         
                         # Wait for location suggestions to appear
                         try:
@@ -660,7 +679,7 @@ class SwiggyHandler:
                                 if first_location_suggestion:
                                     # Click the first location suggestion
                                     suggestion_text = await first_location_suggestion.text_content()
-                                    print(f"  ✓ Found location suggestion: '{suggestion_text[:60] if suggestion_text else 'N/A'}'")
+                                    logger.debug("✓ Found location suggestion: '%s'", suggestion_text[:60] if suggestion_text else 'N/A')
                                     
                                     if websocket:
                                         step_num = 2
@@ -699,10 +718,10 @@ class SwiggyHandler:
                                             "details": click_location_action if click_location_action else {"action": "click", "selector": "location suggestion", "description": "Click location suggestion"}
                                         })
                                     
-                                    print(f"  Clicking location suggestion...")
+                                    logger.debug("Clicking location suggestion...")
                                     await first_location_suggestion.click()
                                     await asyncio.sleep(2)
-                                    print(f"  ✓ Location set successfully")
+                                    logger.debug("✓ Location set successfully")
                                     
                                     if websocket:
                                         step_num = 3
@@ -775,7 +794,7 @@ class SwiggyHandler:
                     "details": click_search_action
                 })
             
-            print(f"\n[4/7] Opening food search...")
+            logger.debug("[4/7] Opening food search...")
             # The search field is a DIV with type="button", not an input!
             # We need to click it first to open the actual search input
             await asyncio.sleep(2)
@@ -795,10 +814,10 @@ class SwiggyHandler:
             
             if search_div:
                 # Click it to open the search input
-                print(f"  Found search div, clicking to open search input...")
+                logger.debug("Found search div, clicking to open search input...")
                 await search_div.click()
                 await asyncio.sleep(2)  # Wait for search input to appear
-                print(f"  ✓ Search input should be visible now")
+                logger.debug("✓ Search input should be visible now")
                 
                 if websocket and click_search_action:
                     step_num = 4
@@ -843,38 +862,27 @@ class SwiggyHandler:
                         "details": type_food_action if type_food_action else {"action": "type", "selector": "search input", "text": query, "description": f"Search for: {query}"}
                     })
             
-            # NOW get the actual input that appears after clicking
-            all_inputs = await page.query_selector_all("input")
-            
-            # Find input that's not location - same logic as location input
-            for inp in all_inputs:
-                try:
-                    inp_id = await inp.get_attribute("id")
-                    inp_type = await inp.get_attribute("type")
-                    placeholder = await inp.get_attribute("placeholder")
-                    is_visible = await inp.is_visible()
-                    
-                    # Skip location input
-                    if inp_id == "location" or (placeholder and "location" in placeholder.lower()):
-                        continue
-                    
-                    # Skip hidden inputs
-                    if not is_visible:
-                        continue
-                    
-                    # Skip non-text inputs (but allow None/empty type which defaults to text)
-                    if inp_type and inp_type not in ['text', 'search']:
-                        continue
-                    
-                    # This is the search input - use it!
-                    search_input = inp
-                    print(f"  ✓ Found search input (id='{inp_id}', placeholder='{placeholder}')")
-                    break
-                except:
-                    continue
+            # NOW get the actual input that appears after clicking: the first visible
+            # text/search input that isn't the location box. Checked in-page in one
+            # call instead of reading attributes and visibility input by input
+            search_input = (await page.evaluate_handle("""
+                () => Array.from(document.querySelectorAll('input')).find(el => {
+                    // Skip location input
+                    const placeholder = (el.getAttribute('placeholder') || '').toLowerCase();
+                    if (el.id === 'location' || placeholder.includes('location')) return false;
+                    // Skip non-text inputs (but allow missing/empty type which defaults to text)
+                    const type = el.getAttribute('type');
+                    if (type && type !== 'text' && type !== 'search') return false;
+                    // Skip hidden inputs
+                    const rect = el.getBoundingClientRect();
+                    return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+                }) || null
+            """)).as_element()
+            if search_input:
+                logger.debug("✓ Found search input")
             
             if not search_input:
-                print(f"  ✗ Could not find search input")
+                logger.debug("✗ Could not find search input")
                 return {
                     "status": "error",
                     "message": "Could not find Swiggy food search input. The site structure may have changed.",
@@ -916,9 +924,9 @@ class SwiggyHandler:
                 pass
             
             # Press Enter directly on the input (more reliable than clicking button)
-            print(f"  Pressing Enter to submit search...")
+            logger.debug("Pressing Enter to submit search...")
             await search_input.press("Enter")
-            print(f"  ✓ Search submitted")
+            logger.debug("✓ Search submitted")
             
             if websocket:
                 step_num = 5
@@ -961,7 +969,7 @@ class SwiggyHandler:
             await asyncio.sleep(3)
             
             # STEP 3: Click "Restaurants" filter button (not "Dishes")
-            print(f"\n[6/7] Clicking 'Restaurants' filter...")
+            logger.debug("[6/7] Clicking 'Restaurants' filter...")
             # The filter buttons appear after search: "Restaurants" and "Dishes"
             restaurants_button = None
             restaurant_button_selectors = [
@@ -973,11 +981,11 @@ class SwiggyHandler:
             
             for selector in restaurant_button_selectors:
                 try:
-                    btn = await page.query_selector(selector)
+                    # :visible filters hidden matches in the same query
+                    btn = await page.query_selector(f"{selector}:visible")
                     if btn:
-                        is_visible = await btn.is_visible()
                         text = await btn.text_content()
-                        if is_visible and text and "Restaurants" in text and "Dishes" not in text:
+                        if text and "Restaurants" in text and "Dishes" not in text:
                             restaurants_button = btn
                             break
                 except:
@@ -1001,10 +1009,10 @@ class SwiggyHandler:
                     pass
             
             if restaurants_button:
-                print(f"  ✓ Found Restaurants button, clicking...")
+                logger.debug("✓ Found Restaurants button, clicking...")
                 await restaurants_button.click()
                 await asyncio.sleep(3)  # Wait for filter to apply and page to update
-                print(f"  ✓ Restaurants filter applied")
+                logger.debug("✓ Restaurants filter applied")
                 
                 if websocket:
                     step_num = 6
@@ -1041,7 +1049,7 @@ class SwiggyHandler:
                         "details": extract_action if extract_action else {"action": "extract", "limit": limit, "description": "Extract restaurant data"}
                     })
             else:
-                print(f"  Restaurants button not found, continuing anyway...")
+                logger.debug("Restaurants button not found, continuing anyway...")
                 if websocket:
                     step_num = 6
                     if plan and click_restaurants_action:
@@ -1102,14 +1110,14 @@ class SwiggyHandler:
             await asyncio.sleep(2)
             
             # Poll for restaurant cards
-            print(f"\n[7/7] Extracting restaurant data...")
+            logger.debug("[7/7] Extracting restaurant data...")
             total_wait = 15
             poll_interval = 2
             elapsed = 0
             found = False
             
             while elapsed < total_wait:
-                print(f"  Polling for restaurant cards... ({elapsed}s/{total_wait}s)")
+                logger.debug("Polling for restaurant cards... (%ss/%ss)", elapsed, total_wait)
                 card_count = await page.evaluate("""
                     () => {
                         // Try multiple strategies to find restaurant cards
@@ -1145,7 +1153,7 @@ class SwiggyHandler:
                 """)
                 
                 if card_count >= 1:
-                    print(f"  ✓ Found {card_count} restaurant cards!")
+                    logger.debug("✓ Found %s restaurant cards!", card_count)
                     found = True
                     break
                 
@@ -1463,10 +1471,10 @@ class SwiggyHandler:
             
             data = await page.evaluate(extraction_js, {"limit": limit})
             
-            print(f"\n=== EXTRACTION COMPLETE ===")
-            print(f"Extracted {len(data)} restaurants")
+            logger.debug("=== EXTRACTION COMPLETE ===")
+            logger.debug("Extracted %s restaurants", len(data))
             for i, item in enumerate(data[:3], 1):
-                print(f"  {i}. {item.get('name', 'N/A')} - Rating: {item.get('rating', 'N/A')}")
+                logger.debug("%s. %s - Rating: %s", i, item.get('name', 'N/A'), item.get('rating', 'N/A'))
             
             result = {
                 "status": "success",
@@ -1496,11 +1504,11 @@ class SwiggyHandler:
             return result
             
         except Exception as e:
-            import traceback
+            # The logger records the traceback; it is not sent back to the client
+            logger.exception("Swiggy search failed")
             return {
                 "status": "error",
-                "message": str(e),
-                "traceback": traceback.format_exc()
+                "message": str(e)
             }
 
 
@@ -1516,11 +1524,11 @@ class ZomatoHandler:
         Returns: {"status":"success","data":[{name, rating, cuisine, location, price, url}]}
         """
         try:
-            print(f"\n=== ZOMATO SEARCH STARTED ===")
-            print(f"Query: '{query}'")
-            print(f"Location: '{location}'")
-            print(f"City: '{city}'")
-            print(f"Limit: {limit}")
+            logger.debug("=== ZOMATO SEARCH STARTED ===")
+            logger.debug("Query: '%s'", query)
+            logger.debug("Location: '%s'", location)
+            logger.debug("City: '%s'", city)
+            logger.debug("Limit: %s", limit)
             
             # Build Zomato URL - go to city page
             base_url = f"https://www.zomato.com/{city}"
@@ -1551,7 +1559,7 @@ class ZomatoHandler:
                         "details": navigate_action if navigate_action else {"action": "navigate", "url": base_url, "description": f"Navigate to Zomato {city}"}
                     })
                 
-                print(f"\n[1/{total_steps}] Navigating to Zomato: {base_url}")
+                logger.debug("[1/%s] Navigating to Zomato: %s", total_steps, base_url)
                 
                 # Try navigation with retries - Zomato sometimes blocks with HTTP2 errors
                 navigation_success = False
@@ -1568,7 +1576,6 @@ class ZomatoHandler:
                     for attempt in range(2):  # 2 attempts per URL
                         try:
                             # Add a small random delay to appear more human-like
-                            import random
                             await asyncio.sleep(random.uniform(1, 2))
                             
                             # Try with domcontentloaded (fastest, most reliable)
@@ -1593,7 +1600,7 @@ class ZomatoHandler:
                                 break
                         except Exception as e:
                             last_error = e
-                            print(f"  Attempt {attempt + 1}/2 for {url_to_try} failed: {str(e)[:100]}")
+                            logger.debug("Attempt %s/2 for %s failed: %.100s", attempt + 1, url_to_try, e)
                             if attempt < 1:
                                 await asyncio.sleep(3)  # Wait longer before retry
                     
@@ -1605,7 +1612,7 @@ class ZomatoHandler:
                     if "HTTP2" in str(last_error) or "ERR_HTTP2" in str(last_error):
                         error_msg = "Zomato is blocking automated access (HTTP2 protocol error). This is a known issue with Zomato's anti-bot protection."
                     
-                    print(f"✗ {error_msg}")
+                    logger.debug("✗ %s", error_msg)
                     if websocket:
                         step_num = 1
                         if plan:
@@ -1630,7 +1637,7 @@ class ZomatoHandler:
                     }
                 
                 await asyncio.sleep(1)  # Let page settle
-                print(f"✓ Page loaded: {page.url}")
+                logger.debug("✓ Page loaded: %s", page.url)
                 
                 if websocket:
                     await websocket.send_json({
@@ -1643,7 +1650,7 @@ class ZomatoHandler:
                         "result": {"status": "success", "url": page.url}
                     })
             except Exception as e:
-                print(f"✗ Failed to load Zomato: {e}")
+                logger.debug("✗ Failed to load Zomato: %s", e)
                 if websocket:
                     step_num = 1
                     if plan:
@@ -1683,7 +1690,7 @@ class ZomatoHandler:
                     "details": click_location_dropdown_action if click_location_dropdown_action else {"action": "click", "selector": "location dropdown", "description": "Click location dropdown"}
                 })
             
-            print(f"\n[2/{total_steps}] Clicking location dropdown...")
+            logger.debug("[2/%s] Clicking location dropdown...", total_steps)
             location_dropdown = None
             dropdown_selectors = [
                 "div[class*='sc-18n4g8v-0']",  # Zomato location dropdown
@@ -1724,7 +1731,7 @@ class ZomatoHandler:
             if location_dropdown:
                 await location_dropdown.click()
                 await asyncio.sleep(1)
-                print(f"✓ Location dropdown clicked")
+                logger.debug("✓ Location dropdown clicked")
                 
                 if websocket:
                     await websocket.send_json({
@@ -1737,7 +1744,7 @@ class ZomatoHandler:
                         "result": {"status": "success"}
                     })
             else:
-                print(f"Location dropdown not found, trying to type directly...")
+                logger.debug("Location dropdown not found, trying to type directly...")
             
             # STEP 3: Type location in the dropdown input
             type_location_action = None
@@ -1764,7 +1771,7 @@ class ZomatoHandler:
                     "details": type_location_action if type_location_action else {"action": "type", "selector": "location input", "text": location, "description": f"Type location: {location}"}
                 })
             
-            print(f"\n[3/{total_steps}] Typing location: '{location}'")
+            logger.debug("[3/%s] Typing location: '%s'", total_steps, location)
             location_input = None
             
             # Find the location input that appears after clicking dropdown
@@ -1792,12 +1799,7 @@ class ZomatoHandler:
             # If not found, use first visible text input
             if not location_input:
                 try:
-                    all_inputs = await page.query_selector_all("input[type='text']")
-                    for inp in all_inputs:
-                        is_visible = await inp.is_visible()
-                        if is_visible:
-                            location_input = inp
-                            break
+                    location_input = await page.query_selector("input[type='text']:visible")
                 except:
                     pass
             
@@ -1805,7 +1807,7 @@ class ZomatoHandler:
                 await location_input.fill("")
                 await location_input.type(location, delay=100)
                 await asyncio.sleep(2)  # Wait for suggestions
-                print(f"✓ Location typed, waiting for suggestions...")
+                logger.debug("✓ Location typed, waiting for suggestions...")
                 
                 if websocket:
                     await websocket.send_json({
@@ -1818,7 +1820,7 @@ class ZomatoHandler:
                         "result": {"status": "success"}
                     })
             else:
-                print(f"Location input not found")
+                logger.debug("Location input not found")
             
             # STEP 4: Select location suggestion
             click_location_suggestion_action = None
@@ -1845,7 +1847,7 @@ class ZomatoHandler:
                     "details": click_location_suggestion_action if click_location_suggestion_action else {"action": "click", "selector": "location suggestion", "description": "Click location suggestion"}
                 })
             
-            print(f"\n[4/{total_steps}] Selecting location suggestion...")
+            logger.debug("[4/%s] Selecting location suggestion...", total_steps)
             
             # Find suggestions - look for dropdown items
             suggestion_selectors = [
@@ -1869,7 +1871,7 @@ class ZomatoHandler:
                             # Check for exact match (case-insensitive)
                             if location_lower in text_lower or text_lower in location_lower:
                                 selected_suggestion = suggestion
-                                print(f"✓ Found exact location match: '{text[:60]}'")
+                                logger.debug("✓ Found exact location match: '%s'", text[:60])
                                 break
                     if selected_suggestion:
                         break
@@ -1884,7 +1886,7 @@ class ZomatoHandler:
                         if len(suggestions) > 0:
                             selected_suggestion = suggestions[0]
                             text = await selected_suggestion.text_content()
-                            print(f"✓ Selected first suggestion: '{text[:60] if text else 'N/A'}'")
+                            logger.debug("✓ Selected first suggestion: '%s'", text[:60] if text else 'N/A')
                             break
                     except:
                         continue
@@ -1892,7 +1894,7 @@ class ZomatoHandler:
             if selected_suggestion:
                 await selected_suggestion.click()
                 await asyncio.sleep(2)  # Wait for location to be set
-                print(f"✓ Location selected")
+                logger.debug("✓ Location selected")
                 
                 if websocket:
                     await websocket.send_json({
@@ -1905,7 +1907,7 @@ class ZomatoHandler:
                         "result": {"status": "success"}
                     })
             else:
-                print(f"No location suggestion found, continuing...")
+                logger.debug("No location suggestion found, continuing...")
             
             # STEP 5: Type food query
             type_food_action = None
@@ -1932,7 +1934,7 @@ class ZomatoHandler:
                     "details": type_food_action if type_food_action else {"action": "type", "selector": "food search", "text": query, "description": f"Search for: {query}"}
                 })
             
-            print(f"\n[5/{total_steps}] Typing food query: '{query}'")
+            logger.debug("[5/%s] Typing food query: '%s'", total_steps, query)
             
             # Find food search input (usually on the right side of location)
             food_search_input = None
@@ -1945,12 +1947,11 @@ class ZomatoHandler:
             
             for selector in food_search_selectors:
                 try:
-                    inp = await page.query_selector(selector)
+                    # :visible filters hidden matches in the same query
+                    inp = await page.query_selector(f"{selector}:visible")
                     if inp:
-                        is_visible = await inp.is_visible()
-                        if is_visible:
-                            food_search_input = inp
-                            break
+                        food_search_input = inp
+                        break
                 except:
                     continue
             
@@ -1973,7 +1974,7 @@ class ZomatoHandler:
                 await food_search_input.fill("")
                 await food_search_input.type(query, delay=100)
                 await asyncio.sleep(2)  # Wait for dish suggestions
-                print(f"✓ Food query typed")
+                logger.debug("✓ Food query typed")
                 
                 if websocket:
                     await websocket.send_json({
@@ -1986,7 +1987,7 @@ class ZomatoHandler:
                         "result": {"status": "success"}
                     })
             else:
-                print(f"Food search input not found")
+                logger.debug("Food search input not found")
             
             # STEP 6: Click first dish suggestion
             click_dish_action = None
@@ -2013,7 +2014,7 @@ class ZomatoHandler:
                     "details": click_dish_action if click_dish_action else {"action": "click", "selector": "dish suggestion", "description": "Click first dish suggestion"}
                 })
             
-            print(f"\n[6/{total_steps}] Clicking first dish suggestion...")
+            logger.debug("[6/%s] Clicking first dish suggestion...", total_steps)
             
             # Find dish suggestions dropdown
             dish_suggestion = None
@@ -2036,7 +2037,7 @@ class ZomatoHandler:
                             if is_visible:
                                 dish_suggestion = suggestion
                                 text = await suggestion.text_content()
-                                print(f"✓ Found dish suggestion: '{text[:60] if text else 'N/A'}'")
+                                logger.debug("✓ Found dish suggestion: '%s'", text[:60] if text else 'N/A')
                                 break
                         if dish_suggestion:
                             break
@@ -2046,7 +2047,7 @@ class ZomatoHandler:
             if dish_suggestion:
                 await dish_suggestion.click()
                 await asyncio.sleep(3)  # Wait for results to load
-                print(f"✓ Dish suggestion clicked, waiting for results...")
+                logger.debug("✓ Dish suggestion clicked, waiting for results...")
                 
                 if websocket:
                     await websocket.send_json({
@@ -2059,7 +2060,7 @@ class ZomatoHandler:
                         "result": {"status": "success"}
                     })
             else:
-                print(f"No dish suggestion found, pressing Enter...")
+                logger.debug("No dish suggestion found, pressing Enter...")
                 if food_search_input:
                     await food_search_input.press("Enter")
                     await asyncio.sleep(3)
@@ -2084,7 +2085,7 @@ class ZomatoHandler:
                     "details": wait_action if wait_action else {"action": "wait_for", "selector": "restaurant cards", "description": "Wait for restaurant results"}
                 })
             
-            print(f"\n[7/{total_steps}] Waiting for restaurant results...")
+            logger.debug("[7/%s] Waiting for restaurant results...", total_steps)
             
             # Wait for restaurant cards to appear
             restaurant_container_selectors = [
@@ -2100,7 +2101,7 @@ class ZomatoHandler:
                 try:
                     await page.wait_for_selector(selector, state="visible", timeout=10000)
                     results_loaded = True
-                    print(f"✓ Restaurant results loaded")
+                    logger.debug("✓ Restaurant results loaded")
                     break
                 except:
                     continue
@@ -2140,7 +2141,7 @@ class ZomatoHandler:
                     "details": extract_action if extract_action else {"action": "extract", "limit": limit, "description": "Extract restaurant data"}
                 })
             
-            print(f"\n[{total_steps}/{total_steps}] Extracting restaurant data...")
+            logger.debug("[%s/%s] Extracting restaurant data...", total_steps, total_steps)
             
             # Extract restaurant data using JavaScript
             extraction_js = """
@@ -2247,10 +2248,10 @@ class ZomatoHandler:
             
             data = await page.evaluate(extraction_js, {"limit": limit})
             
-            print(f"\n=== EXTRACTION COMPLETE ===")
-            print(f"Extracted {len(data)} restaurants")
+            logger.debug("=== EXTRACTION COMPLETE ===")
+            logger.debug("Extracted %s restaurants", len(data))
             for i, item in enumerate(data[:3], 1):
-                print(f"  {i}. {item.get('name', 'N/A')} - Rating: {item.get('rating', 'N/A')}")
+                logger.debug("%s. %s - Rating: %s", i, item.get('name', 'N/A'), item.get('rating', 'N/A'))
             
             result = {
                 "status": "success",
@@ -2273,11 +2274,11 @@ class ZomatoHandler:
             return result
             
         except Exception as e:
-            import traceback
+            # The logger records the traceback; it is not sent back to the client
+            logger.exception("Zomato search failed")
             return {
                 "status": "error",
-                "message": str(e),
-                "traceback": traceback.format_exc()
+                "message": str(e)
             }
 
 class YouTubeHandler:
@@ -2298,13 +2299,13 @@ class YouTubeHandler:
             pass  # Continue anyway
         
         # Extract videos using specialized JavaScript
-        videos = await page.evaluate(f"""
-            () => {{
+        videos = await page.evaluate("""
+            (limit) => {
                 const videos = [];
                 // Find all video renderers
                 const videoContainers = document.querySelectorAll('#contents ytd-video-renderer, ytd-video-renderer');
                 
-                for (let i = 0; i < Math.min({limit}, videoContainers.length); i++) {{
+                for (let i = 0; i < Math.min(limit, videoContainers.length); i++) {
                     const container = videoContainers[i];
                     
                     // Get title
@@ -2314,30 +2315,30 @@ class YouTubeHandler:
                     // Get URL - only from video title link, not any link
                     let url = null;
                     const titleLink = container.querySelector('#video-title-link, a#video-title');
-                    if (titleLink) {{
+                    if (titleLink) {
                         const href = titleLink.getAttribute('href');
-                        if (href) {{
+                        if (href) {
                             // Make absolute URL if relative
-                            if (href.startsWith('/')) {{
+                            if (href.startsWith('/')) {
                                 url = 'https://www.youtube.com' + href;
-                            }} else if (href.startsWith('http')) {{
+                            } else if (href.startsWith('http')) {
                                 url = href;
-                            }}
-                        }}
-                    }}
+                            }
+                        }
+                    }
                     
                     // Only add if we have both title and URL
-                    if (title && url && url.includes('/watch')) {{
-                        videos.push({{
+                    if (title && url && url.includes('/watch')) {
+                        videos.push({
                             title: title,
                             url: url
-                        }});
-                    }}
-                }}
+                        });
+                    }
+                }
                 
                 return videos;
-            }}
-        """)
+            }
+        """, limit)
         
         return {
             "status": "success",
@@ -2513,34 +2514,129 @@ class SiteExtractionHandler:
             }
         """
     
+    @classmethod
+    def get_extraction_with_diagnostic_js(cls) -> str:
+        """Get JavaScript that runs the extraction and the page diagnosis in one evaluate."""
+        return f"""
+            (args) => ({{
+                diagnostic: ({cls.get_diagnostic_js()})(),
+                data: ({cls.get_extraction_js()})(args)
+            }})
+        """
+    
     @staticmethod
     def get_extraction_js() -> str:
         """Get JavaScript code for site-specific extraction."""
         return r"""
-                ({schema, limit, siteSelectors, site}) => {
-                    const data = {};
+                ({schema, limit, selectors, site, rows}) => {
+                    // Returns {items: [{field: value, ...}, ...]} - rows are final, so Python
+                    // just forwards them. Empty results carry _empty/_containerCount instead.
+                    const data = {items: []};
+                    const schemaKeys = Object.keys(schema);
+                    
+                    // Button-label prefixes that leak into product names on listing pages
+                    // (patterns shared with the static path in extraction_rules)
+                    const NAME_PREFIX_RE = new RegExp(""" + json.dumps(NAME_PREFIX_PATTERN) + r""", 'i');
+                    const LINK_KEYS = new Set(['link', 'url']);
+                    const cleanText = (value) => value ? String(value).trim() : null;
+                    const passThrough = (value) => value;
+                    // Per-field cleanup, looked up once per schema key rather than branched on per row
+                    const CLEANERS = {
+                        link: cleanText,
+                        url: cleanText,
+                        name: (value) => value ? String(value).trim().replace(NAME_PREFIX_RE, '') : null,
+                    };
+                    const rowFields = schemaKeys.map(key => [key, CLEANERS[key] || passThrough]);
+                    // Build one output row with exactly the schema's fields, cleaned
+                    const finishRow = (valueFor) => {
+                        const row = {};
+                        for (const [key, clean] of rowFields) {
+                            row[key] = clean(valueFor(key));
+                        }
+                        return row;
+                    };
+                    
+                    // Price/rating are shipped as numbers so Python doesn't re-parse the strings
+                    const PRICE_RE = new RegExp(""" + json.dumps(PRICE_PATTERN) + r""");
+                    const RATING_DECIMAL_RE = new RegExp(""" + json.dumps(RATING_DECIMAL_PATTERN) + r""");
+                    const toPrice = (text) => {
+                        if (!text) return null;
+                        const match = String(text).match(PRICE_RE);
+                        return match ? parseFloat(match[0].replace(/,/g, '')) : null;
+                    };
+                    const toRating = (text) => {
+                        if (!text) return null;
+                        const str = String(text).trim();
+                        // Plain number like "4.5" - only accepted if it is a 0-5 rating
+                        const direct = str ? Number(str) : NaN;
+                        if (!isNaN(direct) && direct >= 0 && direct <= 5) return direct;
+                        // Otherwise look for a decimal rating ("4.5 out of 5", "4.5 Ratings")
+                        const match = str.match(RATING_DECIMAL_RE);
+                        if (match) {
+                            const value = parseFloat(match[1]);
+                            if (value >= 0 && value <= 5) return value;
+                        }
+                        return null;
+                    };
+                    // Text -> number conversions for the global fallback columns
+                    const CONVERTERS = {price: toPrice, rating: toRating};
                     
                     // Helper to try multiple selectors
-                    const trySelectors = (selectors, container = null, isLink = false) => {
+                    // Comma-joined form of each selector list, so a miss costs one DOM pass
+                    const joinedSelectors = new Map();
+                    // Selector -> whether it matches anything on the page. One that doesn't can't
+                    // match inside any container, so later containers skip it; the rest are
+                    // still tried in list order, keeping the most specific match first
+                    const selectorsOnPage = new Map();
+                    const onPage = (selector) => {
+                        let found = selectorsOnPage.get(selector);
+                        if (found === undefined) {
+                            found = document.querySelector(selector) !== null;
+                            selectorsOnPage.set(selector, found);
+                        }
+                        return found;
+                    };
+                    // Stops after `max` non-empty values, so callers that only need the first
+                    // match don't read the text of every other one
+                    const readValues = (elements, isLink, max) => {
+                        const values = [];
+                        for (const el of elements) {
+                            let value;
+                            if (isLink) {
+                                const linkEl = el.tagName === 'A' ? el : el.closest('a');
+                                const href = linkEl ? (linkEl.href || linkEl.getAttribute('href') || '') : '';
+                                value = !href || href.startsWith('http') ? href : (window.location.origin + href);
+                            } else {
+                                value = (el.textContent || '').trim() || el.getAttribute('title') || '';
+                            }
+                            if (value) {
+                                values.push(value);
+                                if (values.length >= max) break;
+                            }
+                        }
+                        return values;
+                    };
+                    const trySelectors = (selectors, container = null, isLink = false, max = Infinity) => {
+                        const searchIn = container || document;
+                        let joined = joinedSelectors.get(selectors);
+                        if (joined === undefined) {
+                            joined = selectors.join(', ');
+                            joinedSelectors.set(selectors, joined);
+                        }
+                        try {
+                            // None of the candidates match here - skip the per-selector scans
+                            if (!searchIn.querySelector(joined)) {
+                                return [];
+                            }
+                        } catch (e) {
+                            // An invalid selector in the list - fall back to trying them one by one
+                        }
                         for (const selector of selectors) {
                             try {
-                                const searchIn = container || document;
+                                if (!onPage(selector)) continue;
                                 const elements = searchIn.querySelectorAll(selector);
                                 if (elements.length > 0) {
-                                    if (isLink) {
-                                        return Array.from(elements).map(el => {
-                                            const linkEl = el.tagName === 'A' ? el : el.closest('a');
-                                            if (linkEl) {
-                                                const href = linkEl.href || linkEl.getAttribute('href') || '';
-                                                return href.startsWith('http') ? href : (window.location.origin + href);
-                                            }
-                                            return '';
-                                        }).filter(href => href);
-                                    } else {
-                                        return Array.from(elements).map(el => {
-                                            return el.textContent?.trim() || el.innerText?.trim() || el.title || '';
-                                        }).filter(text => text);
-                                    }
+                                    return readValues(elements, isLink, max);
                                 }
                             } catch (e) {
                                 continue;
@@ -2683,7 +2779,7 @@ class SiteExtractionHandler:
                         // Filter out sponsored items and accessories for Amazon
                         if (productContainers.length > 0) {
                             productContainers = productContainers.filter(container => {
-                                const text = (container.textContent || container.innerText || '').toLowerCase();
+                                const text = (container.textContent || '').toLowerCase();
                                 const name = (container.querySelector('h2 a span, h2 a')?.textContent || '').toLowerCase();
                                 
                                 // Filter out sponsored items
@@ -2719,85 +2815,121 @@ class SiteExtractionHandler:
                         }
                     }
                     
+                    // Product link per container (Flipkart-style /p/ links), built on first use
+                    // with one document scan instead of a querySelector per container and field
+                    let productLinkFor = null;
+                    const getProductLink = (container) => {
+                        if (productLinkFor === null) {
+                            productLinkFor = new Map();
+                            const containerSet = new Set(productContainers);
+                            for (const a of document.querySelectorAll('a[href*="/p/"]')) {
+                                // Walk all the way up so nested containers see the link too;
+                                // document order keeps the first link, like querySelector
+                                for (let el = a.parentElement; el; el = el.parentElement) {
+                                    if (containerSet.has(el) && !productLinkFor.has(el)) {
+                                        productLinkFor.set(el, a);
+                                    }
+                                }
+                            }
+                        }
+                        return productLinkFor.get(container) || null;
+                    };
+                    
                     // If we found containers, extract from each container
                     if (productContainers.length > 0) {
                         const items = [];
                         const maxItems = limit && limit > 0 ? limit : productContainers.length;
                         
+                        // The requested fields are fixed for the whole call - resolve them once
+                        // here instead of re-checking the schema in every container.
+                        // Support both 'link' and 'url' keys, but prefer 'url'
+                        const urlKey = schema.url ? 'url' : (schema.link ? 'link' : null);
+                        const wantName = Boolean(schema.name);
+                        const wantPrice = Boolean(schema.price);
+                        const wantRating = Boolean(schema.rating);
+                        const wantLocation = Boolean(schema.location);
+                        // Site-specific link lookup, picked once for the whole call
+                        const LINK_FINDERS = {
+                            amazon: (container) =>
+                                container.querySelector('a[href*="/dp/"]') ||
+                                container.querySelector('a[href*="/gp/product/"]') ||
+                                container.querySelector('h2 a') ||
+                                container.closest('a[href*="/dp/"]'),
+                            // Google search results
+                            google: (container) =>
+                                container.querySelector('a[href^="http"]') ||
+                                container.querySelector('h3 a') ||
+                                container.querySelector('.yuRUbf a') ||
+                                container.closest('a[href^="http"]'),
+                            // Google Maps results - try multiple link strategies
+                            google_maps: (container) => {
+                                const linkEl = container.querySelector('a[href*="maps.google.com"]') ||
+                                               container.querySelector('a[href*="/maps/place"]') ||
+                                               container.querySelector('a[data-value="url"]') ||
+                                               container.closest('a[href*="maps.google.com"]') ||
+                                               container.closest('a[href*="/maps/place"]') ||
+                                               container.querySelector('a');
+                                if (linkEl) return linkEl;
+                                // If no link found, try to find via name element
+                                const nameEl = container.querySelector('.qBF1Pd, h3, [class*="qBF1Pd"]');
+                                return nameEl && (nameEl.closest('a[href*="maps"]') ||
+                                                  nameEl.closest('a') ||
+                                                  container.closest('a[href*="maps"]'));
+                            },
+                        };
+                        // Rating/location lists get site-specific extras; built once so trySelectors
+                        // can key its per-list caches on them
+                        const ratingSelectors = wantRating ? selectors.rating.slice() : null;
+                        const locationSelectors = wantLocation ? selectors.location.slice() : null;
+                        if (site === 'google') {
+                            ratingSelectors?.push('.fG8Fp', '[aria-label*="star"]', '.Aq14fc', '.z3VRc');
+                            locationSelectors?.push('.VkpGBb', '.fG8Fp', '[data-attrid]');
+                        } else if (site === 'google_maps') {
+                            // Google Maps rating selectors - try multiple approaches
+                            ratingSelectors?.push(
+                                '.MW4etd', 
+                                '[class*="MW4etd"]', 
+                                '[aria-label*="star"]', 
+                                '[data-value="rating"]',
+                                '[aria-label*="rating"]',
+                                '[class*="rating"]',
+                                '[class*="Rating"]'
+                            );
+                            // Google Maps location/address selectors
+                            locationSelectors?.push('.W4Efsd', '[class*="W4Efsd"]', '[data-value="address"]', '[aria-label*="Address"]');
+                        }
+                        // Flipkart and others
+                        const findLink = LINK_FINDERS[site] ||
+                            ((container) => getProductLink(container) || container.closest('a[href*="/p/"]'));
+                        
                         for (let i = 0; i < Math.min(maxItems, productContainers.length); i++) {
                             const container = productContainers[i];
                             const item = {};
+                            // Container text is read once and shared by the price/rating/location fallbacks
+                            let containerTextCache = null;
+                            const getContainerText = () => (containerTextCache ??= container.textContent || '');
                             
                             // Extract link/url first (most reliable)
-                            // Support both 'link' and 'url' keys, but prefer 'url'
-                            const urlKey = schema.url ? 'url' : (schema.link ? 'link' : null);
                             if (urlKey) {
-                                let linkEl = null;
-                                // Site-specific link selectors
-                                if (site === 'amazon') {
-                                    linkEl = container.querySelector('a[href*="/dp/"]') || 
-                                             container.querySelector('a[href*="/gp/product/"]') ||
-                                             container.querySelector('h2 a') ||
-                                             container.closest('a[href*="/dp/"]');
-                                } else if (site === 'google') {
-                                    // Google search results
-                                    linkEl = container.querySelector('a[href^="http"]') ||
-                                             container.querySelector('h3 a') ||
-                                             container.querySelector('.yuRUbf a') ||
-                                             container.closest('a[href^="http"]');
-                                } else if (site === 'google_maps') {
-                                    // Google Maps results - try multiple link strategies
-                                    linkEl = container.querySelector('a[href*="maps.google.com"]') ||
-                                             container.querySelector('a[href*="/maps/place"]') ||
-                                             container.querySelector('a[data-value="url"]') ||
-                                             container.closest('a[href*="maps.google.com"]') ||
-                                             container.closest('a[href*="/maps/place"]') ||
-                                             container.querySelector('a');
-                                    
-                                    // If no link found, try to find via name element
-                                    if (!linkEl) {
-                                        const nameEl = container.querySelector('.qBF1Pd, h3, [class*="qBF1Pd"]');
-                                        if (nameEl) {
-                                            // Try to find parent link or construct URL
-                                            linkEl = nameEl.closest('a[href*="maps"]') || 
-                                                    nameEl.closest('a') || 
-                                                    container.closest('a[href*="maps"]');
-                                        }
-                                    }
-                                } else {
-                                    // Flipkart and others
-                                    linkEl = container.querySelector('a[href*="/p/"]') || 
-                                             container.closest('a[href*="/p/"]');
-                                }
+                                const linkEl = findLink(container);
                                 if (linkEl) {
                                     let href = linkEl.href || linkEl.getAttribute('href') || '';
                                     if (!href.startsWith('http')) {
                                         href = window.location.origin + href;
                                     }
                                     item[urlKey] = href;
-                                    // Also set 'url' if schema has it, even if key was 'link'
-                                    if (schema.url && urlKey === 'link') {
-                                        item['url'] = href;
-                                    }
                                 } else if (site === 'google_maps' && item.name) {
                                     // For Google Maps, if no link found, construct a search URL
                                     const searchQuery = encodeURIComponent(item.name);
                                     item[urlKey] = `https://www.google.com/maps/search/${searchQuery}`;
-                                    if (schema.url && urlKey === 'link') {
-                                        item['url'] = item[urlKey];
-                                    }
                                 }
                             }
                             
                             // Extract name - try multiple strategies
-                            if (schema.name) {
+                            if (wantName) {
                                 let name = null;
-                                // Try selectors first
-                                const nameSelectors = [schema.name];
-                                if (siteSelectors && siteSelectors.product_name) {
-                                    nameSelectors.push(...siteSelectors.product_name);
-                                }
-                                const nameValues = trySelectors(nameSelectors, container, false);
+                                // Try selectors first (schema selector followed by site fallbacks)
+                                const nameValues = trySelectors(selectors.name, container, false, 1);
                                 if (nameValues[0]) {
                                     name = nameValues[0];
                                 } else {
@@ -2811,7 +2943,7 @@ class SiteExtractionHandler:
                                         // Google search results - get title from h3
                                         const h3 = container.querySelector('h3, .LC20lb, .DKV0Md');
                                         if (h3) {
-                                            name = h3.textContent?.trim() || h3.innerText?.trim();
+                                            name = h3.textContent?.trim();
                                         }
                                         linkEl = container.querySelector('a[href^="http"]') ||
                                                 container.querySelector('h3 a');
@@ -2819,12 +2951,12 @@ class SiteExtractionHandler:
                                         // Google Maps - get name from h3 or .qBF1Pd
                                         const nameEl = container.querySelector('.qBF1Pd, h3, [class*="qBF1Pd"]');
                                         if (nameEl) {
-                                            name = nameEl.textContent?.trim() || nameEl.innerText?.trim();
+                                            name = nameEl.textContent?.trim();
                                         }
                                         linkEl = container.querySelector('a[href*="maps.google.com"]') ||
                                                 container.closest('a[href*="maps.google.com"]');
                                     } else {
-                                        linkEl = container.querySelector('a[href*="/p/"]');
+                                        linkEl = getProductLink(container);
                                     }
                                     if (linkEl) {
                                         // Get title attribute first (cleaner)
@@ -2834,12 +2966,12 @@ class SiteExtractionHandler:
                                             if (site === 'amazon') {
                                                 const span = linkEl.querySelector('span');
                                                 if (span) {
-                                                    name = span.textContent?.trim() || span.innerText?.trim();
+                                                    name = span.textContent?.trim();
                                                 }
                                             }
                                             if (!name) {
                                                 // Try to get just the first line or first meaningful text
-                                                const linkText = linkEl.textContent?.trim() || linkEl.innerText?.trim() || '';
+                                                const linkText = linkEl.textContent?.trim() || '';
                                                 // Split by newlines and take first non-empty line, or first 100 chars
                                                 const lines = linkText.split(/[\n\r]+/).filter(l => l.trim());
                                                 if (lines.length > 0) {
@@ -2854,7 +2986,7 @@ class SiteExtractionHandler:
                                     if (!name) {
                                         const heading = container.querySelector('h1, h2, h3, h4, [class*="title"], [class*="name"]');
                                         if (heading) {
-                                            name = heading.textContent?.trim() || heading.innerText?.trim();
+                                            name = heading.textContent?.trim();
                                         }
                                     }
                                     // Clean up name - remove extra whitespace and limit length
@@ -2868,7 +3000,7 @@ class SiteExtractionHandler:
                                         }
                                         
                                         // Remove common prefixes
-                                        name = name.replace(/^(Add to Compare|Compare|Add to Cart|Buy Now)\s*/i, '');
+                                        name = name.replace(NAME_PREFIX_RE, '');
                                         
                                         // Try to extract just the product name (before first number or special marker)
                                         const nameMatch = name.match(/^([^0-9₹$]*?)(?:\s*[-–—]|\s+\d|₹|$)/);
@@ -2886,7 +3018,7 @@ class SiteExtractionHandler:
                             }
                             
                             // Extract price - try multiple strategies (prefer discounted price)
-                            if (schema.price) {
+                            if (wantPrice) {
                                 let price = null;
                                 
                                 // For Amazon, use .a-offscreen which contains the full price as a single string
@@ -2894,7 +3026,7 @@ class SiteExtractionHandler:
                                     // Try .a-offscreen first (most reliable - contains full price like "₹93,900.00")
                                     const offscreenPrice = container.querySelector('.a-price .a-offscreen');
                                     if (offscreenPrice) {
-                                        price = offscreenPrice.textContent?.trim() || offscreenPrice.innerText?.trim();
+                                        price = offscreenPrice.textContent?.trim();
                                     }
                                     
                                     // Fallback: construct price from components if offscreen not available
@@ -2904,7 +3036,7 @@ class SiteExtractionHandler:
                                         const priceFraction = container.querySelector('.a-price-fraction');
                                         
                                         if (priceWhole) {
-                                            let wholeText = priceWhole.textContent?.trim() || priceWhole.innerText?.trim() || '';
+                                            let wholeText = priceWhole.textContent?.trim() || '';
                                             // Remove commas from whole number
                                             wholeText = wholeText.replace(/,/g, '');
                                             
@@ -2923,7 +3055,7 @@ class SiteExtractionHandler:
                                     
                                     // Final fallback: try text pattern matching
                                     if (!price) {
-                                        const containerText = container.textContent || container.innerText || '';
+                                        const containerText = getContainerText();
                                         // Match price pattern: ₹ followed by digits and commas
                                         const priceMatch = containerText.match(/[₹$]\s*([\d,]+(?:\.\d{2})?)/);
                                         if (priceMatch) {
@@ -2932,50 +3064,28 @@ class SiteExtractionHandler:
                                     }
                                 } else {
                                     // For other sites, use existing logic
-                                    const priceSelectors = [schema.price];
-                                    if (siteSelectors && siteSelectors.product_price) {
-                                        priceSelectors.push(...siteSelectors.product_price);
-                                    }
-                                    const priceValues = trySelectors(priceSelectors, container, false);
+                                    const priceValues = trySelectors(selectors.price, container, false, 1);
                                     
                                     if (priceValues.length > 0) {
                                         price = priceValues[0];
                                     } else {
                                         // Fallback: look for price-like patterns in text
-                                        const containerText = container.textContent || container.innerText || '';
+                                        const containerText = getContainerText();
                                         const priceMatches = containerText.match(/[₹$]\s*[\d,]+/g);
                                         if (priceMatches && priceMatches.length > 0) {
                                             price = priceMatches[0];
                                         }
                                     }
                                 }
-                                item.price = price;
+                                item.price = toPrice(price);
                             }
                             
                             // Extract rating - try multiple strategies
-                            if (schema.rating) {
+                            if (wantRating) {
                                 let rating = null;
-                                const ratingSelectors = [schema.rating];
-                                if (siteSelectors && siteSelectors.product_rating) {
-                                    ratingSelectors.push(...siteSelectors.product_rating);
-                                }
-                                // For Google, add specific selectors
-                                if (site === 'google') {
-                                    ratingSelectors.push('.fG8Fp', '[aria-label*="star"]', '.Aq14fc', '.z3VRc');
-                                } else if (site === 'google_maps') {
-                                    // Google Maps rating selectors - try multiple approaches
-                                    ratingSelectors.push(
-                                        '.MW4etd', 
-                                        '[class*="MW4etd"]', 
-                                        '[aria-label*="star"]', 
-                                        '[data-value="rating"]',
-                                        '[aria-label*="rating"]',
-                                        '[class*="rating"]',
-                                        '[class*="Rating"]'
-                                    );
-                                    
+                                if (site === 'google_maps') {
                                     // Also try to extract from text patterns
-                                    const containerText = container.textContent || container.innerText || '';
+                                    const containerText = getContainerText();
                                     // Pattern: "4.7" or "4.7 stars" or "4.7★"
                                     const ratingMatch = containerText.match(/(\\d\\.\\d)\\s*(?:star|★|rating)/i);
                                     if (ratingMatch) {
@@ -2985,12 +3095,12 @@ class SiteExtractionHandler:
                                         }
                                     }
                                 }
-                                const ratingValues = trySelectors(ratingSelectors, container, false);
+                                const ratingValues = trySelectors(ratingSelectors, container, false, 1);
                                 if (ratingValues[0]) {
                                     rating = ratingValues[0];
                                 } else {
                                     // Fallback: look for rating patterns in text
-                                    const containerText = container.textContent || container.innerText || '';
+                                    const containerText = getContainerText();
                                     // Try to find rating BEFORE the ratings count
                                     // Pattern: "4.7" followed by comma and number (ratings count) or "Ratings"
                                     // We want the first decimal number that's between 0-5 (actual rating)
@@ -3028,25 +3138,18 @@ class SiteExtractionHandler:
                                         }
                                     }
                                 }
-                                item.rating = rating;
+                                item.rating = toRating(rating);
                             }
                             
                             // Extract location for local discovery
-                            if (schema.location) {
+                            if (wantLocation) {
                                 let location = null;
-                                const locationSelectors = [schema.location];
-                                if (site === 'google') {
-                                    locationSelectors.push('.VkpGBb', '.fG8Fp', '[data-attrid]');
-                                } else if (site === 'google_maps') {
-                                    // Google Maps location/address selectors
-                                    locationSelectors.push('.W4Efsd', '[class*="W4Efsd"]', '[data-value="address"]', '[aria-label*="Address"]');
-                                }
-                                const locationValues = trySelectors(locationSelectors, container, false);
+                                const locationValues = trySelectors(locationSelectors, container, false, 1);
                                 if (locationValues[0]) {
                                     location = locationValues[0];
                                 } else {
                                     // Fallback: look for location patterns
-                                    const containerText = container.textContent || container.innerText || '';
+                                    const containerText = getContainerText();
                                     // Try to find location indicators
                                     const locationMatch = containerText.match(/(?:near|in|at)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)/);
                                     if (locationMatch) {
@@ -3095,45 +3198,66 @@ class SiteExtractionHandler:
                             }
                         }
                         
-                        // Convert to field-based format
                         if (items.length > 0) {
-                            for (const key of Object.keys(schema)) {
-                                // Map both 'link' and 'url' to the same field if needed
-                                if (key === 'url' || key === 'link') {
-                                    data[key] = items.map(item => item.url || item.link || null);
-                                } else {
-                                    data[key] = items.map(item => item[key] || null);
-                                }
-                            }
+                            // Map both 'link' and 'url' to the same field if needed
+                            data.items = items.map(item => finishRow(key =>
+                                LINK_KEYS.has(key) ? (item.url || item.link || null) : (item[key] || null)
+                            ));
                         } else {
-                            // If no items found, return empty arrays for each schema key
-                            for (const key of Object.keys(schema)) {
-                                data[key] = [];
-                            }
+                            data._empty = true;
+                            data._containerCount = productContainers.length;
                         }
                     } else {
-                        // Fallback: extract globally
-                        for (const [key, selector] of Object.entries(schema)) {
-                            let selectorsToTry = [selector];
-                            
-                            if (siteSelectors) {
-                                if (key === 'name' && siteSelectors.product_name) {
-                                    selectorsToTry = selectorsToTry.concat(siteSelectors.product_name);
-                                } else if (key === 'price' && siteSelectors.product_price) {
-                                    selectorsToTry = selectorsToTry.concat(siteSelectors.product_price);
-                                } else if (key === 'rating' && siteSelectors.product_rating) {
-                                    selectorsToTry = selectorsToTry.concat(siteSelectors.product_rating);
-                                } else if ((key === 'link' || key === 'url') && siteSelectors.product_link) {
-                                    selectorsToTry = selectorsToTry.concat(siteSelectors.product_link);
+                        // Schema selectors share a row selector (see BrowserAgent.extract): find
+                        // the rows once and look fields up inside each, instead of scanning the
+                        // whole document once per field
+                        if (rows) {
+                            try {
+                                const maxRows = limit > 0 ? limit : Infinity;
+                                for (const row of document.querySelectorAll(rows.root)) {
+                                    let found = false;
+                                    const item = finishRow(key => {
+                                        const el = row.querySelector(rows.fields[key]);
+                                        const value = el ? (readValues([el], LINK_KEYS.has(key), 1)[0] ?? null) : null;
+                                        const convert = CONVERTERS[key];
+                                        const converted = convert ? convert(value) : value;
+                                        if (converted != null) found = true;
+                                        return converted;
+                                    });
+                                    if (found) {
+                                        data.items.push(item);
+                                        if (data.items.length >= maxRows) break;
+                                    }
                                 }
+                            } catch (e) {
+                                // Invalid row or field selector - use the per-field scan below
+                                data.items = [];
                             }
-                            
-                            const values = trySelectors(selectorsToTry, null, key === 'link' || key === 'url');
-                            
-                            if (limit && limit > 0) {
-                                data[key] = values.slice(0, limit);
-                            } else {
-                                data[key] = values;
+                        }
+                        if (data.items.length === 0) {
+                            // Fallback: extract globally, one column per field, then zip into rows
+                            const columns = {};
+                            let rowCount = 0;
+                            let foundAny = false;
+                            for (const key of schemaKeys) {
+                                // The limit is applied while reading, not after
+                                let values = trySelectors(selectors[key], null, LINK_KEYS.has(key), limit > 0 ? limit : Infinity);
+                                const convert = CONVERTERS[key];
+                                if (convert) {
+                                    values = values.map(convert);
+                                }
+                                columns[key] = values;
+                                rowCount = Math.max(rowCount, values.length);
+                                if (values.length > 0) {
+                                    foundAny = true;
+                                }
+                            }
+                            for (let i = 0; i < rowCount; i++) {
+                                data.items.push(finishRow(key => columns[key][i] ?? null));
+                            }
+                            if (!foundAny) {
+                                data._empty = true;
+                                data._containerCount = 0;
                             }
                         }
                     }
@@ -3142,3 +3266,11 @@ class SiteExtractionHandler:
                 }
             """
 
+
+# Installed into every browser context as an init script so extract() and the Maps
+# search only have to call window.__quashExtract / window.__quashMapsSnapshot instead
+# of shipping and compiling the source each time
+EXTRACTION_INIT_JS = (
+    f"window.__quashExtract = {SiteExtractionHandler.get_extraction_js().strip()};\n"
+    f"window.__quashMapsSnapshot = {_MAPS_SNAPSHOT_JS.strip()};"
+)
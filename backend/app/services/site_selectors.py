@@ -1,7 +1,14 @@
 """Site-specific selector mappings for different e-commerce platforms."""
 
+import re
+import urllib.parse
+from functools import lru_cache
+from types import MappingProxyType
+
 SITE_SELECTORS = {
     "flipkart": {
+        # Single selector that appears once the page is usable (search box or results)
+        "ready_selector": "input[name='q'], div[data-id]",
         "search_input": [
             "input[name='q']",
             "._3704LK",
@@ -65,6 +72,8 @@ SITE_SELECTORS = {
         ]
     },
     "amazon": {
+        # Single selector that appears once the page is usable (search box or results)
+        "ready_selector": "#twotabsearchtextbox, [data-component-type='s-search-result']",
         "search_input": [
             "input[id='twotabsearchtextbox']",
             "#nav-search-input",
@@ -154,6 +163,8 @@ SITE_SELECTORS = {
         ]
     },
     "google_maps": {
+        # Single selector that appears once the page is usable (search box or results)
+        "ready_selector": "input#searchboxinput, [role='article']",
         "search_input": [
             "input#searchboxinput",
             "input[aria-label*='Search']",
@@ -203,6 +214,8 @@ SITE_SELECTORS = {
         ]
     },
     "youtube": {
+        # Single selector that appears once the page is usable (search box or results)
+        "ready_selector": "input[name='search_query'], ytd-video-renderer",
         "search_input": [
             "input[name='search_query']",
             "#search",
@@ -238,6 +251,8 @@ SITE_SELECTORS = {
         ]
     },
     "swiggy": {
+        # Single selector that appears once the page is usable (search box or results)
+        "ready_selector": "input[placeholder*='Search'], [data-testid='restaurant-card']",
         "search_activation": [
             "div:has-text('Search for restaurant and food')",
             "a[href*='/search']",
@@ -290,34 +305,146 @@ SITE_SELECTORS = {
     }
 }
 
-def get_selectors_for_site(site_name: str = None) -> dict:
-    """Get selector mappings for a specific site or generic fallback."""
+@lru_cache(maxsize=64)
+def get_selectors_for_site(site_name: str = None) -> MappingProxyType:
+    """Get selector mappings for a specific site or generic fallback.
+    
+    The result is cached and shared, so it is read-only: a mapping proxy whose
+    selector lists are tuples.
+    """
     if site_name and site_name.lower() in SITE_SELECTORS:
-        return SITE_SELECTORS[site_name.lower()]
-    return SITE_SELECTORS["generic"]
+        selectors = SITE_SELECTORS[site_name.lower()]
+    else:
+        selectors = SITE_SELECTORS["generic"]
+    return MappingProxyType({
+        key: tuple(value) if isinstance(value, list) else value
+        for key, value in selectors.items()
+    })
 
 def detect_site_from_url(url: str) -> str:
-    """Detect which site from URL."""
-    url_lower = url.lower()
-    if "youtube" in url_lower or "youtu.be" in url_lower:
+    """Detect which site from URL.
+    
+    Only the host (plus a /maps path marker for Google) decides the site, so a
+    search query mentioning another site doesn't change the answer and the cache
+    holds one entry per host rather than per URL.
+    """
+    parts = urllib.parse.urlsplit(url)
+    if not parts.scheme:
+        # Bare "flipkart.com/..." - parse it as a network location
+        parts = urllib.parse.urlsplit("//" + url)
+    host = parts.hostname
+    if not host:
+        # file:, data: and the like have no host - match on the whole URL
+        return _detect_site(url.lower())
+    return _detect_site(host + "/maps" if parts.path.startswith("/maps") else host)
+
+@lru_cache(maxsize=256)
+def _detect_site(key: str) -> str:
+    """Map a lowercased host (or whole URL) to a site name."""
+    if "youtube" in key or "youtu.be" in key:
         return "youtube"
-    elif "flipkart" in url_lower:
+    elif "flipkart" in key:
         return "flipkart"
-    elif "amazon" in url_lower:
+    elif "amazon" in key:
         return "amazon"
-    elif "myntra" in url_lower:
+    elif "myntra" in key:
         return "myntra"
-    elif "snapdeal" in url_lower:
+    elif "snapdeal" in key:
         return "snapdeal"
-    elif "google" in url_lower:
-        if "maps" in url_lower:
+    elif "google" in key:
+        if "maps" in key:
             return "google_maps"
         return "google"
-    elif "zomato" in url_lower:
+    elif "zomato" in key:
         return "zomato"
-    elif "swiggy" in url_lower:
+    elif "swiggy" in key:
         return "swiggy"
-    elif "zomato" in url_lower or "swiggy" in url_lower:
-        return "local"
     return "generic"
 
+# Shared default for missing selector groups (immutable, so safe to hand out)
+_EMPTY_LIST: tuple = ()
+
+# Generic submit-button alternatives tried after the site's own search buttons
+_SUBMIT_EXTRA = (
+    "input[name='btnK']",  # Google search button
+    "input[type='submit']",
+    "input[value='Google Search']",
+    "input[value='Search']",
+    "button[aria-label*='Search']",
+    "button[aria-label*='search']",
+)
+
+# site -> submit-button fallback chain, built once at import
+_SUBMIT_FALLBACKS = {
+    site: tuple(dict.fromkeys([*selectors.get("search_button", _EMPTY_LIST)[:3], *_SUBMIT_EXTRA]))
+    for site, selectors in SITE_SELECTORS.items()
+}
+
+# site -> search-input selectors tried after the requested one
+_SEARCH_INPUT_FALLBACKS = {
+    site: tuple(selectors.get("search_input", _EMPTY_LIST)[:3])
+    for site, selectors in SITE_SELECTORS.items()
+}
+
+# Search boxes that take priority over the requested selector on some sites
+_SEARCH_INPUT_PRIORITY = {
+    "google_maps": ("input#searchboxinput", "input[aria-label*='Search']"),
+    "youtube": (
+        "input[aria-label*='Search']",
+        "input[placeholder*='Search']",
+        "input#search",
+        "#search",
+        "input[name='search_query']",
+    ),
+}
+
+# Generic clickables tried when a plain (non-submit) button selector misses
+_BUTTON_FALLBACKS = ("input[type='submit']", "[role='button']")
+
+# Google-style "q" search box alternatives (it is a textarea on google.com)
+_Q_INPUT_FALLBACKS = (
+    "textarea[name='q']",
+    "#APjFqb",  # Google's search box ID
+    "textarea",
+    "input[type='search']",
+    "[role='searchbox']",
+)
+
+# Tried after the textarea form of any other input selector
+_TEXTAREA_FALLBACKS = ("textarea[name='q']", "input[type='search']", "[role='searchbox']")
+
+# Selector classifiers: one anchored pass whose alternatives are tried in priority
+# order (lookaheads, so position in the string doesn't matter); lastgroup names the
+# kind, or is None when nothing applies
+_CLICK_KIND_RE = re.compile(r"^(?:(?P<submit>(?=.*(?i:submit)))|(?P<button>(?=.*button))|)", re.DOTALL)
+_INPUT_KIND_RE = re.compile(r"^(?:(?P<q_input>(?=.*input\[name='q'\]))|(?P<input>(?=.*input)(?!.*textarea))|)", re.DOTALL)
+
+@lru_cache(maxsize=256)
+def get_click_candidates(site: str, selector: str) -> tuple:
+    """Ordered, de-duplicated selectors click() races for `selector` on `site`."""
+    candidates = [selector]
+    kind = _CLICK_KIND_RE.match(selector).lastgroup
+    if kind == "submit":
+        # Submit buttons: the site's own search buttons, then generic alternatives
+        candidates.extend(_SUBMIT_FALLBACKS.get(site, _SUBMIT_FALLBACKS["generic"]))
+    elif kind == "button":
+        candidates.extend(_BUTTON_FALLBACKS)
+    return tuple(dict.fromkeys(candidates))
+
+@lru_cache(maxsize=256)
+def get_type_candidates(site: str, selector: str) -> tuple:
+    """Ordered, de-duplicated selectors type_text() races for `selector` on `site`."""
+    # Google Maps / YouTube search boxes go first, then the requested selector
+    candidates = [*_SEARCH_INPUT_PRIORITY.get(site, _EMPTY_LIST), selector]
+    # Add site-specific search input selectors
+    if selector not in get_selectors_for_site(site).get("search_input", _EMPTY_LIST):
+        candidates.extend(_SEARCH_INPUT_FALLBACKS.get(site, _SEARCH_INPUT_FALLBACKS["generic"]))
+    kind = _INPUT_KIND_RE.match(selector).lastgroup
+    # If the original selector is input[name='q'], add textarea alternative (common for Google, etc.)
+    if kind == "q_input":
+        candidates.extend(_Q_INPUT_FALLBACKS)
+    elif kind == "input":
+        # If it's an input selector, also try textarea
+        candidates.append(selector.replace("input", "textarea"))
+        candidates.extend(_TEXTAREA_FALLBACKS)
+    return tuple(dict.fromkeys(candidates))
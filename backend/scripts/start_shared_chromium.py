@@ -0,0 +1,63 @@
+"""Run one headless Chromium with the DevTools protocol exposed, for BROWSER_CDP_URL.
+
+Uses the Chromium bundled with Playwright, so nothing else needs installing:
+
+    python scripts/start_shared_chromium.py --port 9222
+
+then set BROWSER_CDP_URL=http://localhost:9222 for every backend worker.
+"""
+
+import argparse
+import json
+import subprocess
+import time
+import urllib.request
+
+from playwright.sync_api import sync_playwright
+
+# Same flags as browser_pool.BROWSER_ARGS (kept standalone so the script runs from anywhere)
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=9222, help="DevTools port (default 9222)")
+    args = parser.parse_args()
+
+    with sync_playwright() as p:
+        executable = p.chromium.executable_path
+
+    process = subprocess.Popen([
+        executable,
+        "--headless=new",
+        f"--remote-debugging-port={args.port}",
+        *BROWSER_ARGS,
+    ])
+
+    # Wait for the DevTools endpoint so the URL we print is live
+    version_url = f"http://localhost:{args.port}/json/version"
+    for _ in range(50):
+        try:
+            with urllib.request.urlopen(version_url) as response:
+                info = json.load(response)
+            break
+        except OSError:
+            time.sleep(0.2)
+    else:
+        process.terminate()
+        raise SystemExit(f"Chromium did not open port {args.port}")
+
+    print(f"BROWSER_CDP_URL=http://localhost:{args.port}")
+    print(f"WebSocket endpoint: {info['webSocketDebuggerUrl']}")
+    try:
+        process.wait()
+    except KeyboardInterrupt:
+        process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Unit tests for the on-disk action cache.
+"""
+
+import asyncio
+import threading
+
+from app.services import action_cache as action_cache_module
+from app.services.action_cache import ActionCache
+
+
+def test_key_is_per_origin():
+    """Test that keys ignore path and query but not scheme, host or selector."""
+    key = ActionCache._key
+    assert key("https://shop.example.com/a?q=1", "#buy") == key("https://shop.example.com/b", "#buy")
+    assert key("https://shop.example.com/a", "#buy") != key("http://shop.example.com/a", "#buy")
+    assert key("https://shop.example.com/a", "#buy") != key("https://other.example.com/a", "#buy")
+    assert key("https://shop.example.com/a", "#buy") != key("https://shop.example.com/a", "#cart")
+
+def test_get_put_evict():
+    """Test that entries can be stored, replaced and evicted in memory."""
+    cache = ActionCache(path="")
+    assert cache.get("https://shop.example.com", "#buy") is None
+    cache.put("https://shop.example.com/item", "#buy", "button.buy-now")
+    assert cache.get("https://shop.example.com/other", "#buy") == "button.buy-now"
+    cache.put("https://shop.example.com/item", "#buy", "#add-to-cart")
+    assert cache.get("https://shop.example.com/item", "#buy") == "#add-to-cart"
+    cache.evict("https://shop.example.com/item", "#buy")
+    assert cache.get("https://shop.example.com/item", "#buy") is None
+    cache.evict("https://shop.example.com/item", "#buy")  # Already gone - no error
+
+def test_reload_from_disk(tmp_path):
+    """Test that entries written without an event loop are read back by a new instance."""
+    path = tmp_path / "cache" / "actions.json"
+    cache = ActionCache(path=str(path))
+    cache.put("https://shop.example.com", "#buy", "button.buy-now")
+    cache.put("https://shop.example.com", "#search", "input[name=q]")
+    cache.evict("https://shop.example.com", "#search")
+    reloaded = ActionCache(path=str(path))
+    assert reloaded.get("https://shop.example.com", "#buy") == "button.buy-now"
+    assert reloaded.get("https://shop.example.com", "#search") is None
+
+def test_unreadable_file_starts_empty(tmp_path):
+    """Test that a corrupt cache file is ignored rather than raising."""
+    path = tmp_path / "actions.json"
+    path.write_text("{not json")
+    assert ActionCache(path=str(path)).get("https://shop.example.com", "#buy") is None
+
+async def test_put_during_write_is_flushed(tmp_path, monkeypatch):
+    """Test that a change made while a flush is writing is saved by a later pass."""
+    monkeypatch.setattr(action_cache_module, "_FLUSH_DELAY", 0)
+    path = tmp_path / "actions.json"
+    cache = ActionCache(path=str(path))
+    write_started = threading.Event()
+    release_write = threading.Event()
+    real_write = cache._write
+    
+    def slow_write(entries=None):
+        write_started.set()
+        release_write.wait(5)
+        real_write(entries)
+    
+    monkeypatch.setattr(cache, "_write", slow_write)
+    cache.put("https://shop.example.com", "#buy", "button.buy-now")
+    while not write_started.is_set():
+        await asyncio.sleep(0.01)
+    cache.put("https://shop.example.com", "#search", "input[name=q]")
+    release_write.set()
+    await asyncio.wait_for(cache._flush_task, 5)
+    
+    reloaded = ActionCache(path=str(path))
+    assert reloaded.get("https://shop.example.com", "#buy") == "button.buy-now"
+    assert reloaded.get("https://shop.example.com", "#search") == "input[name=q]", \
+        "The change made during the first write should have been flushed"
@@ -0,0 +1,73 @@
+"""
+Tests for the extract() result cache.
+
+The page extraction itself is replaced by a counter, so these only check when the
+cache is hit and when it is dropped.
+"""
+
+import pytest
+
+# Needs a real browser - skipped where Playwright isn't installed
+pytest.importorskip("playwright")
+
+from app.services.browser_agent import BrowserAgent
+
+_PAGE_A = "data:text/html,<ul><li class='item'>A</li></ul>"
+_PAGE_B = "data:text/html,<ul><li class='item'>B</li></ul>"
+
+
+def _count_extractions(agent):
+    """Replace agent._extract_page with a stub; returns the list of calls it records."""
+    calls = []
+    
+    async def fake_extract_page(schema, limit=None, page=None, site=None, common_root=None):
+        calls.append((agent.page.url, limit))
+        return {"status": "success", "data": [{"name": f"item {len(calls)}"}], "count": 1}
+    
+    agent._extract_page = fake_extract_page
+    return calls
+
+@pytest.mark.asyncio
+async def test_extract_cache_hit():
+    """Test that a repeat extract with use_cache reuses the result and hands out copies."""
+    agent = BrowserAgent()
+    
+    try:
+        await agent.start()
+        await agent.navigate(_PAGE_A)
+        calls = _count_extractions(agent)
+        
+        first = await agent.extract({"name": ".item"}, limit=5, use_cache=True)
+        first["data"][0]["name"] = "changed by caller"
+        second = await agent.extract({"name": ".item"}, limit=5, use_cache=True)
+        
+        assert len(calls) == 1, "Identical cached extract should not hit the page again"
+        assert second["data"] == [{"name": "item 1"}], "Cached rows should not see caller edits"
+        
+        await agent.extract({"name": ".item"}, limit=10, use_cache=True)
+        await agent.extract({"name": ".item"}, limit=5)
+        assert len(calls) == 3, "A different limit, or use_cache off, should extract again"
+        
+    finally:
+        await agent.close()
+
+@pytest.mark.asyncio
+async def test_extract_cache_cleared_on_navigate():
+    """Test that navigating drops cached results, even back to the same URL."""
+    agent = BrowserAgent()
+    
+    try:
+        await agent.start()
+        await agent.navigate(_PAGE_A)
+        calls = _count_extractions(agent)
+        
+        await agent.extract({"name": ".item"}, use_cache=True)
+        await agent.navigate(_PAGE_B)
+        await agent.extract({"name": ".item"}, use_cache=True)
+        await agent.navigate(_PAGE_A)
+        await agent.extract({"name": ".item"}, use_cache=True)
+        
+        assert len(calls) == 3, "Each navigation should invalidate the extract cache"
+        
+    finally:
+        await agent.close()
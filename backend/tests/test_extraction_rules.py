@@ -0,0 +1,188 @@
+"""
+Unit tests for the browser-independent extraction helpers.
+"""
+
+import os
+
+import pytest
+from app.services.extraction_rules import (
+    BROWSER_ONLY_SITES, extract_static_rows, split_row_selectors, to_price, to_rating
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+BASE_URL = "https://shop.example.com/search?q=laptop"
+
+
+def _parse_fixture(name):
+    lexbor = pytest.importorskip("selectolax.lexbor")
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return lexbor.LexborHTMLParser(f.read())
+
+
+def _static_rows(name, schema, limit=None):
+    """Run the static path the way BrowserAgent._extract_static does, without site fallbacks."""
+    row_lookup = None
+    row_split = split_row_selectors(tuple(schema.values()))
+    if row_split:
+        root, fields = row_split
+        row_lookup = {"root": root, "fields": dict(zip(schema, fields))}
+    selectors = {key: [selector] for key, selector in schema.items()}
+    return extract_static_rows(_parse_fixture(name), BASE_URL, schema, selectors, limit, row_lookup)
+
+
+def test_split_shared_prefix():
+    """Test that the leading selectors every field shares become the row selector."""
+    assert split_row_selectors((".product-row .name", ".product-row .price")) == (
+        ".product-row", (".name", ".price")
+    )
+
+def test_split_longest_shared_prefix():
+    """Test that every shared compound selector goes into the row selector."""
+    assert split_row_selectors(("#results li.item h2 a", "#results li.item span.price")) == (
+        "#results li.item", ("h2 a", "span.price")
+    )
+
+def test_split_child_combinator():
+    """Test that a field starting with > is made relative to the row with :scope."""
+    assert split_row_selectors((".card > .title", ".card > .price")) == (
+        ".card", (":scope > .title", ":scope > .price")
+    )
+
+def test_split_child_combinator_inside_root():
+    """Test that a combinator between shared selectors stays in the row selector."""
+    assert split_row_selectors(("ul > li .name", "ul > li .price")) == (
+        "ul > li", (".name", ".price")
+    )
+
+def test_split_rejects_sibling_combinator_fields():
+    """Test that fields which are siblings of the row (not inside it) give no split."""
+    assert split_row_selectors((".row + .name", ".row + .price")) is None
+    assert split_row_selectors((".row ~ .name", ".row ~ .price")) is None
+
+def test_split_attribute_with_spaces():
+    """Test that spaces inside attribute brackets don't split a compound selector."""
+    assert split_row_selectors(('div[data-kind="search result"] .name', 'div[data-kind="search result"] .price')) == (
+        'div[data-kind="search result"]', (".name", ".price")
+    )
+
+def test_split_attribute_with_bracket_in_value():
+    """Test that a quoted ] inside an attribute value doesn't end the attribute."""
+    root, fields = split_row_selectors(('[title="a] b"] .name', '[title="a] b"] .price'))
+    assert root == '[title="a] b"]'
+    assert fields == (".name", ".price")
+
+def test_split_pseudo_class_arguments():
+    """Test that spaces inside :not(...) / :has(...) stay with their selector."""
+    assert split_row_selectors(("li:not(.ad .x) .name", "li:not(.ad .x) .price")) == (
+        "li:not(.ad .x)", (".name", ".price")
+    )
+
+def test_split_rejects_selector_lists():
+    """Test that comma-separated selector lists are left to the per-field scan."""
+    assert split_row_selectors((".row .name, .row h2", ".row .price")) is None
+
+def test_split_needs_a_shared_prefix():
+    """Test schemas with nothing in common."""
+    assert split_row_selectors((".name", ".price")) is None
+    assert split_row_selectors(("h2.title", "span.price")) is None
+
+def test_split_needs_something_inside_the_row():
+    """Test that a field equal to the shared prefix gives no split."""
+    assert split_row_selectors((".row", ".row .price")) is None
+
+def test_split_common_root():
+    """Test an explicit row selector: matching prefixes are stripped, others kept."""
+    assert split_row_selectors((".row .name", ".row > .price", "h2.other"), common_root=".row") == (
+        ".row", (".name", ":scope > .price", "h2.other")
+    )
+
+def test_split_common_root_needs_a_combinator_after_it():
+    """Test that a selector merely starting with the same characters isn't stripped."""
+    assert split_row_selectors((".rowx .name",), common_root=".row") == (".row", (".rowx .name",))
+
+@pytest.mark.parametrize("selectors", [
+    (),
+    ("",),
+    (".row .name", "   "),
+    ([".row .name"], ".row .price"),
+    ({"css": ".row .name"}, ".row .price"),
+    (None, ".row .price"),
+])
+def test_split_rejects_non_selectors(selectors):
+    """Test that empty, blank and non-string (unhashable) values give no split instead of raising."""
+    assert split_row_selectors(selectors) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Rs. 54,990", 54990.0),
+    ("$1,299.50 $1,499.00", 1299.5),
+    ("Free", None),
+    ("", None),
+    (None, None),
+])
+def test_to_price(text, expected):
+    """Test that the first number in a price text is taken, commas dropped."""
+    assert to_price(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("4.5", 4.5),
+    (" 3 ", 3.0),
+    ("4.3 out of 5", 4.3),
+    ("12", None),
+    ("1,234 ratings", None),
+    ("New", None),
+    (None, None),
+])
+def test_to_rating(text, expected):
+    """Test that only 0-5 ratings are accepted, plain or inside text."""
+    assert to_rating(text) == expected
+
+def test_browser_only_sites_cover_container_sites():
+    """Test that sites handled by the extraction JS's container rules never take the static path."""
+    assert {"amazon", "flipkart", "google", "google_maps"} <= BROWSER_ONLY_SITES
+
+def test_static_rows_stay_aligned():
+    """Test that a card missing a field gets None there instead of taking the next card's value."""
+    rows = _static_rows("listing_rows.html", {
+        "name": ".product-row .name",
+        "price": ".product-row .price",
+        "rating": ".product-row .rating",
+        "link": ".product-row a",
+    })
+    assert rows == [
+        {"name": "Alpha Book 14", "price": 54990.0, "rating": 4.3, "link": "https://shop.example.com/p/alpha"},
+        {"name": "Beta Pad Pro", "price": None, "rating": 4.8, "link": "https://shop.example.com/p/beta"},
+        {"name": "Gamma Air", "price": 1299.5, "rating": None, "link": "https://shop.example.com/p/gamma"},
+    ], "Rows should follow the cards, with the empty card skipped"
+
+def test_static_rows_limit():
+    """Test that the row limit is applied."""
+    rows = _static_rows("listing_rows.html", {"name": ".product-row .name", "price": ".product-row .price"}, limit=2)
+    assert [row["name"] for row in rows] == ["Alpha Book 14", "Beta Pad Pro"]
+
+def test_static_rows_scope_needs_browser():
+    """Test that row fields using :scope (unsupported by the HTML parser) leave the page to the browser."""
+    assert _static_rows("listing_rows.html", {
+        "name": ".product-row > a",
+        "price": ".product-row > .price",
+    }) is None
+
+def test_static_columns_without_shared_row():
+    """Test that schemas without a row selector are zipped by position, text falling back to title."""
+    rows = _static_rows("listing_columns.html", {"name": "h3.title", "price": "b.cost"})
+    assert rows == [
+        {"name": "Quiet One", "price": 199.99},
+        {"name": "Bass Two", "price": 89.0},
+    ]
+
+def test_static_columns_pad_short_fields():
+    """Test that a field with fewer matches than the others is padded with None."""
+    rows = _static_rows("listing_columns.html", {"name": "h3.title", "badge": "p.badge"})
+    assert rows == [
+        {"name": "Quiet One", "badge": "Bestseller"},
+        {"name": "Bass Two", "badge": None},
+    ], "Shorter columns should end in None rather than cut the longer ones short"
+
+def test_static_missing_field_needs_browser():
+    """Test that a field with no match at all leaves the page to the browser."""
+    assert _static_rows("listing_columns.html", {"name": "h3.title", "rating": ".stars"}) is None
@@ -10,6 +10,10 @@ These tests verify the core browser automation capabilities including:
 
 import pytest
 import asyncio
+
+# Needs a real browser - skipped where Playwright isn't installed
+pytest.importorskip("playwright")
+
 from app.services.browser_agent import BrowserAgent
 
 @pytest.mark.asyncio
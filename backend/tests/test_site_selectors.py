@@ -0,0 +1,98 @@
+"""
+Unit tests for site detection and the selector fallback chains.
+
+These run without a browser: they cover the pure lookups click() and
+type_text() build their candidate lists from.
+"""
+
+import pytest
+from app.services.site_selectors import (
+    detect_site_from_url,
+    get_click_candidates,
+    get_selectors_for_site,
+    get_type_candidates,
+)
+
+
+@pytest.mark.parametrize("url, site", [
+    ("https://www.flipkart.com/search?q=phone", "flipkart"),
+    ("https://www.amazon.in/s?k=laptop", "amazon"),
+    ("https://www.google.com/maps/search/pizza", "google_maps"),
+    ("https://maps.google.com/?q=cafe", "google_maps"),
+    ("https://www.google.com/search?q=weather", "google"),
+    ("https://www.youtube.com/results?search_query=lofi", "youtube"),
+    ("https://youtu.be/abc123", "youtube"),
+    ("https://www.zomato.com/bangalore", "zomato"),
+    ("https://www.swiggy.com/restaurants", "swiggy"),
+    ("https://example.com", "generic"),
+])
+def test_detect_site_from_url(url, site):
+    """Test that the host decides the site."""
+    assert detect_site_from_url(url) == site
+
+def test_detect_site_ignores_query():
+    """Test that a search query naming another site doesn't change the answer."""
+    assert detect_site_from_url("https://www.google.com/search?q=flipkart+deals") == "google"
+    assert detect_site_from_url("https://example.com/?ref=amazon") == "generic"
+
+def test_detect_site_without_scheme():
+    """Test bare host URLs (no https://)."""
+    assert detect_site_from_url("flipkart.com/mobiles") == "flipkart"
+    assert detect_site_from_url("www.amazon.in") == "amazon"
+
+def test_detect_site_without_host():
+    """Test URLs that have no host at all."""
+    assert detect_site_from_url("about:blank") == "generic"
+    assert detect_site_from_url("file:///tmp/youtube.html") == "youtube"
+
+def test_selectors_for_site_are_read_only():
+    """Test that the shared, cached selector map can't be modified."""
+    selectors = get_selectors_for_site("flipkart")
+    with pytest.raises(TypeError):
+        selectors["search_input"] = ()
+    assert isinstance(selectors["search_input"], tuple)
+    assert get_selectors_for_site("unknown-site") == get_selectors_for_site("generic")
+
+def test_click_candidates_for_submit_button():
+    """Test that submit selectors fall back to the site's search buttons, then generic ones."""
+    candidates = get_click_candidates("flipkart", "button[type='submit']")
+    assert candidates[0] == "button[type='submit']", "Requested selector goes first"
+    assert "._2KpZ6l" in candidates, "Site search buttons are included"
+    assert "input[name='btnK']" in candidates, "Generic submit buttons are included"
+    assert len(candidates) == len(set(candidates)), "Candidates are de-duplicated"
+
+def test_click_candidates_for_plain_button():
+    """Test that plain buttons only get the generic clickables."""
+    candidates = get_click_candidates("generic", "button.buy")
+    assert candidates == ("button.buy", "input[type='submit']", "[role='button']")
+
+def test_click_candidates_for_other_selectors():
+    """Test that anything else is clicked as requested, without fallbacks."""
+    assert get_click_candidates("amazon", "a.product-link") == ("a.product-link",)
+
+def test_type_candidates_for_google_search_box():
+    """Test that input[name='q'] also tries Google's textarea search box."""
+    candidates = get_type_candidates("google", "input[name='q']")
+    assert candidates[0] == "input[name='q']"
+    assert "textarea[name='q']" in candidates
+    assert "#APjFqb" in candidates
+    assert len(candidates) == len(set(candidates))
+
+def test_type_candidates_prioritize_site_search_box():
+    """Test that Google Maps / YouTube search boxes go before the requested selector."""
+    candidates = get_type_candidates("google_maps", "input.search")
+    assert candidates[:2] == ("input#searchboxinput", "input[aria-label*='Search']")
+    assert candidates.index("input.search") == 2
+
+def test_type_candidates_add_textarea_alternative():
+    """Test that other input selectors also try their textarea form."""
+    candidates = get_type_candidates("generic", "input.query")
+    assert candidates[0] == "input.query"
+    assert "textarea.query" in candidates
+    assert "[role='searchbox']" in candidates
+
+def test_type_candidates_for_textarea():
+    """Test that a textarea selector isn't rewritten."""
+    candidates = get_type_candidates("generic", "textarea#message")
+    assert candidates[0] == "textarea#message"
+    assert not any(c.startswith("input") and "message" in c for c in candidates)